@@ -1,25 +1,29 @@
 import json
+import math
 import hashlib
-import asyncio
 from flask_cors import CORS
 import numpy as np
 from datetime import datetime, timedelta
 from collections import defaultdict, deque
 from typing import Dict, List, Tuple, Any, Optional
 from dataclasses import dataclass, asdict
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, Response
 import threading
 
 import time
 import logging
-import sqlite3
-from contextlib import contextmanager
 
 # --- Added imports for integrated ML model ---
 import os
 import traceback
-import joblib
-import pandas as pd
+
+from compiled_models import CompiledIsolationForest, compile_tree_model, ARRAYS_META
+from verdict_cache import VerdictCache, tx_fingerprint
+from rolling_stats import RollingPercentile, GAS_PRICE_WINDOW
+from feature_state import ShardedAddressStateStore, ValueHistograms
+from calldata import CalldataAnalyzer
+from threat_db import DatabaseManager, parse_window, parse_timestamp, parse_cursor
+from rate_limiter import TokenBucketLimiter, RATE_LIMIT_OVERRIDES, retry_after_header
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,27 +32,27 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Simple rate limiting without external dependencies
-request_counts = defaultdict(lambda: {'count': 0, 'reset_time': time.time() + 3600})
+# Token bucket per client IP and route, bounded LRU of clients (CERBERUS_RATE_LIMIT_CLIENTS);
+# CERBERUS_RATE_LIMITS overrides a route's limits by view name
+rate_limiters = {}
 
-def rate_limit(max_requests=100, window=3600):
+def rate_limit(max_requests=100, window=3600, burst=None):
     def decorator(f):
+        limits = RATE_LIMIT_OVERRIDES.get(f.__name__, (max_requests, window, burst))
+        limiter = rate_limiters[f.__name__] = TokenBucketLimiter(*limits)
+        
         def wrapper(*args, **kwargs):
             client_ip = request.environ.get('REMOTE_ADDR', '127.0.0.1')
-            current_time = time.time()
-            
-            # Reset counter if window expired
-            if current_time > request_counts[client_ip]['reset_time']:
-                request_counts[client_ip] = {'count': 0, 'reset_time': current_time + window}
-            
-            # Check rate limit
-            if request_counts[client_ip]['count'] >= max_requests:
-                return jsonify({'error': 'Rate limit exceeded'}), 429
-            
-            request_counts[client_ip]['count'] += 1
+            allowed, retry_after = limiter.acquire(client_ip)
+            if not allowed:
+                response = jsonify({'error': 'Rate limit exceeded', 'retry_after': round(retry_after, 3)})
+                response.status_code = 429
+                response.headers['Retry-After'] = retry_after_header(retry_after)
+                return response
             return f(*args, **kwargs)
         
         wrapper.__name__ = f.__name__
+        wrapper.limiter = limiter
         return wrapper
     return decorator
 
@@ -83,10 +87,17 @@ class EnsembleResult:
 class AdvancedFeatureExtractor:
     """Advanced feature extraction with domain expertise"""
     
-    def __init__(self):
-        self.gas_price_history = deque(maxlen=1000)
-        self.value_patterns = defaultdict(list)
-        self.address_patterns = defaultdict(dict)
+    def __init__(self, gas_price_window: int = GAS_PRICE_WINDOW):
+        # Last N gas prices; rank and mean in O(log N) (CERBERUS_GAS_PRICE_WINDOW)
+        self.gas_price_history = RollingPercentile(gas_price_window)
+        # One window shared by every request: append + rank + mean happen under this lock
+        self._gas_lock = threading.Lock()
+        # Fixed-size histogram per value bucket (was every value, forever)
+        self.value_patterns = ValueHistograms()
+        # Per-sender counters, bounded by CERBERUS_ADDRESS_STATE_MAX / _TTL, locked per shard
+        self.address_patterns = ShardedAddressStateStore()
+        # Byte-level calldata features, memoized per payload (CERBERUS_CALLDATA_CACHE_BYTES)
+        self.calldata = CalldataAnalyzer()
         self.temporal_features = {}
         
     def extract_comprehensive_features(self, tx_data: Dict) -> Dict[str, Any]:
@@ -136,22 +147,20 @@ class AdvancedFeatureExtractor:
         
         # Gas price trend analysis
         gas_price = self._safe_int_conversion(tx_data.get('gasPrice', 0))
-        self.gas_price_history.append(gas_price)
-        
         gas_price_percentile = 50
-        if len(self.gas_price_history) > 10:
-            sorted_prices = sorted(self.gas_price_history)
-            try:
-                gas_price_percentile = (sorted_prices.index(gas_price) / len(sorted_prices)) * 100
-            except ValueError:
-                gas_price_percentile = 50
+        with self._gas_lock:
+            self.gas_price_history.append(gas_price)
+            if len(self.gas_price_history) > 10:
+                # Share of the window strictly below this price (duplicates rank at their first position)
+                gas_price_percentile = self.gas_price_history.percentile(gas_price)
+            gas_price_mean = self.gas_price_history.mean()
         
         return {
             'hour_of_day': hour,
             'is_weekend': is_weekend,
             'is_night_time': is_night,
             'gas_price_percentile': gas_price_percentile,
-            'gas_price_deviation': abs(gas_price - np.mean(list(self.gas_price_history))) if self.gas_price_history else 0
+            'gas_price_deviation': abs(gas_price - gas_price_mean)
         }
     
     def _extract_pattern_features(self, tx_data: Dict) -> Dict[str, Any]:
@@ -161,35 +170,22 @@ class AdvancedFeatureExtractor:
         value_eth = self._safe_int_conversion(tx_data.get('value', 0)) / 1e18
         
         # Track address patterns
+        from_tx_count, from_total_value, address_age_hours = 0, 0, 0
         if from_addr:
-            if from_addr not in self.address_patterns:
-                self.address_patterns[from_addr] = {
-                    'tx_count': 0,
-                    'total_value': 0,
-                    'avg_gas_price': 0,
-                    'contract_interactions': 0,
-                    'first_seen': datetime.now(),
-                    'last_seen': datetime.now()
-                }
-            
-            pattern = self.address_patterns[from_addr]
-            pattern['tx_count'] += 1
-            pattern['total_value'] += value_eth
-            pattern['last_seen'] = datetime.now()
-            
-            if tx_data.get('to') is None:
-                pattern['contract_interactions'] += 1
+            from_tx_count, from_total_value, address_age_hours = self.address_patterns.observe(
+                from_addr, value_eth, tx_data.get('to') is None
+            )
         
         # Value pattern analysis
         value_bucket = self._get_value_bucket(value_eth)
-        self.value_patterns[value_bucket].append(value_eth)
+        self.value_patterns.observe(value_bucket, value_eth)
         
         return {
-            'from_tx_count': self.address_patterns.get(from_addr, {}).get('tx_count', 0),
-            'from_total_value': self.address_patterns.get(from_addr, {}).get('total_value', 0),
+            'from_tx_count': from_tx_count,
+            'from_total_value': from_total_value,
             'value_bucket': value_bucket,
             'is_round_number': self._is_round_number(value_eth),
-            'address_age_hours': self._get_address_age_hours(from_addr)
+            'address_age_hours': address_age_hours
         }
     
     def _extract_network_features(self, tx_data: Dict) -> Dict[str, Any]:
@@ -210,10 +206,13 @@ class AdvancedFeatureExtractor:
         
         has_suspicious_signature = function_signature in suspicious_patterns
         
+        # data_entropy (bits per byte), zero_byte_ratio, selector_id, push_density (creation code)
+        calldata = self.calldata.analyze(data, tx_data.get('to') is None)
+        
         return {
             'function_signature': function_signature,
             'has_suspicious_signature': has_suspicious_signature,
-            'data_entropy': self._calculate_entropy(data),
+            **calldata,
             'has_proxy_pattern': self._detect_proxy_pattern(data)
         }
     
@@ -265,30 +264,6 @@ class AdvancedFeatureExtractor:
         """Check if value is a round number"""
         return value in [0.1, 0.5, 1.0, 5.0, 10.0, 50.0, 100.0]
     
-    def _get_address_age_hours(self, address: str) -> float:
-        """Get address age in hours"""
-        if address in self.address_patterns:
-            first_seen = self.address_patterns[address]['first_seen']
-            return (datetime.now() - first_seen).total_seconds() / 3600
-        return 0
-    
-    def _calculate_entropy(self, data: str) -> float:
-        """Calculate Shannon entropy of data"""
-        if not data or len(data) < 2:
-            return 0
-        
-        from collections import Counter
-        counts = Counter(data)
-        length = len(data)
-        
-        entropy = 0
-        for count in counts.values():
-            p = count / length
-            if p > 0:
-                entropy -= p * np.log2(p)
-        
-        return entropy
-    
     def _detect_proxy_pattern(self, data: str) -> bool:
         """Detect proxy contract patterns"""
         proxy_signatures = [
@@ -303,11 +278,38 @@ class AdvancedFeatureExtractor:
 
 # ========== Integration: IsolationForest model loader/trainer (from final-ai-sentinel.py) ==========
 ISOLATION_MODEL_PATH = 'model.joblib'
+# Array-backed copy of the same forest (directory of .npy files, memory-mapped on load);
+# loading it needs neither sklearn nor pandas
+ISOLATION_COMPILED_PATH = 'model_isolation_compiled'
+ISOLATION_FEATURES = ['gasPrice', 'gasUsed', 'value', 'isContractCreation']
 isolation_model = None
 
+# 'background' (default): bind immediately and load/train the isolation model in a thread,
+# serving rules-only verdicts until it is ready. 'eager': load before the app is importable.
+MODEL_LOADING = os.environ.get('CERBERUS_MODEL_LOADING', 'background')
+
+# Readiness reported on /health
+model_status = {
+    'state': 'not_started',     # not_started | loading | ready | failed
+    'source': None,             # compiled | joblib | trained
+    'load_seconds': None,
+    'error': None
+}
+_model_loader = None
+_model_loader_pid = None
+_model_loader_lock = threading.Lock()
+
+# Verdicts for re-submitted transactions (CERBERUS_VERDICT_CACHE_SIZE / _TTL). Created before
+# the loader starts because a finished load invalidates it.
+verdict_cache = VerdictCache()
+
+# Also look verdicts up in threat_reports on an in-memory miss (stores the full verdict per row)
+VERDICT_CACHE_DB = os.environ.get('CERBERUS_VERDICT_CACHE_DB', '0') == '1'
+
 def create_and_train_isolation_model():
     """Create and train model if missing (IsolationForest)."""
     try:
+        import pandas as pd
         from sklearn.ensemble import IsolationForest
     except Exception as e:
         logger.error("scikit-learn not installed or import failed: %s", e)
@@ -345,29 +347,84 @@ def create_and_train_isolation_model():
 
     new_model = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
     new_model.fit(df)
+    import joblib
     joblib.dump(new_model, ISOLATION_MODEL_PATH)
     logger.info("IsolationForest model created and saved at %s", ISOLATION_MODEL_PATH)
-    return new_model
+    return compile_isolation_model(new_model)
+
+def compile_isolation_model(model):
+    """Flatten a fitted IsolationForest for serving and cache the arrays next to the pickle"""
+    compiled = compile_tree_model(model)
+    try:
+        compiled.save(ISOLATION_COMPILED_PATH)
+    except Exception as e:
+        logger.warning("Could not cache compiled isolation model: %s", e)
+    return compiled
 
 def load_or_create_isolation_model():
     global isolation_model
+    compiled_meta = os.path.join(ISOLATION_COMPILED_PATH, ARRAYS_META)
+    started = time.time()
+    model_status.update(state='loading', error=None)
     try:
-        if os.path.exists(ISOLATION_MODEL_PATH):
-            isolation_model = joblib.load(ISOLATION_MODEL_PATH)
+        if os.path.exists(compiled_meta) and (
+            not os.path.exists(ISOLATION_MODEL_PATH)
+            or os.path.getmtime(compiled_meta) >= os.path.getmtime(ISOLATION_MODEL_PATH)
+        ):
+            isolation_model = CompiledIsolationForest.load(ISOLATION_COMPILED_PATH)
+            model_status['source'] = 'compiled'
+            logger.info("✅ Compiled isolation model loaded successfully")
+        elif os.path.exists(ISOLATION_MODEL_PATH):
+            import joblib
+            isolation_model = compile_isolation_model(joblib.load(ISOLATION_MODEL_PATH))
+            model_status['source'] = 'joblib'
             logger.info("✅ Isolation model loaded successfully")
         else:
             logger.info("⚠️ Isolation model file not found, creating new model...")
             isolation_model = create_and_train_isolation_model()
+            model_status['source'] = 'trained'
     except Exception as e:
         logger.error("Error loading or creating isolation model: %s", e)
         try:
             isolation_model = create_and_train_isolation_model()
+            model_status['source'] = 'trained'
         except Exception as e2:
             logger.error("Failed to create isolation model: %s", e2)
             isolation_model = None
+            model_status['error'] = str(e2)
+
+    model_status['load_seconds'] = round(time.time() - started, 3)
+    model_status['state'] = 'ready' if isolation_model is not None else 'failed'
+    if isolation_model is not None:
+        logger.info(f"🧠 Isolation model ready in {model_status['load_seconds']}s ({model_status['source']})")
+        # Rules-only verdicts cached while loading must not outlive the switch to ensemble_ml
+        verdict_cache.invalidate('isolation model loaded')
 
-# Initialize isolation model early
-load_or_create_isolation_model()
+def start_isolation_model_loader():
+    """
+    Load (or train) the isolation model in a daemon thread. Called at import and
+    before each request: threads do not survive fork, so a prefork worker forked
+    while the master was still loading starts its own loader.
+    """
+    global _model_loader, _model_loader_pid
+    pid = os.getpid()
+    if isolation_model is not None or _model_loader_pid == pid:
+        return
+
+    with _model_loader_lock:
+        if isolation_model is not None or _model_loader_pid == pid:
+            return
+        model_status['state'] = 'loading'
+        _model_loader = threading.Thread(
+            target=load_or_create_isolation_model, name='cerberus-model-loader', daemon=True
+        )
+        _model_loader_pid = pid
+        _model_loader.start()
+
+if MODEL_LOADING == 'eager':
+    load_or_create_isolation_model()
+else:
+    start_isolation_model_loader()
 
 # ========== Ensemble and detectors (unchanged structure, with AnomalyDetector updated) ==========
 class MultiModelEnsemble:
@@ -388,6 +445,7 @@ class MultiModelEnsemble:
             'behavioral_analyzer': 0.15,
             'meta_learner': 0.1
         }
+        # deque.append / len are atomic, so no lock for the history
         self.prediction_history = deque(maxlen=1000)
         
     def predict_ensemble(self, features: Dict[str, Any]) -> EnsembleResult:
@@ -543,64 +601,118 @@ class RuleBasedDetector:
 class AnomalyDetector:
     """Statistical anomaly detection enhanced with IsolationForest (if available)"""
     
+    NUMERIC_FEATURES = ('gas_price_gwei', 'value_eth', 'gas_limit', 'data_size')
+    
     def __init__(self):
-        self.feature_stats = defaultdict(lambda: {'mean': 0, 'std': 1, 'count': 0})
+        # Online count / mean / std per numeric feature. Every row updates every feature, so one
+        # count; the recurrence is sequential, so it runs on two fixed lists of Python floats
+        # (cheaper than 4-wide NumPy ops per row) under one lock
+        self._count = 0
+        self._mean = [0.0] * len(self.NUMERIC_FEATURES)
+        self._std = [1.0] * len(self.NUMERIC_FEATURES)
+        self._lock = threading.Lock()
+        # Isolation model input rows, one growable buffer per thread
+        self._buffers = threading.local()
+    
+    @property
+    def feature_stats(self):
+        with self._lock:
+            return {
+                feature: {'mean': self._mean[k], 'std': self._std[k], 'count': self._count}
+                for k, feature in enumerate(self.NUMERIC_FEATURES)
+            }
     
     def predict(self, features: Dict[str, Any]) -> ModelPrediction:
         """Anomaly-based prediction using both statistical z-score and isolation model if present"""
-        anomaly_score = 0
-        feature_importance = {}
-        
-        numeric_features = ['gas_price_gwei', 'value_eth', 'gas_limit', 'data_size']
+        return self.predict_batch([features])[0]
+    
+    def predict_batch(self, feature_rows: List[Dict[str, Any]]) -> List[ModelPrediction]:
+        """
+        predict() for many rows in one call: the same results as calling predict()
+        on each row in order, with one isolation model pass over the whole batch
+        """
+        statistical = self._update_statistics(feature_rows)
+        ml_confidences = self._isolation_confidences(feature_rows)
         
-        # statistical anomaly contributions
-        for feature in numeric_features:
-            value = features.get(feature, 0)
-            stats = self.feature_stats[feature]
+        predictions = []
+        for (anomaly_score, feature_importance), ml_confidence in zip(statistical, ml_confidences):
+            if ml_confidence is not None:
+                feature_importance['isolation_ml'] = ml_confidence / 100
+            else:
+                ml_confidence = 0.0
             
-            if stats['count'] > 10:
-                z_score = abs((value - stats['mean']) / max(stats['std'], 0.1))
-                anomaly_contribution = min(z_score * 10, 30)
-                anomaly_score += anomaly_contribution
-                feature_importance[feature] = anomaly_contribution / 30
+            # Combine contributions: weight ML and statistical
+            combined_confidence = min(100, anomaly_score * 0.8 + ml_confidence * 0.9)
             
-            # Update statistics (online)
-            stats['count'] += 1
-            stats['mean'] = (stats['mean'] * (stats['count'] - 1) + value) / stats['count']
-            variance = ((stats['std'] ** 2) * (stats['count'] - 1) + (value - stats['mean']) ** 2) / stats['count']
-            stats['std'] = np.sqrt(variance)
-        
+            predictions.append(ModelPrediction(
+                model_name='anomaly_detector',
+                confidence=float(min(combined_confidence, 100)),
+                threat_category='ANOMALOUS_BEHAVIOR' if combined_confidence > 30 else 'NORMAL',
+                threat_level=min(int(combined_confidence / 20), 5),
+                reasoning=f'Stat anomaly: {anomaly_score:.1f}; ML_conf: {ml_confidence:.1f}',
+                feature_importance=feature_importance
+            ))
+        return predictions
+    
+    def _update_statistics(self, feature_rows):
+        """z-score contributions per row against the running stats, then the online update"""
+        names = self.NUMERIC_FEATURES
+        width = len(names)
+        sqrt = math.sqrt
+        results = []
+        with self._lock:
+            mean, std, count = self._mean, self._std, self._count
+            for features in feature_rows:
+                anomaly_score = 0
+                feature_importance = {}
+                scored = count > 10
+                count += 1
+                for k in range(width):
+                    value = features.get(names[k], 0)
+                    feature_mean, feature_std = mean[k], std[k]
+                    
+                    if scored:
+                        z_score = abs((value - feature_mean) / max(feature_std, 0.1))
+                        anomaly_contribution = min(z_score * 10, 30)
+                        anomaly_score += anomaly_contribution
+                        feature_importance[names[k]] = anomaly_contribution / 30
+                    
+                    # Online update. `** 2` (C pow) rather than x * x, which rounds differently
+                    # in the last bit for ~0.1% of inputs: scores stay identical to the dict version
+                    feature_mean = (feature_mean * (count - 1) + value) / count
+                    mean[k] = feature_mean
+                    std[k] = sqrt(((feature_std ** 2) * (count - 1) + (value - feature_mean) ** 2) / count)
+                results.append((anomaly_score, feature_importance))
+            self._count = count
+        return results
+    
+    def _buffer(self, n_rows):
+        buffer = getattr(self._buffers, 'rows', None)
+        if buffer is None or len(buffer) < n_rows:
+            buffer = self._buffers.rows = np.empty((max(n_rows, 64), len(ISOLATION_FEATURES)), dtype=np.float64)
+        return buffer[:n_rows]
+    
+    def _isolation_confidences(self, feature_rows):
+        """0-100 isolation model risk per row, or None per row when there is no model (or it failed)"""
         # isolation forest (ML) integration (if isolation_model loaded)
-        ml_confidence = 0.0
+        model = isolation_model
+        if model is None:
+            return [None] * len(feature_rows)
         try:
-            global isolation_model
-            if isolation_model is not None:
-                # prepare features dataframe similar to training
-                df = pd.DataFrame([{
-                    'gasPrice': features.get('gas_price_gwei', 0) * 1e9,
-                    'gasUsed': features.get('gas_limit', 0),
-                    'value': features.get('value_eth', 0),
-                    'isContractCreation': 1 if features.get('is_contract_creation') else 0
-                }])
-                score = float(isolation_model.decision_function(df)[0])
-                # Convert model score to 0-100-ish risk: higher anomaly -> lower decision_function -> higher risk
-                ml_confidence = max(0, min(100, (1 - score) * 50))
-                feature_importance['isolation_ml'] = ml_confidence / 100
+            # feature rows in the column order the forest was trained on (ISOLATION_FEATURES)
+            rows = self._buffer(len(feature_rows))
+            for i, features in enumerate(feature_rows):
+                row = rows[i]
+                row[0] = features.get('gas_price_gwei', 0) * 1e9
+                row[1] = features.get('gas_limit', 0)
+                row[2] = features.get('value_eth', 0)
+                row[3] = 1 if features.get('is_contract_creation') else 0
+            scores = model.decision_function(rows).tolist()
         except Exception as e:
             logger.warning("Isolation model prediction failed: %s", e)
-            ml_confidence = 0.0
-        
-        # Combine contributions: weight ML and statistical
-        combined_confidence = min(100, anomaly_score * 0.8 + ml_confidence * 0.9)
-        
-        return ModelPrediction(
-            model_name='anomaly_detector',
-            confidence=float(min(combined_confidence, 100)),
-            threat_category='ANOMALOUS_BEHAVIOR' if combined_confidence > 30 else 'NORMAL',
-            threat_level=min(int(combined_confidence / 20), 5),
-            reasoning=f'Stat anomaly: {anomaly_score:.1f}; ML_conf: {ml_confidence:.1f}',
-            feature_importance=feature_importance
-        )
+            return [None] * len(feature_rows)
+        # Convert model score to 0-100-ish risk: higher anomaly -> lower decision_function -> higher risk
+        return [max(0, min(100, (1 - score) * 50)) for score in scores]
 
 class PatternMatcher:
     """Pattern-based threat detection"""
@@ -698,82 +810,23 @@ class MetaLearner:
             feature_importance={'meta_complexity': complexity / 100}
         )
 
-class DatabaseManager:
-    """Advanced database management for threat intelligence"""
-    
-    def __init__(self, db_path: str = 'threat_intelligence.db'):
-        self.db_path = db_path
-        self._initialize_db()
-    
-    def _initialize_db(self):
-        """Initialize database tables"""
-        with self._get_connection() as conn:
-            conn.executescript('''
-                CREATE TABLE IF NOT EXISTS threat_reports (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tx_hash TEXT UNIQUE,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    confidence REAL,
-                    threat_category TEXT,
-                    threat_level INTEGER,
-                    is_malicious BOOLEAN,
-                    features TEXT,
-                    model_predictions TEXT
-                );
-                
-                CREATE TABLE IF NOT EXISTS model_performance (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    model_name TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    accuracy REAL,
-                    precision_score REAL,
-                    recall REAL,
-                    f1_score REAL
-                );
-                
-                CREATE INDEX IF NOT EXISTS idx_tx_hash ON threat_reports(tx_hash);
-                CREATE INDEX IF NOT EXISTS idx_timestamp ON threat_reports(timestamp);
-            ''')
-    
-    @contextmanager
-    def _get_connection(self):
-        """Get database connection with proper handling"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
-    
-    def store_threat_report(self, tx_hash: str, result: EnsembleResult, features: Dict):
-        """Store threat report in database"""
-        with self._get_connection() as conn:
-            conn.execute('''
-                INSERT OR REPLACE INTO threat_reports 
-                (tx_hash, confidence, threat_category, threat_level, is_malicious, features, model_predictions)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                tx_hash,
-                result.final_confidence,
-                result.threat_category,
-                result.threat_level,
-                result.is_malicious,
-                json.dumps(features),
-                json.dumps([asdict(pred) for pred in result.individual_predictions])
-            ))
-            conn.commit()
-
 # Initialize components
 feature_extractor = AdvancedFeatureExtractor()
 ensemble = MultiModelEnsemble()
 db_manager = DatabaseManager()
+if VERDICT_CACHE_DB:
+    verdict_cache.second_tier = db_manager
 
 MODEL_VERSION = "v2.0.0-advanced"
 MODEL_HASH = hashlib.sha256(f"cerberus-ai-ensemble-{MODEL_VERSION}".encode()).hexdigest()
 
+def current_detection_mode() -> str:
+    return 'ensemble_ml' if isolation_model is not None else 'rules_only'
+
 @app.before_request
 def before_request():
     g.start_time = time.time()
+    start_isolation_model_loader()
 
 @app.after_request
 def after_request(response):
@@ -795,7 +848,22 @@ def health_check():
         'models_loaded': list(ensemble.models.keys()),
         'prediction_history_size': len(ensemble.prediction_history),
         'feature_stats_count': len(feature_extractor.address_patterns),
-        'isolation_model_loaded': isolation_model is not None
+        'isolation_model_loaded': isolation_model is not None,
+        'isolation_model_status': model_status['state']
+    })
+
+@app.route('/health', methods=['GET'])
+def readiness():
+    """
+    Readiness probe. Always 200 once the server is bound: verdicts are served
+    rules-only until the isolation model finishes loading (ready=false).
+    """
+    return jsonify({
+        'status': 'healthy',
+        'ready': isolation_model is not None,
+        'detection_mode': 'ensemble_ml' if isolation_model is not None else 'rules_only',
+        'model': dict(model_status),
+        'timestamp': datetime.utcnow().isoformat()
     })
 
 @app.route('/predict', methods=['POST'])
@@ -812,15 +880,20 @@ def predict():
     try:
         tx_hash = data.get('hash', 'unknown')
         
+        # Re-submitted transaction: same verdict, and no second pass through the stateful extractors
+        detection_mode = current_detection_mode()
+        cache_version = f"{MODEL_VERSION}/{detection_mode}"
+        fingerprint = tx_fingerprint(data) if verdict_cache.enabled else None
+        cached = verdict_cache.get(tx_hash, fingerprint, cache_version)
+        if cached is not None:
+            return jsonify(cached)
+        
         # Extract comprehensive features
         features = feature_extractor.extract_comprehensive_features(data)
         
         # Generate ensemble prediction
         result = ensemble.predict_ensemble(features)
         
-        # Store in database
-        db_manager.store_threat_report(tx_hash, result, features)
-        
         # Format response
         response = {
             'danger_score': result.final_confidence,
@@ -832,6 +905,7 @@ def predict():
             'anomaly_score': 1 - (result.final_confidence / 100),
             'model_version': MODEL_VERSION,
             'model_hash': MODEL_HASH,
+            'detection_mode': detection_mode,
             'analysis_timestamp': datetime.utcnow().isoformat(),
             'ensemble_details': {
                 'individual_predictions': [asdict(pred) for pred in result.individual_predictions],
@@ -842,6 +916,16 @@ def predict():
             'threat_signature': f"{result.threat_category}: {'CRITICAL' if result.final_confidence > 90 else 'HIGH' if result.final_confidence > 75 else 'MEDIUM' if result.final_confidence > 50 else 'LOW'} - Advanced ensemble analysis"
         }
         
+        # Store in database
+        db_manager.store_threat_report(
+            tx_hash, result, features,
+            model_version=cache_version,
+            fingerprint=fingerprint,
+            verdict=response if VERDICT_CACHE_DB else None,
+            from_address=data.get('from')
+        )
+        verdict_cache.put(tx_hash, fingerprint, cache_version, response)
+        
         logger.info(f"Analysis: {tx_hash} | Danger: {result.final_confidence:.1f} | Category: {result.threat_category} | Consensus: {result.model_consensus:.2f}")
         
         return jsonify(response)
@@ -860,7 +944,7 @@ def analyze_transaction(tx_data: Dict[str, Any]) -> Dict[str, Any]:
     try:
         features = feature_extractor.extract_comprehensive_features(tx_data)
         result = ensemble.predict_ensemble(features)
-        db_manager.store_threat_report(tx_data.get('hash', 'unknown'), result, features)
+        db_manager.store_threat_report(tx_data.get('hash', 'unknown'), result, features, from_address=tx_data.get('from'))
         return {
             'danger_score': result.final_confidence,
             'threat_category': result.threat_category,
@@ -879,34 +963,104 @@ def analyze_transaction(tx_data: Dict[str, Any]) -> Dict[str, Any]:
 
 @app.route('/analytics', methods=['GET'])
 def get_analytics():
-    """Get advanced analytics and model performance"""
+    """Get advanced analytics and model performance (?window=5m|1h|24h|7d, default 24h)"""
+    window = request.args.get('window', '24h')
     try:
-        with db_manager._get_connection() as conn:
-            recent_stats = conn.execute('''
-                SELECT 
-                    COUNT(*) as total_reports,
-                    AVG(confidence) as avg_confidence,
-                    SUM(CASE WHEN is_malicious THEN 1 ELSE 0 END) as malicious_count,
-                    threat_category,
-                    COUNT(*) as category_count
-                FROM threat_reports 
-                WHERE timestamp > datetime('now', '-24 hours')
-                GROUP BY threat_category
-            ''').fetchall()
+        window_seconds = parse_window(window)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'status': 'invalid_input'}), 400
+    
+    try:
+        # Merged from per-minute rollups: cost depends on the window, not the traffic
+        recent_stats = db_manager.recent_statistics(window_seconds)
         
         return jsonify({
-            'recent_statistics': [dict(row) for row in recent_stats],
+            'window': window,
+            'recent_statistics': recent_stats,
             'model_performance': ensemble.model_weights,
             'system_metrics': {
                 'total_predictions': len(ensemble.prediction_history),
                 'unique_addresses': len(feature_extractor.address_patterns),
                 'gas_price_samples': len(feature_extractor.gas_price_history)
-            }
+            },
+            'persistence': db_manager.stats(),
+            'address_state': feature_extractor.address_patterns.stats(),
+            'value_patterns': feature_extractor.value_patterns.stats(),
+            'verdict_cache': verdict_cache.stats(),
+            'calldata': feature_extractor.calldata.stats(),
+            'rate_limits': {route: limiter.stats() for route, limiter in rate_limiters.items()}
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Page size bounds for /reports (format=ndjson pages internally and ignores the bound)
+REPORTS_MAX_LIMIT = 1000
+
+def _parse_flag(value):
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Invalid flag {value!r}: use 1/0 or true/false")
+
+def _parse_int(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+
+@app.route('/reports', methods=['GET'])
+@rate_limit(max_requests=100, window=60)
+def get_reports():
+    """
+    Stored threat reports, newest first.
+    Filters: category, malicious, threat_level, sender, since, until (epoch or ISO-8601).
+    Paging: limit (default 100) + cursor from the previous page's next_cursor.
+    format=ndjson streams every match (or the first `limit`) one report per line.
+    detail=0 leaves out features, member predictions and the stored verdict.
+    """
+    args = request.args
+    try:
+        filters = {
+            'category': args.get('category'),
+            'malicious': _parse_flag(args['malicious']) if 'malicious' in args else None,
+            'threat_level': _parse_int('threat_level', args['threat_level']) if 'threat_level' in args else None,
+            'sender': args.get('sender'),
+            'since': parse_timestamp(args['since']) if 'since' in args else None,
+            'until': parse_timestamp(args['until']) if 'until' in args else None,
+            'detail': _parse_flag(args.get('detail', '1'))
+        }
+        cursor = args.get('cursor')
+        if cursor:
+            parse_cursor(cursor)
+        
+        if args.get('format') == 'ndjson':
+            max_rows = _parse_int('limit', args['limit']) if 'limit' in args else None
+            
+            def stream():
+                for report in db_manager.iter_reports(max_rows=max_rows, cursor=cursor, **filters):
+                    yield json.dumps(report) + '\n'
+            
+            return Response(stream(), mimetype='application/x-ndjson')
+        
+        limit = _parse_int('limit', args.get('limit', 100))
+        if not 1 <= limit <= REPORTS_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {REPORTS_MAX_LIMIT}")
+    except ValueError as e:
+        return jsonify({'error': str(e), 'status': 'invalid_input'}), 400
+    
+    try:
+        reports, next_cursor = db_manager.query_reports(limit=limit, cursor=cursor, **filters)
+        return jsonify({
+            'reports': reports,
+            'count': len(reports),
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/test', methods=['POST'])
 def test():
     """Test endpoint dengan transaksi berbahaya (uses analyze_transaction)"""
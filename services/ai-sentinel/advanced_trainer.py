@@ -7,12 +7,13 @@ from sklearn.ensemble import IsolationForest, RandomForestClassifier, GradientBo
 from sklearn.neural_network import MLPClassifier
 from sklearn.metrics import classification_report
 from sklearn.utils import resample
-import joblib
-import json
 from datetime import datetime
 import logging
 import warnings
 
+from model_bundle import write_model_bundle, MODEL_BUNDLE_DIR
+from tx_features import PIPELINE as FEATURES, MODEL_FEATURES, dataset_fields
+
 warnings.filterwarnings('ignore')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,23 +33,13 @@ class CerberusAdvancedTrainer:
         """Load and prepare data"""
         logger.info(f"📂 Loading {self.data_path}...")
 
-        df = pd.read_csv(self.data_path)
+        # round_trip: parse floats exactly as written, so features match what the collector computed
+        df = pd.read_csv(self.data_path, float_precision='round_trip')
         logger.info(f"✅ Loaded {len(df)} transactions")
 
         df = self.engineer_features(df)
 
-        feature_columns = [
-            'value', 'gas', 'gasPrice', 'gasUsed', 'nonce',
-            'isContractCreation', 'inputLength', 'hasInput',
-            'logsCount', 'gasEfficiency', 'valueDensity', 'gasPrice_gwei'
-        ]
-
-        # Ensure any missing feature columns are created with zeros if absent
-        for col in feature_columns:
-            if col not in df.columns:
-                df[col] = 0
-            else:
-                df[col] = df[col].fillna(0)
+        feature_columns = list(MODEL_FEATURES)
 
         # If label column missing, create dummy (all zeros) — but ideally your CSV has 'is_malicious'
         if 'is_malicious' not in df.columns:
@@ -70,39 +61,9 @@ class CerberusAdvancedTrainer:
         return X, y
 
     def engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Feature engineering"""
-        # Defensive: ensure numeric columns exist
-        for col in ['value', 'gas', 'gasPrice', 'gasUsed', 'nonce', 'logsCount']:
-            if col not in df.columns:
-                df[col] = 0
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-        # Basic engineered features
-        df['value_to_gas_ratio'] = df['value'] / (df['gas'] + 1)
-        df['gasUsed_to_gas_ratio'] = df['gasUsed'] / (df['gas'] + 1)
-
-        df['log_value'] = np.log1p(df['value'])
-        df['log_gas'] = np.log1p(df['gas'])
-        df['log_gasPrice'] = np.log1p(df.get('gasPrice', pd.Series(0)))
-
-        median_gas = df['gasPrice'].median() if 'gasPrice' in df.columns else 0
-        df['gasPrice_deviation'] = np.abs(df.get('gasPrice', 0) - median_gas) / (median_gas + 1)
-
-        mean_value = df['value'].mean()
-        df['value_deviation'] = np.abs(df['value'] - mean_value) / (mean_value + 1)
-
-        df['gas_value_interaction'] = df['gas'] * df['value']
-        df['gasPrice_value_interaction'] = df.get('gasPrice', 0) * df['value']
-
-        # Some optional derived columns used in feature list — create safe defaults
-        df['isContractCreation'] = df.get('isContractCreation', 0)
-        df['inputLength'] = df.get('inputLength', 0)
-        df['hasInput'] = df.get('hasInput', 0)
-        df['logsCount'] = df.get('logsCount', 0)
-        # Normalize or compute gasEfficiency, valueDensity, gasPrice_gwei if not present
-        df['gasEfficiency'] = df.get('gasEfficiency', df['value_to_gas_ratio'])
-        df['valueDensity'] = df.get('valueDensity', df['value'] / (df['value'] + df['gas'] + 1))
-        df['gasPrice_gwei'] = df.get('gasPrice_gwei', df.get('gasPrice', 0) / (10 ** 9 + 1))
+        """Feature engineering: the shared schema's NumPy path, the same features serving computes"""
+        for name, column in FEATURES.transform_columns(dataset_fields(df)).items():
+            df[name] = column
 
         return df
 
@@ -309,47 +270,38 @@ class CerberusAdvancedTrainer:
 
         return accuracy
 
-    def save_models(self):
-        """Save models"""
+    def save_models(self, directory: str = MODEL_BUNDLE_DIR):
+        """Save the ensemble as one versioned bundle (see model_bundle.py)"""
         logger.info("\n💾 Saving models...")
 
-        for name, info in self.models.items():
-            if name == 'ensemble':
-                continue
-
-            filename = f'model_{name}.joblib'
-            try:
-                joblib.dump(info['model'], filename)
-                logger.info(f"   ✅ {filename}")
-            except Exception as e:
-                logger.warning(f"   Failed to save {filename}: {e}")
-
-        # Save scaler separately
-        try:
-            joblib.dump(self.scaler, 'scaler.joblib')
-            logger.info(f"   ✅ scaler.joblib")
-        except Exception as e:
-            logger.warning(f"   Failed to save scaler: {e}")
-
-        metadata = {
-            'training_date': datetime.now().isoformat(),
-            'feature_names': self.feature_names,
-            'models': {
-                name: {
-                    'accuracy': float(info.get('accuracy', 0)),
-                    'type': info.get('type', 'unknown')
-                }
-                for name, info in self.models.items()
-            },
-            'ensemble_weights': self.models.get('ensemble', {}).get('weights', {})
+        model_info = {
+            name: {
+                'accuracy': float(info.get('accuracy', 0)),
+                'type': info.get('type', 'unknown')
+            }
+            for name, info in self.models.items()
         }
 
         try:
-            with open('model_metadata.json', 'w') as f:
-                json.dump(metadata, f, indent=2)
-            logger.info(f"   ✅ model_metadata.json")
+            manifest = write_model_bundle(
+                directory,
+                {name: self.models[name]['model'] for name in
+                 ('isolation_forest', 'random_forest', 'gradient_boosting', 'neural_network')},
+                self.scaler,
+                feature_names=self.feature_names,
+                ensemble_weights=self.models.get('ensemble', {}).get('weights', {}),
+                model_info=model_info,
+                training_date=datetime.now().isoformat()
+            )
         except Exception as e:
-            logger.warning(f"   Failed to write metadata: {e}")
+            logger.error(f"   Failed to write model bundle: {e}")
+            raise
+
+        logger.info(f"   ✅ {directory}/ (version {manifest['version']})")
+        for name, info in manifest['members'].items():
+            logger.info(f"      {name}: {len(info['files'])} files, "
+                        f"{info['latency_ms']['1']:.3f} ms/row, {info['latency_ms']['1000']:.3f} ms/1k rows")
+        return manifest
 
     def train_all(self):
         """Train all models"""
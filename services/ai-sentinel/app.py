@@ -6,11 +6,22 @@ FIXED: Aggressive detection for hackathon demo
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
 import numpy as np
 import os
 import logging
+import threading
 from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from microbatch import MicroBatchScheduler
+from compiled_models import process_memory
+from model_bundle import (
+    load_serving_ensemble, migrate_legacy_models, ModelBundleError,
+    MODEL_BUNDLE_DIR, BUNDLE_MANIFEST, LEGACY_METADATA_FILE
+)
+from model_reload import ModelReloader
+from tx_features import PIPELINE as FEATURES, FEATURE_NAMES
+from verdict_cache import VerdictCache, ApproximateVerdictCache, tx_fingerprint
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,94 +29,160 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+MAX_BATCH_SIZE = int(os.environ.get('CERBERUS_MAX_BATCH_SIZE', 1000))
+
+# Micro-batching of concurrent /predict calls (set CERBERUS_MICROBATCH=0 to disable)
+MICROBATCH_ENABLED = os.environ.get('CERBERUS_MICROBATCH', '1') != '0'
+MICROBATCH_WINDOW_MS = float(os.environ.get('CERBERUS_MICROBATCH_WINDOW_MS', 2))
+MICROBATCH_MAX_SIZE = int(os.environ.get('CERBERUS_MICROBATCH_MAX_SIZE', 64))
+
+# Tree inference backend (IsolationForest, RF, GB): 'compiled' (flattened NumPy trees) or 'sklearn'
+TREE_BACKEND = os.environ.get('CERBERUS_TREE_BACKEND', 'compiled')
+
+# Neural network backend: 'float32' (exported forward pass) or 'sklearn'
+NN_BACKEND = os.environ.get('CERBERUS_NN_BACKEND', 'float32')
+
+# Hot reload: poll model_bundle/manifest.json every N seconds (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.environ.get('CERBERUS_MODEL_WATCH_INTERVAL', 5))
+# POST /admin/reload needs this token in X-Admin-Token; unset = loopback clients only
+ADMIN_TOKEN = os.environ.get('CERBERUS_ADMIN_TOKEN')
+
+# Features extract_features() produces; a model bundle needing anything else is rejected at load
+SERVING_FEATURES = FEATURE_NAMES
+
 class CerberusAI:
     """Production AI Engine - Enhanced Version"""
     
     def __init__(self):
         logger.info("🐺 Initializing Cerberus AI Engine...")
         
-        self.models_loaded = False
+        # Current ServingEnsemble (None = rule-based mode); replaced as a whole on reload
+        self.ensemble = None
+        self.served_by_version = {}
+        self._served_lock = threading.Lock()
+        
+        # Re-polled pending transactions are answered from here (CERBERUS_VERDICT_CACHE_SIZE / _TTL)
+        self.verdict_cache = VerdictCache()
+        # Near-duplicate bot traffic shares verdicts by feature signature (opt-in: CERBERUS_APPROX_CACHE_SIZE)
+        self.approx_cache = ApproximateVerdictCache()
         
         try:
-            # Try to load ensemble models
-            self.isolation_forest = joblib.load('model_isolation_forest.joblib')
-            self.random_forest = joblib.load('model_random_forest.joblib')
-            self.gradient_boosting = joblib.load('model_gradient_boosting.joblib')
-            self.neural_network = joblib.load('model_neural_network.joblib')
-            self.scaler = joblib.load('scaler.joblib')
-            
-            # Load metadata
-            import json
-            with open('model_metadata.json', 'r') as f:
-                self.metadata = json.load(f)
+            if not os.path.exists(os.path.join(MODEL_BUNDLE_DIR, BUNDLE_MANIFEST)):
+                if not os.path.exists(LEGACY_METADATA_FILE):
+                    raise FileNotFoundError(f"No model bundle at {MODEL_BUNDLE_DIR}/")
+                logger.info(f"📦 Migrating loose model files into {MODEL_BUNDLE_DIR}/")
+                migrate_legacy_models(MODEL_BUNDLE_DIR)
             
-            self.feature_names = self.metadata['feature_names']
-            self.ensemble_weights = self.metadata['ensemble_weights']
+            self.ensemble = self._load_ensemble()
             
-            self.models_loaded = True
             logger.info("✅ All ensemble models loaded successfully")
-            logger.info(f"📊 Feature count: {len(self.feature_names)}")
+            logger.info(f"📊 Feature count: {len(self.ensemble.feature_names)}")
+            logger.info(f"🌲 Tree backend: {self.ensemble.tree_backend}")
+            logger.info(f"🧠 Neural network backend: {self.ensemble.nn_backend}")
             
+        except ModelBundleError as e:
+            # Corrupt or incompatible bundle: never score with it, degrade to rules
+            logger.error(f"❌ Model bundle rejected: {e}")
+            logger.info("🎯 Using ENHANCED RULE-BASED detection")
         except Exception as e:
             logger.warning(f"⚠️  Ensemble models not found: {e}")
             logger.info("🎯 Using ENHANCED RULE-BASED detection (perfect for demo!)")
-            self.models_loaded = False
+        
+        # A bundle written later (or retrained) is picked up without a restart
+        self.reloader = ModelReloader(
+            self._load_ensemble,
+            self._swap_ensemble,
+            directory=MODEL_BUNDLE_DIR,
+            poll_interval=MODEL_WATCH_INTERVAL,
+            loaded_version=self.model_version
+        )
+    
+    @property
+    def models_loaded(self):
+        return self.ensemble is not None
     
-    def extract_features(self, tx_data):
-        """Extract features from transaction"""
+    @property
+    def model_version(self):
+        return self.ensemble.version if self.ensemble is not None else None
+    
+    def _load_ensemble(self):
+        """Load, verify and warm the bundle for the configured backends"""
+        ensemble = load_serving_ensemble(
+            MODEL_BUNDLE_DIR,
+            expected_features=SERVING_FEATURES,
+            tree_backend=TREE_BACKEND,
+            nn_backend=NN_BACKEND
+        )
+        logger.info(f"📦 Model bundle {ensemble.version} loaded from {MODEL_BUNDLE_DIR}/")
+        return ensemble
+    
+    def _swap_ensemble(self, ensemble):
+        # One reference assignment: scoring passes already holding the old ensemble finish on it
+        self.ensemble = ensemble
+        # Their verdicts are still cached under the old version, so they can never be served again
+        self.verdict_cache.invalidate('model reload')
+        self.approx_cache.invalidate('model reload')
+    
+    def _count_served(self, version, n):
+        with self._served_lock:
+            self.served_by_version[version] = self.served_by_version.get(version, 0) + n
+    
+    def _cache_key(self, tx_data, ensemble):
+        """(tx_hash, fingerprint, model version) for the verdict cache, or None if not cacheable"""
+        if not self.verdict_cache.enabled or not isinstance(tx_data, dict):
+            return None
+        version = ensemble.version if ensemble is not None else 'rules'
+        return tx_data.get('hash'), tx_fingerprint(tx_data), version
+    
+    def _approx_key(self, tx_data, ensemble):
+        """(feature signature, model version) for the approximate cache, or None"""
+        if not self.approx_cache.enabled or not isinstance(tx_data, dict):
+            return None
+        signature = self.approx_cache.signature(tx_data)
+        if signature is None:
+            return None
+        return signature, ensemble.version if ensemble is not None else 'rules'
+    
+    def _lookup(self, tx_data, key, ensemble):
+        """Exact verdict for this transaction, else one for a near-duplicate, else None"""
+        if key is not None:
+            cached = self.verdict_cache.get(*key)
+            if cached is not None:
+                return dict(cached)
         
-        # Parse values safely
-        value = float(tx_data.get('value', 0))
-        if isinstance(value, str):
-            try:
-                value = int(value, 16) / 1e18
-            except:
-                value = 0
-        
-        gas = int(tx_data.get('gas', 0) or tx_data.get('gasLimit', 0) or 0)
-        if isinstance(gas, str):
-            gas = int(gas, 16)
-        
-        gas_price = int(tx_data.get('gasPrice', 0) or 0)
-        if isinstance(gas_price, str):
-            gas_price = int(gas_price, 16)
-        
-        nonce = int(tx_data.get('nonce', 0) or 0)
-        if isinstance(nonce, str):
-            nonce = int(nonce, 16)
-        
-        # Core features
-        is_contract = 1 if not tx_data.get('to') else 0
-        input_data = tx_data.get('input', '0x') or tx_data.get('data', '0x') or '0x'
-        input_length = len(input_data)
-        has_input = 1 if input_length > 2 else 0
-        
-        gas_used = int(gas * 0.7)
-        logs_count = 0
-        gas_efficiency = 0.7
-        value_density = value / max(gas_used, 1) if gas_used > 0 else 0
-        gas_price_gwei = gas_price / 1e9
-        
-        features = {
-            'value': value,
-            'gas': gas,
-            'gasPrice': gas_price,
-            'gasUsed': gas_used,
-            'nonce': nonce,
-            'isContractCreation': is_contract,
-            'inputLength': input_length,
-            'hasInput': has_input,
-            'logsCount': logs_count,
-            'gasEfficiency': gas_efficiency,
-            'valueDensity': value_density,
-            'gasPrice_gwei': gas_price_gwei
-        }
+        approx_key = self._approx_key(tx_data, ensemble)
+        if approx_key is not None:
+            cached = self.approx_cache.get(*approx_key)
+            if cached is not None:
+                result = dict(cached)
+                result['tx_hash'] = tx_data.get('hash', 'unknown')
+                result['approximate'] = True
+                return result
         
-        if self.models_loaded:
-            feature_vector = np.array([features[name] for name in self.feature_names]).reshape(1, -1)
-            return feature_vector, features
-        else:
-            return None, features
+        return None
+    
+    def _remember(self, tx_data, key, ensemble, result):
+        """Store a full-model verdict in both caches"""
+        if ensemble is not None and result.get('analysis_method') != 'ensemble_ml_enhanced':
+            # Rule fallback after a failed ML pass: not this version's verdict, score it again next time
+            return
+        if key is not None:
+            self.verdict_cache.put(*key, dict(result))
+        approx_key = self._approx_key(tx_data, ensemble)
+        if approx_key is not None:
+            self.approx_cache.put(*approx_key, dict(result))
+    
+    def cached_verdict(self, tx_data):
+        """Verdict already computed for this transaction (or a near-duplicate) by the current models, or None"""
+        ensemble = self.ensemble
+        return self._lookup(tx_data, self._cache_key(tx_data, ensemble), ensemble)
+    
+    def extract_features(self, tx_data, ensemble=None):
+        """Extract features from transaction (vector ordered for `ensemble`, default the current one)"""
+        
+        if ensemble is None:
+            ensemble = self.ensemble
+        return FEATURES.extract(tx_data, ensemble.feature_names if ensemble is not None else None)
     
     def enhanced_rule_based_detection(self, features):
         """
@@ -356,104 +433,510 @@ class CerberusAI:
         
         return category, description, threat_level, danger_score
     
-    def predict(self, tx_data):
-        """Main prediction with fallback to enhanced rules"""
+    # Lookup tables for the columnar rule engine. Index 0 of every tier means
+    # "rule did not fire"; the remaining entries mirror the scalar branches above.
+    GAS_TIER_THRESHOLDS = (180, 150, 120, 100, 80, 50)
+    GAS_TIER_SCORES = (0, 98, 95, 90, 85, 78, 70)
+    GAS_TIER_CATEGORIES = ("NORMAL", "FRONT_RUNNING", "FRONT_RUNNING", "MEV_ABUSE", "MEV_ABUSE", "MEV_ABUSE", "MEV_ABUSE")
+    GAS_TIER_FACTORS = (
+        None,
+        "EXTREME gas: {gas:.2f} gwei",
+        "CRITICAL gas: {gas:.2f} gwei",
+        "Very high gas: {gas:.2f} gwei",
+        "High gas: {gas:.2f} gwei",
+        "Elevated gas: {gas:.2f} gwei",
+        "Suspicious gas: {gas:.2f} gwei"
+    )
+    GAS_TIER_DESCRIPTIONS = (
+        "Normal transaction",
+        "CRITICAL: Extremely high gas price ({gas:.2f} gwei) - Front-running attack",
+        "CRITICAL: Very high gas price ({gas:.2f} gwei) - Suspected front-running",
+        "HIGH: Very high gas price ({gas:.2f} gwei) - MEV abuse suspected",
+        "HIGH: High gas price ({gas:.2f} gwei) - MEV abuse detected",
+        "MEDIUM: Elevated gas price ({gas:.2f} gwei)",
+        "MEDIUM: Suspicious gas price ({gas:.2f} gwei)"
+    )
+    
+    VALUE_TIER_THRESHOLDS = (100, 50, 10, 1)
+    VALUE_TIER_BOOSTS = (0, 35, 28, 20, 12)
+    VALUE_TIER_CATEGORIES = (None, "RUG_PULL", "SUSPICIOUS_ACTIVITY", "SUSPICIOUS_ACTIVITY", None)
+    VALUE_TIER_FACTORS = (
+        None,
+        "Massive value: {value:.4f} U2U",
+        "Very high value: {value:.4f} U2U",
+        "High value: {value:.4f} U2U",
+        "Notable value: {value:.4f} U2U"
+    )
+    # (description when category was NORMAL, suffix otherwise)
+    VALUE_TIER_DESCRIPTIONS = (
+        (None, None),
+        ("Potential rug pull: Massive value transfer ({value:.4f} U2U)", " + Massive value ({value:.4f} U2U)"),
+        ("Very high value transfer: {value:.4f} U2U", " + Very high value ({value:.4f} U2U)"),
+        (None, " + High value ({value:.4f} U2U)"),
+        (None, None)
+    )
+    
+    CONTRACT_TIER_BOOSTS = (0, 30, 20, 15)
+    CONTRACT_TIER_CATEGORIES = (None, "SMART_CONTRACT_EXPLOIT", "RUG_PULL", "HONEY_POT")
+    CONTRACT_TIER_FACTORS = (None, "Contract with large funds", "Contract with funds", "Suspicious contract gas")
+    CONTRACT_TIER_DESCRIPTIONS = (
+        None,
+        "HIGH RISK: Contract deployment with {value:.4f} U2U",
+        "Potential rug pull: Contract with {value:.4f} U2U",
+        "Potential honey pot: Low gas contract"
+    )
+    
+    COMPLEX_TIER_BOOSTS = (0, 18, 10)
+    COMPLEX_TIER_FACTORS = (None, "Complex transaction (high gas)", "Complex transaction")
+    
+    def feature_columns(self, features_list):
+        """Turn a list of extract_features() dicts into NumPy columns for the batch rule engine"""
         
-        try:
-            feature_vector, features_dict = self.extract_features(tx_data)
+        n = len(features_list)
+        return {
+            name: np.fromiter((f[name] for f in features_list), dtype=np.float64, count=n)
+            for name in ('value', 'gas', 'gasPrice_gwei', 'isContractCreation', 'hasInput')
+        }
+    
+    def enhanced_rule_based_detection_batch(self, columns, explain=True):
+        """
+        Columnar ENHANCED RULE-BASED DETECTION over a whole batch.
+        
+        `columns` maps 'value', 'gas', 'gasPrice_gwei', 'isContractCreation' and
+        'hasInput' to equal-length arrays (feature_columns() output or DataFrame
+        columns). Scores, levels and categories are computed with NumPy; factor
+        lists and signatures are formatted only for rows where a rule fired, and
+        skipped entirely when explain=False (e.g. CSV replay).
+        """
+        
+        value = np.asarray(columns['value'], dtype=np.float64)
+        gas = np.asarray(columns['gas'], dtype=np.float64)
+        gas_price_gwei = np.asarray(columns['gasPrice_gwei'], dtype=np.float64)
+        is_contract = np.asarray(columns['isContractCreation']).astype(bool)
+        has_input = np.asarray(columns['hasInput']).astype(bool)
+        n = len(value)
+        
+        # Gas-price tiers (first matching threshold wins, like the elif chain)
+        gas_tier = np.select(
+            [gas_price_gwei > t for t in self.GAS_TIER_THRESHOLDS],
+            np.arange(1, len(self.GAS_TIER_THRESHOLDS) + 1),
+            default=0
+        )
+        danger_score = np.take(self.GAS_TIER_SCORES, gas_tier)
+        category = np.take(np.array(self.GAS_TIER_CATEGORIES, dtype=object), gas_tier)
+        
+        # Value boosts
+        value_tier = np.select(
+            [value > t for t in self.VALUE_TIER_THRESHOLDS],
+            np.arange(1, len(self.VALUE_TIER_THRESHOLDS) + 1),
+            default=0
+        )
+        danger_score = np.minimum(danger_score + np.take(self.VALUE_TIER_BOOSTS, value_tier), 100)
+        value_category = np.take(np.array(self.VALUE_TIER_CATEGORIES, dtype=object), value_tier)
+        relabel = (gas_tier == 0) & np.take([c is not None for c in self.VALUE_TIER_CATEGORIES], value_tier)
+        category[relabel] = value_category[relabel]
+        
+        # Contract creation
+        contract_tier = np.where(
+            is_contract,
+            np.select([value > 5, value > 1, gas < 100000], [1, 2, 3], default=0),
+            0
+        )
+        danger_score = np.minimum(danger_score + np.take(self.CONTRACT_TIER_BOOSTS, contract_tier), 100)
+        contract_category = np.take(np.array(self.CONTRACT_TIER_CATEGORIES, dtype=object), contract_tier)
+        category = np.where(contract_tier > 0, contract_category, category)
+        
+        # Complex transactions
+        complex_tier = np.where(
+            has_input & ~is_contract,
+            np.select([gas > 500000, gas > 200000], [1, 2], default=0),
+            0
+        )
+        danger_score = np.minimum(danger_score + np.take(self.COMPLEX_TIER_BOOSTS, complex_tier), 100)
+        flash_loan = (complex_tier == 1) & (value > 1)
+        category[flash_loan] = "FLASH_LOAN_ATTACK"
+        
+        # Final adjustments
+        threat_level = np.select([danger_score >= 95, danger_score >= 80, danger_score >= 70], [3, 2, 1], default=0)
+        
+        result = {
+            'danger_score': danger_score.astype(np.float64),
+            'is_malicious': danger_score >= 70,
+            'threat_category': category,
+            'threat_level': threat_level,
+            'confidence_score': np.minimum(danger_score + 5, 100).astype(np.float64),
+            'threat_factors': None,
+            'threat_signature': None
+        }
+        
+        if not explain:
+            return result
+        
+        threat_factors = [[] for _ in range(n)]
+        signatures = ["Normal transaction"] * n
+        
+        fired = np.flatnonzero((gas_tier > 0) | (value_tier > 0) | (contract_tier > 0) | (complex_tier > 0))
+        tiers = zip(
+            fired.tolist(),
+            gas_tier[fired].tolist(),
+            value_tier[fired].tolist(),
+            contract_tier[fired].tolist(),
+            complex_tier[fired].tolist(),
+            flash_loan[fired].tolist(),
+            gas_price_gwei[fired].tolist(),
+            value[fired].tolist()
+        )
+        
+        for i, gt, vt, ct, xt, is_flash_loan, gas_gwei, value_eth in tiers:
+            factors = threat_factors[i]
             
-            # Log for debugging
-            gas_gwei = features_dict['gasPrice_gwei']
-            value_eth = features_dict['value']
-            logger.info(f"📥 Analyzing: {tx_data.get('hash', 'unknown')[:10]}... | Gas: {gas_gwei:.2f} gwei | Value: {value_eth:.4f} U2U")
+            description = self.GAS_TIER_DESCRIPTIONS[gt].format(gas=gas_gwei)
+            if gt:
+                factors.append(self.GAS_TIER_FACTORS[gt].format(gas=gas_gwei))
             
-            # Try ML ensemble if models loaded
-            if self.models_loaded and feature_vector is not None:
-                try:
-                    predictions = {}
-                    
-                    X_scaled = self.scaler.transform(feature_vector)
-                    iso_pred = self.isolation_forest.predict(X_scaled)[0]
-                    predictions['isolation_forest'] = 1 if iso_pred == -1 else 0
-                    
-                    predictions['random_forest'] = self.random_forest.predict_proba(feature_vector)[0][1]
-                    predictions['gradient_boosting'] = self.gradient_boosting.predict_proba(feature_vector)[0][1]
-                    predictions['neural_network'] = self.neural_network.predict_proba(X_scaled)[0][1]
-                    
-                    ensemble_score = sum(
-                        predictions[model] * self.ensemble_weights[model]
-                        for model in predictions.keys()
-                    )
-                    
-                    # Use enhanced categorization
-                    threat_category, threat_description, threat_level, danger_score = self.categorize_threat_ml(
-                        features_dict, ensemble_score
-                    )
-                    
-                    is_malicious = danger_score >= 70
-                    
-                    result = {
-                        'is_malicious': bool(is_malicious),
-                        'danger_score': float(danger_score),
-                        'confidence_score': float(max(predictions.values()) * 100),
-                        'threat_category': threat_category,
-                        'threat_signature': threat_description,
-                        'threat_level': int(threat_level),
-                        'model_predictions': {k: float(v) for k, v in predictions.items()},
-                        'ensemble_score': float(ensemble_score),
-                        'analyzed_at': datetime.now().isoformat(),
-                        'tx_hash': tx_data.get('hash', 'unknown'),
-                        'analysis_method': 'ensemble_ml_enhanced'
-                    }
-                    
-                    if is_malicious:
-                        logger.warning(f"🚨 ML THREAT: {threat_category} (Score: {danger_score:.2f})")
-                    else:
-                        logger.info(f"✅ Normal (Score: {danger_score:.2f})")
-                    
-                    return result
-                    
-                except Exception as ml_error:
-                    logger.warning(f"ML prediction failed: {ml_error}, falling back to rules")
+            if vt:
+                factors.append(self.VALUE_TIER_FACTORS[vt].format(value=value_eth))
+                replacement, suffix = self.VALUE_TIER_DESCRIPTIONS[vt]
+                if gt == 0:
+                    if replacement:
+                        description = replacement.format(value=value_eth)
+                elif suffix:
+                    description += suffix.format(value=value_eth)
             
-            # Use enhanced rule-based detection (fallback or primary)
-            result = self.enhanced_rule_based_detection(features_dict)
-            result.update({
-                'analyzed_at': datetime.now().isoformat(),
-                'tx_hash': tx_data.get('hash', 'unknown'),
-                'analysis_method': 'rule_based_enhanced',
-                'gas_price_gwei': float(features_dict['gasPrice_gwei']),
-                'value_eth': float(features_dict['value'])
-            })
+            if ct:
+                description = self.CONTRACT_TIER_DESCRIPTIONS[ct].format(value=value_eth)
+                factors.append(self.CONTRACT_TIER_FACTORS[ct])
             
+            if xt:
+                factors.append(self.COMPLEX_TIER_FACTORS[xt])
+                if is_flash_loan:
+                    description = "Suspected flash loan attack"
+            
+            signatures[i] = description + " [" + ", ".join(factors) + "]"
+        
+        result['threat_factors'] = threat_factors
+        result['threat_signature'] = signatures
+        return result
+    
+    ML_BRANCH_CATEGORIES = (
+        "UNKNOWN", "NORMAL", "FRONT_RUNNING", "MEV_ABUSE", "MEV_ABUSE", "PRICE_MANIPULATION",
+        "SMART_CONTRACT_EXPLOIT", "RUG_PULL", "HONEY_POT", "FLASH_LOAN_ATTACK"
+    )
+    ML_BRANCH_DESCRIPTIONS = (
+        "Potentially malicious transaction",
+        "Normal transaction",
+        "CRITICAL: Front-running attack ({gas:.2f} gwei)",
+        "HIGH: MEV abuse ({gas:.2f} gwei)",
+        "Potential MEV abuse ({gas:.2f} gwei)",
+        "Potential price manipulation ({value:.4f} U2U + {gas:.2f} gwei)",
+        "Suspected exploit: Large value ({value:.4f} U2U) + high gas",
+        "Potential rug pull: Contract with {value:.4f} U2U",
+        "Potential honey pot",
+        "Suspected flash loan attack"
+    )
+    ML_BRANCH_LEVELS = (1, 0, 3, 2, 2, 3, 3, 3, 2, 3)
+    ML_BRANCH_SCORE_FLOORS = (0, 0, 95, 85, 78, 0, 0, 0, 0, 0)
+    
+    def categorize_threat_ml_batch(self, columns, ml_scores):
+        """
+        Columnar categorize_threat_ml over a whole batch.
+        Returns (categories, descriptions, threat_levels, danger_scores) with one
+        entry per row; descriptions are only formatted for branches that need it.
+        """
+        
+        value = np.asarray(columns['value'], dtype=np.float64)
+        gas = np.asarray(columns['gas'], dtype=np.float64)
+        gas_price_gwei = np.asarray(columns['gasPrice_gwei'], dtype=np.float64)
+        is_contract = np.asarray(columns['isContractCreation']).astype(bool)
+        has_input = np.asarray(columns['hasInput']).astype(bool)
+        
+        danger_score = np.asarray(ml_scores, dtype=np.float64) * 100
+        
+        branch = np.select(
+            [
+                danger_score < 50,
+                gas_price_gwei > 150,
+                gas_price_gwei > 100,
+                (gas_price_gwei > 80) & has_input,
+                (value > 10) & (gas_price_gwei > 50),
+                (value > 1.0) & (gas > 500000),
+                is_contract & (value > 1.0),
+                is_contract & (gas < 100000),
+                (gas > 1000000) & has_input & (value > 0)
+            ],
+            np.arange(1, len(self.ML_BRANCH_CATEGORIES)),
+            default=0
+        )
+        
+        danger_score = np.maximum(danger_score, np.take(self.ML_BRANCH_SCORE_FLOORS, branch))
+        threat_level = np.take(self.ML_BRANCH_LEVELS, branch)
+        threat_level = np.select([danger_score > 90, danger_score > 70], [3, 2], default=threat_level)
+        categories = np.take(np.array(self.ML_BRANCH_CATEGORIES, dtype=object), branch)
+        
+        values = value.tolist()
+        gas_prices = gas_price_gwei.tolist()
+        descriptions = [
+            self.ML_BRANCH_DESCRIPTIONS[b].format(gas=gas_prices[i], value=values[i])
+            if b in (2, 3, 4, 5, 6, 7) else self.ML_BRANCH_DESCRIPTIONS[b]
+            for i, b in enumerate(branch.tolist())
+        ]
+        
+        return categories, descriptions, threat_level, danger_score
+    
+    def _ensemble_predictions(self, X, ensemble):
+        """Run every member of `ensemble` once over an N x F feature matrix"""
+        
+        X_scaled = ensemble.scaler.transform(X)
+        iso_pred = ensemble.isolation_forest.predict(X_scaled)
+        
+        if ensemble.neural_network_fp32 is not None:
+            nn_proba = ensemble.neural_network_fp32.predict_proba(X)[:, 1]
+        else:
+            nn_proba = ensemble.neural_network.predict_proba(X_scaled)[:, 1]
+        
+        predictions = {
+            'isolation_forest': np.where(iso_pred == -1, 1, 0),
+            'random_forest': ensemble.random_forest.predict_proba(X)[:, 1],
+            'gradient_boosting': ensemble.gradient_boosting.predict_proba(X)[:, 1],
+            'neural_network': nn_proba
+        }
+        
+        ensemble_scores = sum(
+            predictions[model] * ensemble.ensemble_weights[model]
+            for model in predictions.keys()
+        )
+        
+        return predictions, ensemble_scores
+    
+    def _build_ml_result(self, tx_data, predictions, ensemble_score, categorization, model_version):
+        """Build the ensemble verdict for one transaction"""
+        
+        threat_category, threat_description, threat_level, danger_score = categorization
+        
+        is_malicious = danger_score >= 70
+        
+        return {
+            'is_malicious': bool(is_malicious),
+            'danger_score': float(danger_score),
+            'confidence_score': float(max(predictions.values()) * 100),
+            'threat_category': threat_category,
+            'threat_signature': threat_description,
+            'threat_level': int(threat_level),
+            'model_predictions': {k: float(v) for k, v in predictions.items()},
+            'ensemble_score': float(ensemble_score),
+            'analyzed_at': datetime.now().isoformat(),
+            'tx_hash': tx_data.get('hash', 'unknown'),
+            'analysis_method': 'ensemble_ml_enhanced',
+            'model_version': model_version
+        }
+    
+    def _build_rule_result(self, tx_data, features_dict, rule_result):
+        """Build the rule-based verdict for one transaction"""
+        
+        result = dict(rule_result)
+        result.update({
+            'analyzed_at': datetime.now().isoformat(),
+            'tx_hash': tx_data.get('hash', 'unknown'),
+            'analysis_method': 'rule_based_enhanced',
+            'gas_price_gwei': float(features_dict['gasPrice_gwei']),
+            'value_eth': float(features_dict['value'])
+        })
+        return result
+    
+    def _error_result(self, error):
+        """Verdict returned when a transaction cannot be analyzed"""
+        return {
+            'error': str(error),
+            'is_malicious': False,
+            'danger_score': 0,
+            'threat_category': 'ERROR',
+            'threat_signature': f'Analysis failed: {str(error)}',
+            'analyzed_at': datetime.now().isoformat()
+        }
+    
+    def _extract_rows(self, transactions, ensemble):
+        """
+        Extract features for every transaction, ordered for `ensemble`.
+        Returns (results, rows) where results holds error verdicts for rows that
+        failed extraction and rows is a list of (index, feature_vector, features_dict).
+        """
+        
+        results = [None] * len(transactions)
+        
+        # A single request takes the scalar path, a batch the NumPy one (same values)
+        if len(transactions) == 1:
+            try:
+                feature_vector, features_dict = self.extract_features(transactions[0], ensemble)
+                return results, [(0, feature_vector, features_dict)]
+            except Exception as e:
+                logger.error(f"❌ Prediction error: {e}")
+                results[0] = self._error_result(e)
+                return results, []
+        
+        rows, errors = FEATURES.extract_batch(
+            transactions, ensemble.feature_names if ensemble is not None else None
+        )
+        for i, e in errors:
+            logger.error(f"❌ Prediction error: {e}")
+            results[i] = self._error_result(e)
+        
+        return results, rows
+    
+    def _score_rows(self, transactions, results, rows, ensemble):
+        """Score extracted rows as one matrix with `ensemble`, filling results in input order"""
+        
+        if not rows:
+            return results
+        
+        # Try ML ensemble if models loaded
+        if ensemble is not None and rows[0][1] is not None:
+            try:
+                X = np.vstack([feature_vector for _, feature_vector, _ in rows])
+                predictions, ensemble_scores = self._ensemble_predictions(X, ensemble)
+                
+                columns = self.feature_columns([features_dict for _, _, features_dict in rows])
+                categories, descriptions, threat_levels, danger_scores = self.categorize_threat_ml_batch(
+                    columns, ensemble_scores
+                )
+                
+                for row, (i, _, _) in enumerate(rows):
+                    row_predictions = {model: pred[row] for model, pred in predictions.items()}
+                    categorization = (categories[row], descriptions[row], threat_levels[row], danger_scores[row])
+                    results[i] = self._build_ml_result(
+                        transactions[i], row_predictions, ensemble_scores[row], categorization, ensemble.version
+                    )
+                
+                self._count_served(ensemble.version, len(rows))
+                return results
+                
+            except Exception as ml_error:
+                logger.warning(f"ML prediction failed: {ml_error}, falling back to rules")
+        
+        # Use enhanced rule-based detection (fallback or primary)
+        try:
+            columns = self.feature_columns([features_dict for _, _, features_dict in rows])
+            batch = self.enhanced_rule_based_detection_batch(columns)
+            rule_results = [
+                {
+                    'danger_score': float(batch['danger_score'][row]),
+                    'is_malicious': bool(batch['is_malicious'][row]),
+                    'threat_category': batch['threat_category'][row],
+                    'threat_signature': batch['threat_signature'][row],
+                    'threat_level': int(batch['threat_level'][row]),
+                    'threat_factors': batch['threat_factors'][row],
+                    'confidence_score': float(batch['confidence_score'][row])
+                }
+                for row in range(len(rows))
+            ]
+        except Exception as rule_error:
+            logger.warning(f"Batch rules failed: {rule_error}, evaluating row by row")
+            rule_results = [None] * len(rows)
+        
+        for row, (i, _, features_dict) in enumerate(rows):
+            try:
+                rule_result = rule_results[row] or self.enhanced_rule_based_detection(features_dict)
+                results[i] = self._build_rule_result(transactions[i], features_dict, rule_result)
+            except Exception as e:
+                logger.error(f"❌ Prediction error: {e}")
+                results[i] = self._error_result(e)
+        
+        self._count_served('rules', len(rows))
+        return results
+    
+    def predict(self, tx_data):
+        """Main prediction with fallback to enhanced rules"""
+        
+        # Pin the ensemble for the whole request; a concurrent reload affects the next one
+        ensemble = self.ensemble
+        
+        key = self._cache_key(tx_data, ensemble)
+        cached = self._lookup(tx_data, key, ensemble)
+        if cached is not None:
+            return cached
+        
+        results, rows = self._extract_rows([tx_data], ensemble)
+        if not rows:
+            return results[0]
+        
+        # Log for debugging
+        features_dict = rows[0][2]
+        gas_gwei = features_dict['gasPrice_gwei']
+        value_eth = features_dict['value']
+        logger.info(f"📥 Analyzing: {tx_data.get('hash', 'unknown')[:10]}... | Gas: {gas_gwei:.2f} gwei | Value: {value_eth:.4f} U2U")
+        
+        result = self._score_rows([tx_data], results, rows, ensemble)[0]
+        
+        if result['threat_category'] != 'ERROR':
+            prefix = "ML THREAT" if result['analysis_method'] == 'ensemble_ml_enhanced' else "RULE THREAT"
             if result['is_malicious']:
-                logger.warning(f"🚨 RULE THREAT: {result['threat_category']} (Score: {result['danger_score']:.2f})")
+                logger.warning(f"🚨 {prefix}: {result['threat_category']} (Score: {result['danger_score']:.2f})")
             else:
                 logger.info(f"✅ Normal (Score: {result['danger_score']:.2f})")
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"❌ Prediction error: {e}")
-            import traceback
-            traceback.print_exc()
-            return {
-                'error': str(e),
-                'is_malicious': False,
-                'danger_score': 0,
-                'threat_category': 'ERROR',
-                'threat_signature': f'Analysis failed: {str(e)}',
-                'analyzed_at': datetime.now().isoformat()
-            }
+        
+        self._remember(tx_data, key, ensemble, result)
+        
+        return result
+    
+    def predict_batch(self, transactions, check_cache=True):
+        """
+        Batch prediction: one N x F matrix, one call per ensemble member.
+        Verdicts are returned in input order and match predict() row for row
+        (neural_network probabilities may differ by float32 rounding, ~1e-7
+        relative, because a matrix product is blocked differently from a single
+        row; tests/test_app_batch.py checks both).
+        Cached verdicts are reused and only the misses are scored; check_cache=False
+        skips the lookup for callers that already did it (the micro-batcher).
+        """
+        
+        if not transactions:
+            return []
+        
+        ensemble = self.ensemble
+        keys = [self._cache_key(tx_data, ensemble) for tx_data in transactions]
+        
+        results = [None] * len(transactions)
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self._lookup(transactions[i], key, ensemble) if check_cache else None
+            if cached is not None:
+                results[i] = dict(cached)
+            else:
+                pending.append(i)
+        
+        if pending:
+            todo = [transactions[i] for i in pending]
+            scored, rows = self._extract_rows(todo, ensemble)
+            scored = self._score_rows(todo, scored, rows, ensemble)
+            for i, result in zip(pending, scored):
+                results[i] = result
+                self._remember(transactions[i], keys[i], ensemble, result)
+        
+        malicious = sum(1 for r in results if r.get('is_malicious'))
+        logger.info(f"📦 Batch analyzed: {len(results)} transactions | Threats: {malicious}")
+        
+        return results
 
 # Initialize
 try:
     ai_engine = CerberusAI()
+    batch_scheduler = MicroBatchScheduler(
+        # /predict checks the verdict cache before queueing, so only misses reach the batcher
+        lambda transactions: ai_engine.predict_batch(transactions, check_cache=False),
+        max_wait_ms=MICROBATCH_WINDOW_MS,
+        max_batch_size=MICROBATCH_MAX_SIZE
+    ) if MICROBATCH_ENABLED else None
     logger.info("🚀 Cerberus AI API ready!")
     logger.info("🎯 Enhanced high-gas detection active")
 except Exception as e:
     logger.error(f"Failed to initialize: {e}")
     ai_engine = None
+    batch_scheduler = None
+
+@app.before_request
+def ensure_model_watcher():
+    # Started lazily per process: gunicorn forks workers after preload and threads don't survive fork
+    if ai_engine is not None:
+        ai_engine.reloader.start_watching()
 
 @app.route('/', methods=['GET'])
 def index():
@@ -486,7 +969,17 @@ def predict():
         }), 400
     
     try:
-        result = ai_engine.predict(data)
+        if batch_scheduler is not None:
+            result = ai_engine.cached_verdict(data)
+            if result is None:
+                try:
+                    result = batch_scheduler.predict(data)
+                except FutureTimeoutError:
+                    # Dispatcher stuck or gone: score this request on its own rather than hang
+                    logger.warning("⚠️  Micro-batch timed out, scoring the request directly")
+                    result = ai_engine.predict(data)
+        else:
+            result = ai_engine.predict(data)
         return jsonify(result)
     except Exception as e:
         logger.error(f"Endpoint error: {e}")
@@ -496,6 +989,44 @@ def predict():
             'danger_score': 0
         }), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Batch prediction endpoint - accepts a list or {'transactions': [...]}"""
+
+    if ai_engine is None:
+        return jsonify({
+            'error': 'AI engine not initialized',
+            'is_malicious': False
+        }), 500
+
+    data = request.get_json()
+    transactions = data.get('transactions') if isinstance(data, dict) else data
+
+    if not transactions or not isinstance(transactions, list):
+        return jsonify({
+            'error': 'No transactions provided',
+            'results': []
+        }), 400
+
+    if len(transactions) > MAX_BATCH_SIZE:
+        return jsonify({
+            'error': f'Batch too large: {len(transactions)} > {MAX_BATCH_SIZE}',
+            'results': []
+        }), 413
+
+    try:
+        results = ai_engine.predict_batch(transactions)
+        return jsonify({
+            'count': len(results),
+            'results': results
+        })
+    except Exception as e:
+        logger.error(f"Batch endpoint error: {e}")
+        return jsonify({
+            'error': str(e),
+            'results': []
+        }), 500
+
 @app.route('/health', methods=['GET'])
 def health():
     """Detailed health check"""
@@ -513,13 +1044,24 @@ def stats():
     if not ai_engine:
         return jsonify({'error': 'AI engine not initialized'}), 500
     
-    if ai_engine.models_loaded:
+    ensemble = ai_engine.ensemble
+    if ensemble is not None:
         return jsonify({
-            'model_info': ai_engine.metadata['models'],
-            'ensemble_weights': ai_engine.ensemble_weights,
-            'feature_count': len(ai_engine.feature_names),
-            'training_date': ai_engine.metadata['training_date'],
-            'detection_mode': 'ensemble_ml'
+            'model_info': ensemble.metadata['models'],
+            'ensemble_weights': ensemble.ensemble_weights,
+            'feature_count': len(ensemble.feature_names),
+            'training_date': ensemble.metadata['training_date'],
+            'model_version': ensemble.version,
+            'model_latency_ms': ensemble.metadata['latency_ms'],
+            'detection_mode': 'ensemble_ml',
+            'tree_backend': ensemble.tree_backend,
+            'nn_backend': ensemble.nn_backend,
+            'served_by_version': dict(ai_engine.served_by_version),
+            'reload': ai_engine.reloader.stats(),
+            'verdict_cache': ai_engine.verdict_cache.stats(),
+            'approx_cache': ai_engine.approx_cache.stats(),
+            'microbatch': batch_scheduler.stats() if batch_scheduler else None,
+            'worker': {'pid': os.getpid(), 'memory': process_memory()}
         })
     else:
         return jsonify({
@@ -529,9 +1071,37 @@ def stats():
                 'critical': '>150 gwei',
                 'high': '>100 gwei',
                 'medium': '>50 gwei'
-            }
+            },
+            'served_by_version': dict(ai_engine.served_by_version),
+            'reload': ai_engine.reloader.stats(),
+            'verdict_cache': ai_engine.verdict_cache.stats(),
+            'approx_cache': ai_engine.approx_cache.stats(),
+            'microbatch': batch_scheduler.stats() if batch_scheduler else None,
+            'worker': {'pid': os.getpid(), 'memory': process_memory()}
         })
 
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload models from model_bundle/ without a restart (?wait=1 blocks until swapped)"""
+    if ai_engine is None:
+        return jsonify({'error': 'AI engine not initialized'}), 500
+    
+    if ADMIN_TOKEN:
+        if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+            return jsonify({'error': 'Forbidden'}), 403
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden (set CERBERUS_ADMIN_TOKEN for remote reloads)'}), 403
+    
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    outcome = ai_engine.reloader.reload(reason='admin', wait=wait)
+    outcome['worker'] = os.getpid()
+    
+    if outcome['status'] == 'in_progress':
+        return jsonify(outcome), 409
+    if outcome['status'] == 'failed':
+        return jsonify(outcome), 500
+    return jsonify(outcome), 200 if wait else 202
+
 if __name__ == '__main__':
     print("""
 ═══════════════════════════════════════════════════════════
@@ -0,0 +1,503 @@
+"""
+Cerberus Block Fetcher
+Concurrent historical collection over JSON-RPC. Blocks are fetched in chunks
+with one batch request of eth_getBlockByNumber (full transactions) per chunk,
+then every receipt of the chunk with batched eth_getTransactionReceipt.
+Chunks run on a thread pool with a bounded number in flight and come back
+in block order, so the dataset is identical to a serial scan.
+
+Only the standard library is used: one keep-alive HTTP connection per
+worker thread. LocalRpcServer is a stand-in node serving recorded (or
+generated) blocks on 127.0.0.1 with a configurable latency, for measuring
+throughput without touching the network:
+
+    python block_fetcher.py                       # generated chain
+    python block_fetcher.py chain.json            # recorded chain
+    python block_fetcher.py record <rpc_url> <first_block> <count> chain.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import itertools
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Chunks fetched at the same time, and their size
+COLLECTOR_CONCURRENCY = int(os.environ.get('CERBERUS_COLLECTOR_CONCURRENCY', 8))
+COLLECTOR_BLOCKS_PER_REQUEST = int(os.environ.get('CERBERUS_COLLECTOR_BLOCKS_PER_REQUEST', 10))
+COLLECTOR_RECEIPTS_PER_REQUEST = int(os.environ.get('CERBERUS_COLLECTOR_RECEIPTS_PER_REQUEST', 100))
+
+RPC_TIMEOUT = float(os.environ.get('CERBERUS_RPC_TIMEOUT', 60))
+RPC_RETRIES = int(os.environ.get('CERBERUS_RPC_RETRIES', 3))
+RPC_RETRY_BACKOFF = 0.5     # seconds, doubled per attempt
+
+
+class RpcError(Exception):
+    """A JSON-RPC request failed (transport, HTTP status or an error object)"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RpcThrottled(RpcError):
+    """The node answered 429 Too Many Requests (retry_after: its Retry-After in seconds, if any)"""
+
+
+def parse_retry_after(value):
+    """Retry-After in seconds (the delta-seconds form; HTTP dates are ignored)"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class JsonRpcClient:
+    """JSON-RPC over HTTP(S) with batch requests; thread-safe, one keep-alive connection per thread"""
+
+    def __init__(self, url, timeout=RPC_TIMEOUT, retries=RPC_RETRIES):
+        parts = urlsplit(url)
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self._https = parts.scheme == 'https'
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self._requests = 0
+        self._calls = 0
+        self._retried = 0
+        self._failed = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            connection = cls(self._host, self._port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _post(self, payload, timeout=None):
+        body = json.dumps(payload).encode()
+        for attempt in range(self.retries + 1):
+            connection = self._connection()
+            connection.timeout = timeout or self.timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(connection.timeout)
+            try:
+                connection.request('POST', self._path, body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                data = response.read()
+                if response.status == 429:
+                    raise RpcThrottled(f"HTTP 429 from {self.url}", status=429,
+                                       retry_after=parse_retry_after(response.getheader('Retry-After')))
+                if response.status != 200:
+                    raise RpcError(f"HTTP {response.status} from {self.url}", status=response.status)
+                return json.loads(data)
+            except (OSError, ValueError, http.client.HTTPException, RpcError) as e:
+                if not isinstance(e, RpcError) or (e.status or 500) >= 500:
+                    # The connection may be half-used; 429 and 4xx responses were read in full
+                    connection.close()
+                    self._local.connection = None
+                if attempt == self.retries:
+                    with self._lock:
+                        self._failed += 1
+                    if isinstance(e, RpcError):
+                        raise
+                    raise RpcError(f"{self.url}: {e}") from e
+                with self._lock:
+                    self._retried += 1
+                time.sleep(max(RPC_RETRY_BACKOFF * 2 ** attempt, getattr(e, 'retry_after', None) or 0))
+
+    def batch(self, calls, timeout=None):
+        """
+        Send [(method, params), ...] as one batch request. Returns the results in
+        call order; a call the node answered with an error object is returned as
+        an RpcError instance instead of raising, so one bad receipt does not
+        cost the whole batch. `timeout` overrides the client's for this request.
+        """
+        if not calls:
+            return []
+        ids = [next(self._ids) for _ in calls]
+        payload = [{'jsonrpc': '2.0', 'id': i, 'method': method, 'params': params}
+                   for i, (method, params) in zip(ids, calls)]
+        response = self._post(payload, timeout)
+        with self._lock:
+            self._requests += 1
+            self._calls += len(calls)
+
+        if not isinstance(response, list):
+            # Nodes without batch support answer with a single error object
+            raise RpcError(f"Batch request rejected by {self.url}: {response.get('error') if isinstance(response, dict) else response}")
+        by_id = {item.get('id'): item for item in response}
+        results = []
+        for i, (method, _) in zip(ids, calls):
+            item = by_id.get(i)
+            if item is None:
+                results.append(RpcError(f"{method}: no response"))
+            elif item.get('error') is not None:
+                results.append(RpcError(f"{method}: {item['error']}"))
+            else:
+                results.append(item.get('result'))
+        return results
+
+    def call(self, method, params=()):
+        """One call (sent as a batch of one); raises RpcError on an error object"""
+        result = self.batch([(method, list(params))])[0]
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'url': self.url,
+                'requests': self._requests,
+                'calls': self._calls,
+                'retries': self._retried,
+                'failures': self._failed
+            }
+
+
+class BlockFetcher:
+    """Blocks with full transactions and receipts, fetched concurrently, yielded in block order"""
+
+    def __init__(self, client, concurrency=COLLECTOR_CONCURRENCY, blocks_per_request=COLLECTOR_BLOCKS_PER_REQUEST,
+                 receipts_per_request=COLLECTOR_RECEIPTS_PER_REQUEST):
+        self.client = client
+        self.concurrency = max(int(concurrency), 1)
+        self.blocks_per_request = max(int(blocks_per_request), 1)
+        self.receipts_per_request = max(int(receipts_per_request), 1)
+
+        self._lock = threading.Lock()
+        self._blocks = 0
+        self._transactions = 0
+        self._missing_receipts = 0
+        self._skipped_blocks = 0
+        self._seconds = 0.0
+
+    def _skip(self, numbers, error):
+        label = f'{numbers[0]}' if len(numbers) == 1 else f'{numbers[0]}-{numbers[-1]}'
+        logger.warning(f"⚠️ Skipping block {label}: {error}")
+        with self._lock:
+            self._skipped_blocks += len(numbers)
+
+    def fetch_chunk(self, numbers):
+        """
+        [(number, block, receipts)] for consecutive block numbers. A block the node
+        returned an error or null for is logged, counted and left out (like the
+        per-block try/except of the serial scan); a receipt that failed is None.
+        Raises RpcError only when the block request itself fails.
+        """
+        blocks = self.client.batch([('eth_getBlockByNumber', [hex(n), True]) for n in numbers])
+        found = []
+        for number, block in zip(numbers, blocks):
+            if isinstance(block, RpcError):
+                self._skip([number], block)
+            elif block is None:
+                self._skip([number], 'not found')
+            else:
+                found.append((number, block))
+
+        hashes = [tx['hash'] for _, block in found for tx in block.get('transactions', [])]
+        receipts = []
+        for start in range(0, len(hashes), self.receipts_per_request):
+            calls = [('eth_getTransactionReceipt', [h]) for h in hashes[start:start + self.receipts_per_request]]
+            try:
+                receipts.extend(self.client.batch(calls))
+            except RpcError as e:
+                # Receipts only label the dataset: keep the transactions
+                logger.warning(f"⚠️ {len(calls)} receipts unavailable: {e}")
+                receipts.extend([None] * len(calls))
+        missing = 0
+        for i, receipt in enumerate(receipts):
+            if receipt is None or isinstance(receipt, RpcError):
+                receipts[i] = None
+                missing += 1
+
+        chunk, offset = [], 0
+        for number, block in found:
+            count = len(block.get('transactions', []))
+            chunk.append((number, block, receipts[offset:offset + count]))
+            offset += count
+        with self._lock:
+            self._blocks += len(found)
+            self._transactions += len(hashes)
+            self._missing_receipts += missing
+        return chunk
+
+    def iter_blocks(self, start, end):
+        """
+        Yield (number, block, receipts) for start <= number < end in order. At most
+        2 x concurrency chunks are outstanding, so memory stays bounded however
+        far the scan runs ahead of the consumer. A chunk whose request fails after
+        the client's retries is logged and counted in stats()['skipped_blocks'];
+        the scan goes on with the blocks after it.
+        """
+        chunks = iter([list(range(n, min(n + self.blocks_per_request, end)))
+                       for n in range(start, end, self.blocks_per_request)])
+        started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='block-fetcher')
+        pending = deque()
+        try:
+            for numbers in itertools.islice(chunks, 2 * self.concurrency):
+                pending.append((numbers, pool.submit(self.fetch_chunk, numbers)))
+            while pending:
+                numbers, future = pending.popleft()
+                try:
+                    chunk = future.result()
+                except RpcError as e:
+                    self._skip(numbers, e)
+                    chunk = []
+                following = next(chunks, None)
+                if following is not None:
+                    pending.append((following, pool.submit(self.fetch_chunk, following)))
+                yield from chunk
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            with self._lock:
+                self._seconds += time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'blocks_per_request': self.blocks_per_request,
+                'blocks': self._blocks,
+                'transactions': self._transactions,
+                'missing_receipts': self._missing_receipts,
+                'skipped_blocks': self._skipped_blocks,
+                'seconds': self._seconds,
+                'blocks_per_second': (self._blocks / self._seconds) if self._seconds else 0.0,
+                'rpc': self.client.stats()
+            }
+
+
+# --- stand-in node -------------------------------------------------------------
+
+class LocalRpcServer:
+    """
+    Stand-in JSON-RPC node on 127.0.0.1 serving a recorded chain: eth_blockNumber,
+    eth_getBlockByNumber and eth_getTransactionReceipt. Every HTTP request
+    waits `latency` seconds plus `per_call` per call in it, like a remote node.
+
+    Throttling can be injected: `load_latency` is added per request already in
+    flight (a node slowing down under load), and above `max_concurrent`
+    requests in flight the node answers 429 with Retry-After `retry_after`.
+    """
+
+    def __init__(self, chain, latency=0.02, per_call=0.0002, load_latency=0.0, max_concurrent=None,
+                 retry_after=None):
+        self.blocks = {int(block['number'], 16): block for block in chain['blocks']}
+        self.receipts = chain['receipts']
+        self.latency = latency
+        self.per_call = per_call
+        self.load_latency = load_latency
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def handle(self, call):
+        """Result of one call object"""
+        method, params = call.get('method'), call.get('params') or []
+        if method == 'eth_blockNumber':
+            return {'result': hex(max(self.blocks))}
+        if method == 'eth_getBlockByNumber':
+            return {'result': self.blocks.get(int(params[0], 16))}
+        if method == 'eth_getTransactionReceipt':
+            return {'result': self.receipts.get(params[0])}
+        return {'error': {'code': -32601, 'message': f'Method {method} not found'}}
+
+    def respond(self, payload):
+        """(HTTP status, response body object) for one request payload"""
+        calls = payload if isinstance(payload, list) else [payload]
+        with self._lock:
+            self.requests += 1
+            if self.max_concurrent is not None and self.in_flight >= self.max_concurrent:
+                self.throttled += 1
+                return 429, {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32005, 'message': 'rate limited'}}
+            self.in_flight += 1
+            load = self.in_flight - 1
+        try:
+            time.sleep(self.latency + self.per_call * len(calls) + self.load_latency * load)
+            answers = [dict(self.handle(call), jsonrpc='2.0', id=call.get('id')) for call in calls]
+            return 200, answers if isinstance(payload, list) else answers[0]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def start(self):
+        server_ref = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes: without TCP_NODELAY, Nagle + delayed ACK
+            # add ~40 ms to every keep-alive request
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                status, answer = server_ref.respond(payload)
+                body = json.dumps(answer).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429 and server_ref.retry_after is not None:
+                    self.send_header('Retry-After', str(server_ref.retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}/'
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def record_chain(client, first_block, count, path):
+    """Save `count` blocks from a real node, with their receipts, for LocalRpcServer"""
+    fetcher = BlockFetcher(client)
+    blocks, receipts = [], {}
+    for _, block, block_receipts in fetcher.iter_blocks(first_block, first_block + count):
+        blocks.append(block)
+        for tx, receipt in zip(block.get('transactions', []), block_receipts):
+            if receipt is not None:
+                receipts[tx['hash']] = receipt
+    with open(path, 'w') as f:
+        json.dump({'blocks': blocks, 'receipts': receipts}, f)
+    logger.info(f"💾 Recorded blocks {first_block}-{first_block + count - 1} ({len(receipts)} receipts) to {path}")
+
+
+def synthetic_chain(n_blocks, first_block=61615671, mean_transactions=8, seed=24):
+    """Chain in JSON-RPC encoding: transfers, ERC-20 calls and the odd deployment"""
+    rng = random.Random(seed)
+
+    def word():
+        return '0x' + rng.getrandbits(160).to_bytes(20, 'big').hex()
+
+    blocks, receipts = [], {}
+    for number in range(first_block, first_block + n_blocks):
+        transactions = []
+        for index in range(rng.randint(0, 2 * mean_transactions)):
+            kind = rng.random()
+            to = None if kind < 0.02 else word()
+            data = ('0x6080604052' + os.urandom(rng.randint(500, 3000)).hex() if to is None else
+                    '0x' if kind < 0.6 else '0xa9059cbb' + '00' * 12 + word()[2:] + '00' * 24 + os.urandom(8).hex())
+            gas = 21000 if data == '0x' else rng.choice([60000, 120000, 3000000])
+            tx_hash = '0x' + rng.getrandbits(256).to_bytes(32, 'big').hex()
+            transactions.append({
+                'hash': tx_hash, 'from': word(), 'to': to, 'value': hex(rng.randrange(10**20)),
+                'gas': hex(gas), 'gasPrice': hex(rng.randrange(10**9, 10**11)), 'nonce': hex(rng.randrange(10**5)),
+                'input': data, 'blockNumber': hex(number), 'transactionIndex': hex(index)
+            })
+            receipts[tx_hash] = {
+                'transactionHash': tx_hash, 'status': '0x1' if rng.random() < 0.97 else '0x0',
+                'gasUsed': hex(min(gas, 21000 + rng.randrange(gas))), 'logs': [{}] * rng.randint(0, 3)
+            }
+        blocks.append({'number': hex(number), 'hash': '0x' + rng.getrandbits(256).to_bytes(32, 'big').hex(),
+                       'timestamp': hex(1761400000 + number), 'transactions': transactions})
+    return {'blocks': blocks, 'receipts': receipts}
+
+
+def main():
+    """Blocks per second against a stand-in node: the serial scan vs the batched, concurrent fetcher"""
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'record':
+        url, first_block, count, path = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5]
+        record_chain(JsonRpcClient(url), first_block, count, path)
+        return
+
+    print("=" * 80)
+    print("🐺 CERBERUS BLOCK FETCHER CHECK")
+    print("=" * 80)
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            chain = json.load(f)
+        source = sys.argv[1]
+    else:
+        chain = synthetic_chain(400)
+        source = 'generated chain'
+    numbers = sorted(int(block['number'], 16) for block in chain['blocks'])
+    first, end = numbers[0], numbers[-1] + 1
+    transactions = sum(len(block['transactions']) for block in chain['blocks'])
+    latency = 0.02
+
+    with LocalRpcServer(chain, latency=latency) as node:
+        print(f"\n{source}: {len(numbers)} blocks, {transactions} transactions | stand-in node "
+              f"{latency * 1e3:.0f} ms per request")
+
+        # collect_historical_data before BlockFetcher: one block, then one receipt per transaction,
+        # then 50 ms of sleep (first 40 blocks only; it is slow)
+        client = JsonRpcClient(node.url)
+        serial = []
+        started = time.perf_counter()
+        for number in range(first, first + 40):
+            block = client.call('eth_getBlockByNumber', [hex(number), True])
+            receipts = [client.call('eth_getTransactionReceipt', [tx['hash']]) for tx in block['transactions']]
+            serial.append((number, block, receipts))
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        print(f"   serial scan (old)                   {40 / elapsed:7.1f} blocks/s | "
+              f"{client.stats()['requests'] / 40:5.1f} requests/block")
+
+        reference = None
+        for concurrency in (1, 2, 4, 8, 16, 32):
+            fetcher = BlockFetcher(JsonRpcClient(node.url), concurrency=concurrency)
+            fetched = list(fetcher.iter_blocks(first, end))
+            stats = fetcher.stats()
+            if reference is None:
+                reference = fetched
+                if fetched[:40] != serial:
+                    raise AssertionError("batched fetch differs from the serial scan")
+            elif fetched != reference:
+                raise AssertionError(f"concurrency {concurrency}: blocks differ or are out of order")
+            print(f"   batched, concurrency {concurrency:>2}             {stats['blocks_per_second']:7.1f} blocks/s | "
+                  f"{stats['rpc']['requests'] / stats['blocks']:5.2f} requests/block")
+
+    print(f"\nAll runs returned the same {len(reference)} blocks, in order, with {transactions} receipts")
+    if [number for number, _, _ in reference] != list(range(first, end)):
+        raise AssertionError("block order not preserved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,730 @@
+"""
+Cerberus Compiled Models
+Flattens trained sklearn tree ensembles into contiguous NumPy arrays and
+evaluates every tree at once with vectorized traversal - no per-estimator
+Python loop and no joblib thread pool on the request path.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Probabilities from the compiled path must match sklearn within these bounds
+PARITY_ATOL = 1e-9
+# float32 MLP: measured max |dp| is ~5e-7 on the serving features and ~2e-6 with
+# large-offset columns (tests/test_compiled_models.py)
+MLP_PARITY_ATOL = 1e-5
+
+# Per-model array directory layout: <name>.npy for every array plus meta.json for scalars
+ARRAYS_META = 'meta.json'
+
+
+def _expit(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _flatten_trees(trees, feature_maps=None):
+    """
+    Concatenate sklearn Tree objects into shared node arrays.
+    feature_maps optionally maps each tree's local feature index to a column of X
+    (bagging feature subsets). Returns (feature, threshold, left, right, roots, max_depth).
+    """
+    node_counts = [tree.node_count for tree in trees]
+    roots = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.int32)
+
+    feature = []
+    threshold = []
+    left = []
+    right = []
+
+    for t, (tree, offset) in enumerate(zip(trees, roots)):
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(tree.node_count, dtype=np.int32) + offset
+        local_feature = np.where(is_leaf, 0, tree.feature)
+        if feature_maps is not None:
+            local_feature = np.asarray(feature_maps[t])[local_feature]
+
+        feature.append(local_feature.astype(np.int32))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+
+    return (
+        np.concatenate(feature),
+        np.concatenate(threshold),
+        np.concatenate(left),
+        np.concatenate(right),
+        roots,
+        max(tree.max_depth for tree in trees)
+    )
+
+
+def _missing_go_left(trees):
+    """
+    Per-node NaN direction, concatenated like _flatten_trees. sklearn >= 1.3 records it in
+    tree_.missing_go_to_left; for features without NaN at fit time it is the child that saw
+    more samples. Leaves are False (they point to themselves either way).
+    """
+    missing_left = []
+    for tree in trees:
+        is_leaf = tree.children_left == -1
+        flags = getattr(tree, 'missing_go_to_left', None)
+        if flags is None:
+            flags = np.zeros(tree.node_count, dtype=bool)
+        missing_left.append(np.where(is_leaf, False, np.asarray(flags, dtype=bool)))
+    return np.concatenate(missing_left)
+
+
+def _as_rows(X):
+    # sklearn compares float32 feature values against float64 thresholds
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+    if X32.ndim == 1:
+        X32 = X32.reshape(1, -1)
+    return X32
+
+
+def _reject_nan(X32, name):
+    """Same refusal sklearn's input validation gives estimators without missing-value support"""
+    if np.isnan(X32).any():
+        raise ValueError(f"Input X contains NaN. {name} does not accept missing values encoded as NaN natively.")
+
+
+def _apply_trees(X, feature, threshold, children, roots, max_depth, missing_left=None):
+    """
+    Leaf node index for every (row, tree) pair, shape (N, n_trees).
+    NaN fails every `<=` test and so goes right, unless missing_left is given: then NaN
+    follows sklearn's per-node missing_go_to_left. That branch only runs when X has NaN.
+    """
+    X32 = _as_rows(X)
+
+    n_rows, n_features = X32.shape
+    values = X32.ravel()
+    row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+    nodes = np.broadcast_to(roots.astype(np.intp), (n_rows, len(roots))).copy()
+
+    if missing_left is not None and np.isnan(values).any():
+        for _ in range(max_depth):
+            x = values.take(row_offsets + feature.take(nodes))
+            go_right = np.where(np.isnan(x), ~missing_left.take(nodes), ~(x <= threshold.take(nodes)))
+            nodes = children.take(nodes * 2 + go_right)
+        return nodes
+
+    for _ in range(max_depth):
+        go_right = ~(values.take(row_offsets + feature.take(nodes)) <= threshold.take(nodes))
+        nodes = children.take(nodes * 2 + go_right)
+
+    return nodes
+
+
+def _save_arrays(path, arrays, meta):
+    """
+    Write each array as an uncompressed .npy so np.load(mmap_mode='r') can map it.
+    Files are written under a temporary name and renamed into place: a worker that
+    still maps the previous file keeps its (unlinked) pages instead of seeing a
+    truncated file.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        target = os.path.join(path, f'{name}.npy')
+        tmp = f'{target}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp, target)
+
+    meta = dict(meta, arrays=sorted(arrays))
+    tmp = os.path.join(path, f'{ARRAYS_META}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(path, ARRAYS_META))
+
+
+def _load_arrays(path, mmap_mode='r'):
+    """
+    Inverse of _save_arrays; with mmap_mode='r' every process maps the same page-cache pages.
+    Mapped arrays are returned as plain ndarray views of the mapping: np.memmap's Python-level
+    __array_finalize__ runs on every take() and nearly doubled single-row scoring time.
+    """
+    with open(os.path.join(path, ARRAYS_META), 'r') as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False).view(np.ndarray)
+        for name in meta['arrays']
+    }
+    return arrays, meta
+
+
+def _interleave_children(left, right):
+    """(left, right) pairs in one array so a single take() picks the next node"""
+    return np.ascontiguousarray(np.column_stack([left, right]).ravel(), dtype=np.intp)
+
+
+class CompiledTreeEnsemble:
+    """
+    Array-backed RandomForestClassifier / GradientBoostingClassifier.
+
+    All trees live in one set of node arrays (feature, threshold, left, right,
+    value); `roots` holds the offset of each tree's root node. Leaves point to
+    themselves, so a batch walks all trees for `max_depth` steps in lockstep.
+
+    Missing values follow sklearn: a random forest routes NaN by each node's
+    missing_go_to_left, gradient boosting rejects NaN input with ValueError.
+    Bundles compiled before missing_left was stored send NaN right.
+    """
+
+    def __init__(self, kind, feature, threshold, left, right, value, roots, max_depth,
+                 n_features, classes, learning_rate=1.0, baseline=None, children=None,
+                 missing_left=None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = np.asarray(classes)
+        self.learning_rate = float(learning_rate)
+        self.baseline = baseline
+        self.children = _interleave_children(left, right) if children is None else children
+        self.missing_left = missing_left
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier or GradientBoostingClassifier"""
+        name = type(model).__name__
+
+        if name == 'RandomForestClassifier':
+            kind = 'random_forest'
+            trees = [est.tree_ for est in model.estimators_]
+            learning_rate = 1.0
+            baseline = None
+        elif name == 'GradientBoostingClassifier':
+            kind = 'gradient_boosting'
+            if model.estimators_.shape[1] != 1:
+                raise ValueError("Only binary GradientBoostingClassifier models can be compiled")
+            if model.init_ != 'zero' and type(model.init_).__name__ != 'DummyClassifier':
+                raise ValueError(f"Unsupported GradientBoosting init estimator: {model.init_}")
+            trees = [est.tree_ for est in model.estimators_[:, 0]]
+            learning_rate = model.learning_rate
+            # Constant prior log-odds the boosting stages start from
+            baseline = float(model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0])
+        else:
+            raise ValueError(f"Cannot compile model of type {name}")
+
+        feature, threshold, left, right, roots, max_depth = _flatten_trees(trees)
+
+        value = []
+        for tree in trees:
+            if kind == 'random_forest':
+                proba = tree.value[:, 0, :].astype(np.float64)
+                normalizer = proba.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                value.append(proba / normalizer)
+            else:
+                value.append(tree.value[:, 0, :1].astype(np.float64))
+
+        return cls(
+            kind=kind,
+            feature=feature,
+            threshold=threshold,
+            left=left,
+            right=right,
+            value=np.ascontiguousarray(np.concatenate(value)),
+            roots=roots,
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            classes=model.classes_,
+            learning_rate=learning_rate,
+            baseline=baseline,
+            missing_left=_missing_go_left(trees)
+        )
+
+    def save(self, path):
+        """Write the node arrays to a directory of .npy files (see _save_arrays)"""
+        arrays = {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'children': self.children,
+            'value': self.value,
+            'roots': self.roots,
+            'classes': self.classes_
+        }
+        if self.missing_left is not None:
+            arrays['missing_left'] = self.missing_left
+        _save_arrays(path, arrays, {
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features_in_,
+            'learning_rate': self.learning_rate,
+            'baseline': self.baseline
+        })
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        arrays, meta = _load_arrays(path, mmap_mode)
+        return cls(
+            kind=meta['kind'],
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=arrays['left'],
+            right=arrays['right'],
+            value=arrays['value'],
+            roots=arrays['roots'],
+            max_depth=meta['max_depth'],
+            n_features=meta['n_features'],
+            classes=np.array(arrays['classes']),
+            learning_rate=meta['learning_rate'],
+            baseline=meta['baseline'],
+            children=arrays['children'],
+            missing_left=arrays.get('missing_left')
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf node index for every (row, tree) pair, shape (N, n_trees)"""
+        X32 = _as_rows(X)
+        if self.kind == 'gradient_boosting':
+            _reject_nan(X32, 'GradientBoostingClassifier')
+        return _apply_trees(X32, self.feature, self.threshold, self.children, self.roots, self.max_depth,
+                            self.missing_left)
+
+    def predict_proba(self, X):
+        """Class probabilities, same layout as sklearn predict_proba"""
+        leaves = self.apply(X)
+
+        if self.kind == 'random_forest':
+            return self.value.take(leaves, axis=0).sum(axis=1) / self.n_trees
+
+        raw = self.baseline + self.learning_rate * self.value[:, 0].take(leaves).sum(axis=1)
+        positive = _expit(raw)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class CompiledIsolationForest:
+    """
+    Array-backed IsolationForest scorer that needs neither sklearn nor pandas.
+
+    Each node stores the path-length contribution sklearn adds when a sample
+    ends there (node depth + average path length of its samples - 1). Tree
+    contributions are summed left to right with cumsum, the same order as
+    sklearn's per-tree loop, so score_samples / decision_function / predict
+    reproduce sklearn bit for bit.
+    """
+
+    def __init__(self, feature, threshold, left, right, path_length, roots, max_depth,
+                 denominator, offset, feature_names=None, children=None, n_features=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.path_length = path_length
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.denominator = float(denominator)
+        self.offset_ = float(offset)
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = None if n_features is None else int(n_features)
+        self.children = _interleave_children(left, right) if children is None else children
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted IsolationForest"""
+        from sklearn.ensemble._iforest import _average_path_length
+
+        trees = [est.tree_ for est in model.estimators_]
+        n_features = model.n_features_in_
+        subsample_features = model._max_features != n_features
+        feature_maps = model.estimators_features_ if subsample_features else None
+
+        feature, threshold, left, right, roots, max_depth = _flatten_trees(trees, feature_maps)
+        path_length = np.concatenate([
+            np.asarray(depths + average - 1.0, dtype=np.float64)
+            for depths, average in zip(model._decision_path_lengths, model._average_path_length_per_tree)
+        ])
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=left,
+            right=right,
+            path_length=path_length,
+            roots=roots,
+            max_depth=max_depth,
+            denominator=len(trees) * _average_path_length([model._max_samples])[0],
+            offset=model.offset_,
+            feature_names=getattr(model, 'feature_names_in_', None),
+            n_features=n_features
+        )
+
+    def save(self, path):
+        """Write the forest to a directory of .npy files (see _save_arrays)"""
+        _save_arrays(path, {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'children': self.children,
+            'path_length': self.path_length,
+            'roots': self.roots
+        }, {
+            'max_depth': self.max_depth,
+            'denominator': self.denominator,
+            'offset': self.offset_,
+            'feature_names': None if self.feature_names_in_ is None else [str(n) for n in self.feature_names_in_],
+            'n_features': self.n_features_in_
+        })
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        arrays, meta = _load_arrays(path, mmap_mode)
+        return cls(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=arrays['left'],
+            right=arrays['right'],
+            path_length=arrays['path_length'],
+            roots=arrays['roots'],
+            max_depth=meta['max_depth'],
+            denominator=meta['denominator'],
+            offset=meta['offset'],
+            feature_names=meta['feature_names'],
+            children=arrays['children'],
+            n_features=meta.get('n_features')
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def score_samples(self, X):
+        X = _as_rows(X)
+        _reject_nan(X, 'IsolationForest')
+        leaves = _apply_trees(X, self.feature, self.threshold, self.children, self.roots, self.max_depth)
+        depths = np.cumsum(self.path_length.take(leaves), axis=1)[:, -1]
+        if self.denominator == 0:
+            # sklearn scores a single-sample forest as 2 ** -1
+            return np.full_like(depths, -0.5)
+        return -(2 ** (-(depths / self.denominator)))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        decision = self.decision_function(X)
+        is_inlier = np.ones_like(decision, dtype=int)
+        is_inlier[decision < 0] = -1
+        return is_inlier
+
+
+class CompiledMLP:
+    """
+    Float32 forward pass for the ReLU MLPClassifier member.
+
+    The fitted StandardScaler is applied in two parts so predict_proba takes
+    raw, unscaled features: the mean is subtracted in float64 (`center`), then
+    1 / scale is folded into the first layer (W0' = W0 / scale). Folding the
+    mean into the float32 bias instead cancels catastrophically for
+    large-offset features (a block number, wei amounts): mean / scale of 1e5
+    left ~1e-2 of error. Activations go into per-thread preallocated buffers
+    that grow to the largest batch seen.
+
+    Probabilities match sklearn's float64 predict_proba(scaler.transform(X))
+    within MLP_PARITY_ATOL.
+    """
+
+    def __init__(self, weights, biases, classes=(0, 1), center=None):
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.classes_ = np.asarray(classes)
+        # float64 offset subtracted before the float32 layers (None: bundles with the mean in b0)
+        self.center = np.ascontiguousarray(center, dtype=np.float64) if center is not None else None
+        self.n_features_in_ = self.weights[0].shape[0]
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, mlp, scaler=None):
+        """Export a fitted binary ReLU MLPClassifier, optionally folding in its StandardScaler"""
+        if mlp.activation != 'relu' or mlp.out_activation_ != 'logistic':
+            raise ValueError(
+                f"Only relu/logistic MLPs can be compiled (got {mlp.activation}/{mlp.out_activation_})"
+            )
+
+        weights = [np.asarray(w, dtype=np.float64) for w in mlp.coefs_]
+        biases = [np.asarray(b, dtype=np.float64) for b in mlp.intercepts_]
+
+        center = None
+        if scaler is not None:
+            # Fold in float64, cast once at the end; the mean stays out of the float32 bias
+            n_features = weights[0].shape[0]
+            scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+            center = scaler.mean_ if scaler.with_mean else None
+            weights[0] = weights[0] / scale[:, None]
+
+        return cls(weights, biases, classes=mlp.classes_, center=center)
+
+    def save(self, path):
+        """Write the float32 layers to a directory of .npy files (see _save_arrays)"""
+        arrays = {'classes': self.classes_}
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f'W{i}'] = w
+            arrays[f'b{i}'] = b
+        if self.center is not None:
+            arrays['center'] = self.center
+        _save_arrays(path, arrays, {'n_layers': len(self.weights)})
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        arrays, meta = _load_arrays(path, mmap_mode)
+        n_layers = meta['n_layers']
+        weights = [arrays[f'W{i}'] for i in range(n_layers)]
+        biases = [arrays[f'b{i}'] for i in range(n_layers)]
+        return cls(weights, biases, classes=np.array(arrays['classes']), center=arrays.get('center'))
+
+    def _buffers(self, n_rows):
+        """Per-thread activation buffers with room for at least n_rows"""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None or buffers[0].shape[0] < n_rows:
+            capacity = 1
+            while capacity < n_rows:
+                capacity *= 2
+            buffers = [np.empty((capacity, w.shape[1]), dtype=np.float32) for w in self.weights]
+            self._local.buffers = buffers
+        return buffers
+
+    def predict_proba(self, X):
+        if self.center is not None:
+            X = np.subtract(X, self.center, dtype=np.float64).astype(np.float32)
+        else:
+            X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        n_rows = X.shape[0]
+        buffers = self._buffers(n_rows)
+        last = len(self.weights) - 1
+
+        activation = X
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            out = buffers[i][:n_rows]
+            np.matmul(activation, w, out=out)
+            out += b
+            if i < last:
+                np.maximum(out, 0.0, out=out)
+            activation = out
+
+        positive = _expit(activation[:, 0].astype(np.float64))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+
+class CompiledScaler:
+    """StandardScaler.transform on stored mean/scale arrays (same float64 ops, no sklearn import)"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.n_features_in_ = len(mean)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        n_features = scaler.n_features_in_
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        return cls(np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64))
+
+    def save(self, path):
+        _save_arrays(path, {'mean': self.mean_, 'scale': self.scale_}, {})
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        arrays, _ = _load_arrays(path, mmap_mode)
+        return cls(arrays['mean'], arrays['scale'])
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+def process_memory(pid='self'):
+    """
+    Resident memory of a process in kB from /proc/<pid>/smaps_rollup (Linux only, else {}).
+    Pss splits shared pages between the processes mapping them, so with mmap'd
+    models the per-worker Pss stays flat as workers are added while Rss does not.
+    """
+    fields = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return {}
+
+    memory = {}
+    for line in lines:
+        key, _, rest = line.partition(':')
+        if key in fields:
+            memory[f'{key.lower()}_kb'] = int(rest.split()[0])
+    return memory
+
+
+def prefork_memory(serving, X, workers):
+    """
+    Fork `workers` children that each score X with the mapped `serving` models,
+    then average their process_memory() while all of them are alive.
+    """
+    import multiprocessing
+
+    def worker(ready, release):
+        scaled = serving['scaler'].transform(X)
+        serving['isolation_forest'].decision_function(scaled)
+        for name in ('random_forest', 'gradient_boosting', 'neural_network'):
+            serving[name].predict_proba(X)
+        ready.put(os.getpid())
+        release.wait()
+
+    ctx = multiprocessing.get_context('fork')
+    ready = ctx.Queue()
+    release = ctx.Event()
+    procs = [ctx.Process(target=worker, args=(ready, release)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+
+    pids = [ready.get() for _ in procs]
+    samples = [process_memory(pid) for pid in pids]
+    release.set()
+    for proc in procs:
+        proc.join()
+
+    if not all(samples):
+        return {'rss_kb': 0, 'pss_kb': 0, 'private_kb': 0}
+    return {
+        'rss_kb': sum(m['rss_kb'] for m in samples) / workers,
+        'pss_kb': sum(m['pss_kb'] for m in samples) / workers,
+        'private_kb': sum(m['private_clean_kb'] + m['private_dirty_kb'] for m in samples) / workers
+    }
+
+
+def compile_tree_model(model):
+    """Compile a fitted tree ensemble or IsolationForest, returning it unchanged if already compiled"""
+    if isinstance(model, (CompiledTreeEnsemble, CompiledIsolationForest)):
+        return model
+    if type(model).__name__ == 'IsolationForest':
+        return CompiledIsolationForest.from_sklearn(model)
+    return CompiledTreeEnsemble.from_sklearn(model)
+
+
+def load_compiled_tree_model(path):
+    """Load a joblib-pickled tree ensemble and compile it"""
+    import joblib
+    return compile_tree_model(joblib.load(path))
+
+
+def check_parity(reference, compiled, X, atol=PARITY_ATOL):
+    """Max absolute probability difference; raises if it exceeds atol"""
+    diff = float(np.max(np.abs(reference.predict_proba(X) - compiled.predict_proba(X))))
+    if diff > atol:
+        raise AssertionError(f"Compiled model diverges from reference: max |dp| = {diff:.3e} > {atol:.1e}")
+    return diff
+
+
+def benchmark(model, X, repeats=50):
+    """Mean seconds per predict_proba call over X"""
+    model.predict_proba(X)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_proba(X)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    """Parity check and benchmark of compiled vs sklearn models on the training data"""
+    import pandas as pd
+    from model_bundle import load_model_bundle
+
+    print("=" * 80)
+    print("🐺 CERBERUS COMPILED MODEL CHECK")
+    print("=" * 80)
+
+    from advanced_trainer import CerberusAdvancedTrainer
+    trainer = CerberusAdvancedTrainer()
+    df = trainer.engineer_features(pd.read_csv(trainer.data_path))
+
+    # Reference sklearn estimators stored alongside the compiled arrays
+    bundle = load_model_bundle()
+    feature_names = bundle.feature_names
+
+    X = df[feature_names].fillna(0).values
+    rng = np.random.default_rng(42)
+    batch = X[rng.integers(0, len(X), 1000)] * rng.uniform(0.5, 2.0, (1000, X.shape[1]))
+    single = batch[:1]
+
+    for name in ('random_forest', 'gradient_boosting'):
+        reference = bundle.load_reference(name)
+        compiled = compile_tree_model(reference)
+
+        diff = check_parity(reference, compiled, batch)
+        print(f"\n{name}: {compiled.n_trees} trees, depth {compiled.max_depth}, max |dp| = {diff:.2e}")
+
+        for label, rows, repeats in (('1 row', single, 200), ('1k rows', batch, 20)):
+            sk = benchmark(reference, rows, repeats)
+            fast = benchmark(compiled, rows, repeats)
+            print(f"   {label:>8}: sklearn {sk * 1e3:8.3f} ms | compiled {fast * 1e3:8.3f} ms | {sk / fast:6.1f}x")
+
+    scaler = bundle.load_reference('scaler')
+    reference = bundle.load_reference('isolation_forest')
+    compiled = compile_tree_model(reference)
+    scaled = scaler.transform(batch)
+
+    exact = bool(
+        np.array_equal(reference.decision_function(scaled), compiled.decision_function(scaled))
+        and np.array_equal(reference.predict(scaled), compiled.predict(scaled))
+    )
+    if not exact:
+        raise AssertionError("Compiled IsolationForest does not reproduce decision_function/predict")
+    print(f"\nisolation_forest: {compiled.n_trees} trees, depth {compiled.max_depth}, bit-identical")
+
+    for label, rows, repeats in (('1 row', scaled[:1], 200), ('1k rows', scaled, 20)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            reference.decision_function(rows)
+        sk = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            compiled.decision_function(rows)
+        fast = (time.perf_counter() - start) / repeats
+        print(f"   {label:>8}: sklearn {sk * 1e3:8.3f} ms | compiled {fast * 1e3:8.3f} ms | {sk / fast:6.1f}x")
+
+    from sklearn.pipeline import make_pipeline
+    mlp = bundle.load_reference('neural_network')
+    reference = make_pipeline(scaler, mlp)
+    compiled = CompiledMLP.from_sklearn(mlp, scaler)
+
+    diff = check_parity(reference, compiled, batch, atol=MLP_PARITY_ATOL)
+    print(f"\nneural_network: layers {[w.shape for w in compiled.weights]}, float32, max |dp| = {diff:.2e}")
+
+    for label, rows, repeats in (('1 row', single, 500), ('1k rows', batch, 50)):
+        sk = benchmark(reference, rows, repeats)
+        fast = benchmark(compiled, rows, repeats)
+        print(f"   {label:>8}: sklearn {sk * 1e3:8.3f} ms | float32 {fast * 1e3:8.3f} ms | {sk / fast:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,77 +4,46 @@ from web3 import Web3
 from web3.middleware import ExtraDataToPOAMiddleware
 import pandas as pd
 from datetime import datetime
-import time
 from typing import List, Dict
 import logging
 
+from tx_features import transaction_record
+from block_fetcher import BlockFetcher, RPC_TIMEOUT
+from rpc_pool import RpcPool, RPC_URLS
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 U2U_RPC = "https://rpc-nebulas-testnet.uniultra.xyz"
+# Extra endpoints: CERBERUS_RPC_URLS="https://a,https://b" (replaces U2U_RPC)
+RPC_ENDPOINTS = RPC_URLS or [U2U_RPC]
 BLOCKS_TO_SCAN = 5000
-BATCH_SIZE = 50
+BATCH_SIZE = 50          # progress log interval, in blocks
 
 class U2UDataCollector:
     """Collect real transaction data from U2U Network"""
     
-    def __init__(self, rpc_url: str):
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={'timeout': 60}))
+    def __init__(self, rpc_urls):
+        rpc_urls = [rpc_urls] if isinstance(rpc_urls, str) else list(rpc_urls)
+        self.w3 = Web3(Web3.HTTPProvider(rpc_urls[0], request_kwargs={'timeout': RPC_TIMEOUT}))
         self.w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
         
         if not self.w3.is_connected():
             raise ConnectionError("Cannot connect to U2U Network")
         
+        # Historical scans go through batched JSON-RPC over every endpoint, with adaptive
+        # per-endpoint concurrency (CERBERUS_COLLECTOR_* / CERBERUS_RPC_* settings)
+        self.rpc = RpcPool(rpc_urls)
+        self.fetcher = BlockFetcher(self.rpc, concurrency=self.rpc.max_concurrency)
+        
         logger.info(f"✅ Connected to U2U Network")
         logger.info(f"📊 Latest block: {self.w3.eth.block_number}")
     
     def extract_transaction_features(self, tx, receipt=None) -> Dict:
-        """Extract features dari transaction untuk ML model"""
+        """Extract features dari transaction untuk ML model (tx_features schema, same as serving)"""
         try:
-            features = {
-                'hash': tx['hash'].hex() if isinstance(tx['hash'], bytes) else str(tx['hash']),
-                'from': tx.get('from', ''),
-                'to': tx.get('to', '') if tx.get('to') else None,
-                'value': float(self.w3.from_wei(int(tx.get('value', 0)), 'ether')),
-                'gas': int(tx.get('gas', 0)),
-                'gasPrice': int(tx.get('gasPrice', 0)),
-                'nonce': int(tx.get('nonce', 0)),
-                'blockNumber': int(tx.get('blockNumber', 0)),
-            }
-            
-            features['isContractCreation'] = 1 if tx.get('to') is None else 0
-            
-            input_data = tx.get('input', '0x')
-            if isinstance(input_data, bytes):
-                input_data = input_data.hex()
-            features['inputLength'] = len(input_data)
-            features['hasInput'] = 1 if len(input_data) > 2 else 0
-            
-            if len(input_data) > 10:
-                features['functionSelector'] = input_data[:10]
-            else:
-                features['functionSelector'] = None
-            
-            if receipt:
-                features['gasUsed'] = int(receipt.get('gasUsed', 0))
-                features['status'] = int(receipt.get('status', 0))
-                features['logsCount'] = len(receipt.get('logs', []))
-                
-                if features['gas'] > 0:
-                    features['gasEfficiency'] = features['gasUsed'] / features['gas']
-                else:
-                    features['gasEfficiency'] = 0
-            else:
-                features['gasUsed'] = features['gas']
-                features['status'] = 1
-                features['logsCount'] = 0
-                features['gasEfficiency'] = 0.7
-            
-            features['valueDensity'] = features['value'] / max(features['gasUsed'], 1)
-            features['gasPrice_gwei'] = self.w3.from_wei(features['gasPrice'], 'gwei')
-            
+            features = transaction_record(tx, receipt)
             features['timestamp'] = datetime.now().isoformat()
-            
             return features
             
         except Exception as e:
@@ -84,18 +53,7 @@ class U2UDataCollector:
     def collect_block_transactions(self, block_number: int) -> List[Dict]:
         """Collect all transactions from a specific block"""
         try:
-            block = self.w3.eth.get_block(block_number, full_transactions=True)
-            transactions = []
-            
-            for tx in block.get('transactions', []):
-                try:
-                    receipt = self.w3.eth.get_transaction_receipt(tx['hash'])
-                except Exception:
-                    receipt = None
-                
-                features = self.extract_transaction_features(tx, receipt)
-                if features:
-                    transactions.append(features)
+            transactions = self._block_records(self.fetcher.fetch_chunk([block_number])[0])
             
             if len(transactions) > 0:
                 logger.info(f"📦 Block {block_number}: {len(transactions)} transactions")
@@ -105,33 +63,46 @@ class U2UDataCollector:
             logger.debug(f"Error on block {block_number}: {e}")
             return []
     
+    def _block_records(self, fetched) -> List[Dict]:
+        """Dataset rows for one (number, block, receipts) from BlockFetcher"""
+        _, block, receipts = fetched
+        transactions = []
+        for tx, receipt in zip(block.get('transactions', []), receipts):
+            features = self.extract_transaction_features(tx, receipt)
+            if features:
+                transactions.append(features)
+        return transactions
+    
     def collect_historical_data(self, num_blocks: int = BLOCKS_TO_SCAN) -> pd.DataFrame:
-        """Collect historical transaction data"""
+        """Collect historical transaction data (batched JSON-RPC, concurrent, in block order)"""
         latest_block = self.w3.eth.block_number
         start_block = max(0, latest_block - num_blocks)
         
         logger.info(f"🚀 Starting data collection...")
-        logger.info(f"📊 Scanning blocks {start_block} to {latest_block}")
+        logger.info(f"📊 Scanning blocks {start_block} to {latest_block} "
+                    f"({len(self.rpc.endpoints)} endpoints, {self.fetcher.blocks_per_request} blocks per request)")
         
         all_transactions = []
         
-        for batch_start in range(start_block, latest_block, BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, latest_block)
-            
-            logger.info(f"⚙️ Batch: {batch_start}-{batch_end}")
+        for block_num, block, receipts in self.fetcher.iter_blocks(start_block, latest_block):
+            all_transactions.extend(self._block_records((block_num, block, receipts)))
             
-            for block_num in range(batch_start, batch_end):
-                transactions = self.collect_block_transactions(block_num)
-                all_transactions.extend(transactions)
-                time.sleep(0.05)
+            if (block_num - start_block + 1) % BATCH_SIZE == 0:
+                logger.info(f"⚙️ Block {block_num}: {len(all_transactions)} txs so far")
             
-            if len(all_transactions) > 0 and batch_start % 500 == 0:
+            if len(all_transactions) > 0 and block_num % 500 == 0:
                 temp_df = pd.DataFrame(all_transactions)
-                temp_df.to_csv(f'temp_data_{batch_start}.csv', index=False)
+                temp_df.to_csv(f'temp_data_{block_num}.csv', index=False)
                 logger.info(f"💾 Progress saved: {len(all_transactions)} txs")
         
         df = pd.DataFrame(all_transactions)
+        stats = self.fetcher.stats()
         logger.info(f"✅ Collected {len(df)} transactions")
+        logger.info(f"⏱️  {stats['blocks_per_second']:.1f} blocks/s | {stats['rpc']['requests']} RPC requests | "
+                    f"{stats['missing_receipts']} receipts unavailable | {stats['skipped_blocks']} blocks skipped")
+        for endpoint in stats['rpc']['endpoints']:
+            logger.info(f"   🌐 {endpoint['url']}: {endpoint['requests']} requests | concurrency {endpoint['limit']} | "
+                        f"{endpoint['throttled']} throttled | {endpoint['errors']} errors")
         
         return df
     
@@ -204,7 +175,7 @@ def main():
     print()
     
     try:
-        collector = U2UDataCollector(U2U_RPC)
+        collector = U2UDataCollector(RPC_ENDPOINTS)
         
         print("\n📡 Collecting data from U2U Network...")
         df = collector.collect_historical_data(BLOCKS_TO_SCAN)
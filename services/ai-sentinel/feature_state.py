@@ -0,0 +1,374 @@
+"""
+Cerberus Feature State
+Bounded per-sender state for AdvancedFeatureExtractor. Addresses are interned
+to an integer key and a slot id; the counters live in typed array columns
+(array.array, viewed as NumPy for sweeps) indexed by slot instead of one dict
+of Python objects per sender. When the store is
+full, senders idle for longer than the TTL are dropped first, then the least
+recently seen, in one vectorized sweep down to 90% of capacity.
+
+ShardedAddressStateStore splits senders over N independent stores, each with
+its own lock, so concurrent requests for different senders do not queue on one
+lock and a sweep only pauses the shard that is full.
+
+Value patterns are kept as fixed-size log-scale histograms per value bucket
+instead of an ever-growing list of every value seen.
+"""
+
+import os
+import sys
+import time
+import array
+import threading
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Senders tracked per process and how long an idle sender is remembered
+ADDRESS_STATE_MAX = int(os.environ.get('CERBERUS_ADDRESS_STATE_MAX', 200000))
+ADDRESS_STATE_TTL = float(os.environ.get('CERBERUS_ADDRESS_STATE_TTL', 24 * 3600))
+# Independent lock + store per shard (senders are spread by address)
+ADDRESS_STATE_SHARDS = int(os.environ.get('CERBERUS_ADDRESS_STATE_SHARDS', 16))
+
+# A full store sweeps down to this fraction of capacity, so sweeps are rare
+_SWEEP_TARGET = 0.9
+
+
+def intern_address(address):
+    """Integer key for a 0x-hex address (smaller than the 42-char str); other strings stay as-is"""
+    try:
+        return int(address, 16)
+    except (TypeError, ValueError):
+        return address
+
+
+class AddressStateStore:
+    """
+    Per-sender tx count, total value, creation count and first/last seen
+    (epoch seconds) in array columns. Capacity and TTL are hard bounds.
+    """
+
+    COLUMNS = (
+        ('tx_count', 'q'),
+        ('total_value', 'd'),
+        ('contract_interactions', 'q'),
+        ('first_seen', 'd'),
+        ('last_seen', 'd')
+    )
+
+    def __init__(self, max_addresses=ADDRESS_STATE_MAX, ttl_seconds=ADDRESS_STATE_TTL, initial_capacity=1024):
+        self.max_addresses = max(int(max_addresses), 1)
+        self.ttl_seconds = float(ttl_seconds)
+
+        self._slots = {}        # interned address -> slot
+        self._keys = []         # slot -> interned address (None when free)
+        self._free = []
+        self._columns = {name: array.array(typecode) for name, typecode in self.COLUMNS}
+        self._allocate(min(int(initial_capacity), self.max_addresses))
+        self._lock = threading.Lock()
+
+        self._inserts = 0
+        self._ttl_evictions = 0
+        self._lru_evictions = 0
+        self._sweeps = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, address):
+        return intern_address(address) in self._slots
+
+    def _allocate(self, capacity):
+        """Grow the columns (doubling, capped at max_addresses)"""
+        old = len(self._keys)
+        for column in self._columns.values():
+            column.frombytes(bytes(column.itemsize * (capacity - old)))
+        self._keys.extend([None] * (capacity - old))
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def _release(self, slots):
+        for slot in slots:
+            del self._slots[self._keys[slot]]
+            self._keys[slot] = None
+            self._free.append(int(slot))
+
+    def _sweep(self, now):
+        """Drop expired senders, then the least recently seen, down to the sweep target"""
+        used = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        last_seen = np.frombuffer(self._columns['last_seen'], dtype=np.float64)[used]
+
+        expired = used[last_seen < now - self.ttl_seconds]
+        self._release(expired)
+        self._ttl_evictions += len(expired)
+
+        excess = len(self._slots) - int(self.max_addresses * _SWEEP_TARGET)
+        if excess > 0:
+            alive = last_seen >= now - self.ttl_seconds
+            used, last_seen = used[alive], last_seen[alive]
+            oldest = used[np.argpartition(last_seen, excess - 1)[:excess]]
+            self._release(oldest)
+            self._lru_evictions += len(oldest)
+
+        self._sweeps += 1
+
+    def _slot_for(self, key, now):
+        slot = self._slots.get(key)
+        if slot is not None:
+            if self._columns['last_seen'][slot] >= now - self.ttl_seconds:
+                return slot
+            # Idle past the TTL: start over as a new sender
+            self._ttl_evictions += 1
+        else:
+            if not self._free:
+                if len(self._keys) < self.max_addresses:
+                    self._allocate(min(len(self._keys) * 2, self.max_addresses))
+                else:
+                    self._sweep(now)
+            slot = self._free.pop()
+            self._slots[key] = slot
+            self._keys[slot] = key
+        self._inserts += 1
+
+        for name, _ in self.COLUMNS:
+            self._columns[name][slot] = 0
+        self._columns['first_seen'][slot] = now
+        return slot
+
+    def observe(self, address, value_eth, is_contract_creation, now=None):
+        """Record one transaction from `address`; returns (tx_count, total_value, age_hours)"""
+        return self.observe_key(intern_address(address), value_eth, is_contract_creation, now)
+
+    def observe_key(self, key, value_eth, is_contract_creation, now=None):
+        """observe() for an already interned address"""
+        now = time.time() if now is None else now
+        columns = self._columns
+        with self._lock:
+            slot = self._slot_for(key, now)
+            columns['tx_count'][slot] += 1
+            columns['total_value'][slot] += value_eth
+            columns['last_seen'][slot] = now
+            if is_contract_creation:
+                columns['contract_interactions'][slot] += 1
+            return (
+                columns['tx_count'][slot],
+                columns['total_value'][slot],
+                (now - columns['first_seen'][slot]) / 3600
+            )
+
+    def get(self, address):
+        """Counters for a tracked sender as a dict, or None"""
+        with self._lock:
+            slot = self._slots.get(intern_address(address))
+            if slot is None:
+                return None
+            return {name: self._columns[name][slot] for name, _ in self.COLUMNS}
+
+    def memory_bytes(self):
+        """Approximate footprint: columns + slot dict + interned keys + slot list"""
+        columns = sum(column.itemsize * len(column) for column in self._columns.values())
+        keys = sum(sys.getsizeof(key) for key in self._slots)
+        return columns + sys.getsizeof(self._slots) + keys + sys.getsizeof(self._keys) + sys.getsizeof(self._free)
+
+    def stats(self):
+        # Locked: memory_bytes() walks the slot dict that a sweep may be shrinking
+        with self._lock:
+            tracked = len(self._slots)
+            memory = self.memory_bytes()
+        evictions = self._ttl_evictions + self._lru_evictions
+        return {
+            'tracked_addresses': tracked,
+            'max_addresses': self.max_addresses,
+            'ttl_seconds': self.ttl_seconds,
+            'allocated_slots': len(self._keys),
+            'memory_bytes': memory,
+            'bytes_per_address': (memory / tracked) if tracked else 0.0,
+            'inserts': self._inserts,
+            'ttl_evictions': self._ttl_evictions,
+            'lru_evictions': self._lru_evictions,
+            'sweeps': self._sweeps,
+            'evictions_per_1k_inserts': (evictions / self._inserts * 1000) if self._inserts else 0.0
+        }
+
+
+class ShardedAddressStateStore:
+    """
+    AddressStateStore split into `shards` independent stores by address. Same
+    interface; capacity is divided evenly, so eviction order is per shard.
+    """
+
+    def __init__(self, max_addresses=ADDRESS_STATE_MAX, ttl_seconds=ADDRESS_STATE_TTL,
+                 shards=ADDRESS_STATE_SHARDS, initial_capacity=1024):
+        self.n_shards = max(int(shards), 1)
+        per_shard = -(-max(int(max_addresses), 1) // self.n_shards)
+        self.max_addresses = per_shard * self.n_shards
+        self.ttl_seconds = float(ttl_seconds)
+        self.shards = [
+            AddressStateStore(per_shard, ttl_seconds, max(int(initial_capacity) // self.n_shards, 16))
+            for _ in range(self.n_shards)
+        ]
+
+    def _shard(self, key):
+        # Interned addresses are uniformly distributed ints; anything else falls back to hash()
+        return self.shards[(key if isinstance(key, int) else hash(key)) % self.n_shards]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, address):
+        key = intern_address(address)
+        return key in self._shard(key)._slots
+
+    def observe(self, address, value_eth, is_contract_creation, now=None):
+        """Record one transaction from `address`; returns (tx_count, total_value, age_hours)"""
+        key = intern_address(address)
+        return self._shard(key).observe_key(key, value_eth, is_contract_creation, now)
+
+    def get(self, address):
+        key = intern_address(address)
+        return self._shard(key).get(key)
+
+    def memory_bytes(self):
+        return sum(shard.memory_bytes() for shard in self.shards)
+
+    def stats(self):
+        shard_stats = [shard.stats() for shard in self.shards]
+        merged = {
+            name: sum(stats[name] for stats in shard_stats)
+            for name in ('tracked_addresses', 'allocated_slots', 'memory_bytes', 'inserts',
+                         'ttl_evictions', 'lru_evictions', 'sweeps')
+        }
+        tracked = merged['tracked_addresses']
+        evictions = merged['ttl_evictions'] + merged['lru_evictions']
+        merged.update({
+            'max_addresses': self.max_addresses,
+            'ttl_seconds': self.ttl_seconds,
+            'shards': self.n_shards,
+            'largest_shard': max(stats['tracked_addresses'] for stats in shard_stats),
+            'bytes_per_address': (merged['memory_bytes'] / tracked) if tracked else 0.0,
+            'evictions_per_1k_inserts': (evictions / merged['inserts'] * 1000) if merged['inserts'] else 0.0
+        })
+        return merged
+
+
+class ValueHistograms:
+    """Fixed-size log10 histogram of transaction values per value bucket ('zero', 'dust', ...)"""
+
+    def __init__(self, low_eth=1e-9, high_eth=1e6, bins_per_decade=4):
+        self.low_exp = float(np.log10(low_eth))
+        self.bins_per_decade = int(bins_per_decade)
+        # Bin 0 holds zero / below-range values, the last bin everything above the range
+        self.n_bins = int((np.log10(high_eth) - self.low_exp) * self.bins_per_decade) + 2
+        self._hist = {}
+        self._count = {}
+        self._sum = {}
+        self._lock = threading.Lock()
+
+    def _bin(self, value_eth):
+        if value_eth <= 0:
+            return 0
+        position = int((np.log10(value_eth) - self.low_exp) * self.bins_per_decade) + 1
+        return min(max(position, 0), self.n_bins - 1)
+
+    def observe(self, bucket, value_eth):
+        index = self._bin(value_eth)
+        with self._lock:
+            hist = self._hist.get(bucket)
+            if hist is None:
+                hist = self._hist[bucket] = np.zeros(self.n_bins, dtype=np.int64)
+                self._count[bucket] = 0
+                self._sum[bucket] = 0.0
+            hist[index] += 1
+            self._count[bucket] += 1
+            self._sum[bucket] += value_eth
+
+    def bin_edges(self):
+        """Lower edge (ETH) of every bin; bin 0 starts at 0"""
+        exps = self.low_exp + np.arange(self.n_bins - 1) / self.bins_per_decade
+        return np.concatenate([[0.0], 10.0 ** exps])
+
+    def stats(self):
+        with self._lock:
+            return {
+                bucket: {
+                    'count': self._count[bucket],
+                    'mean_eth': self._sum[bucket] / self._count[bucket],
+                    'nonzero_bins': int(np.count_nonzero(hist))
+                }
+                for bucket, hist in self._hist.items()
+            }
+
+
+def main():
+    """Memory and throughput of the bounded store vs the per-sender dict it replaces"""
+    import random
+    import tracemalloc
+    from collections import defaultdict
+    from datetime import datetime
+
+    print("=" * 80)
+    print("🐺 CERBERUS ADDRESS STATE CHECK")
+    print("=" * 80)
+
+    rng = random.Random(5)
+    senders = 300000
+    addresses = [f'0x{rng.getrandbits(160):040x}' for _ in range(senders)]
+
+    def old_layout():
+        # One dict of six objects per sender, keyed by the lowercased address, never evicted
+        patterns = defaultdict(dict)
+        for address in addresses:
+            patterns[address.lower()] = {
+                'tx_count': 1, 'total_value': 0.5, 'avg_gas_price': 0, 'contract_interactions': 0,
+                'first_seen': datetime.now(), 'last_seen': datetime.now()
+            }
+        return patterns
+
+    def new_layout():
+        store = AddressStateStore(max_addresses=senders)
+        for address in addresses:
+            store.observe(address.lower(), 0.5, False)
+        return store
+
+    print(f"\n{senders} distinct senders:")
+    for label, build in (('dict per sender', old_layout), ('AddressStateStore', new_layout)):
+        started = time.perf_counter()
+        built = build()
+        seconds = time.perf_counter() - started
+        del built
+
+        tracemalloc.start()
+        built = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        extra = f" (self-reported {built.stats()['bytes_per_address']:.1f})" if label != 'dict per sender' else ''
+        del built
+        print(f"   {label:<18} {size / senders:7.1f} B/address | {seconds / senders * 1e6:5.2f} µs/insert{extra}")
+
+    # Capped store under a mainnet-like stream: a hot set of repeat senders plus a long tail of one-offs
+    hot = addresses[:5000]
+    stream = [rng.choice(hot) if rng.random() < 0.6 else addresses[rng.randrange(senders)] for _ in range(1000000)]
+    for label, store in (('single store', AddressStateStore(max_addresses=50000, ttl_seconds=3600)),
+                         (f'{ADDRESS_STATE_SHARDS} shards', ShardedAddressStateStore(max_addresses=50000, ttl_seconds=3600))):
+        now = 0.0
+        worst = 0.0
+        started = time.perf_counter()
+        for address in stream:
+            now += 0.01
+            call_started = time.perf_counter()
+            store.observe(address, 0.1, False, now=now)
+            # The slowest observe is the one that ran a sweep while holding the lock
+            worst = max(worst, time.perf_counter() - call_started)
+        elapsed = time.perf_counter() - started
+        stats = store.stats()
+        hot_kept = sum(1 for address in hot if address in store)
+        print(f"\n1M tx, cap 50000, TTL 1 h (simulated 2.8 h), {label}: {elapsed / 1e6 * 1e6:.2f} µs/observe, "
+              f"longest {worst * 1000:.1f} ms")
+        print(f"   tracked {stats['tracked_addresses']} | {stats['bytes_per_address']:.1f} B/address | "
+              f"{stats['memory_bytes'] / 2**20:.1f} MiB")
+        print(f"   evictions: ttl {stats['ttl_evictions']} lru {stats['lru_evictions']} in {stats['sweeps']} sweeps "
+              f"({stats['evictions_per_1k_inserts']:.0f} per 1k inserts) | hot senders kept {hot_kept}/{len(hot)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Cerberus AI Sentinel - Prefork production server
+Loads the models once in the master, then forks N workers that share them.
+
+    gunicorn -c gunicorn.conf.py app:app
+    gunicorn -c gunicorn.conf.py production_ai_api:app
+    gunicorn -c gunicorn.conf.py advanced_ai_sentinel:app
+
+Env:
+    PORT               listen port (default 5001)
+    CERBERUS_WORKERS   worker processes (default: one per CPU core)
+    CERBERUS_THREADS   request threads per worker (default 8; feeds the micro-batcher)
+    CERBERUS_MODEL_WATCH_INTERVAL  seconds between model_bundle/ version checks (default 5, 0 = off)
+
+The ensemble is served from model_bundle/ (written by advanced_trainer.py, see
+model_bundle.py), where every array is an uncompressed .npy opened with
+mmap_mode='r'. Those pages live in the page cache once and are mapped
+read-only into every worker, so adding workers adds only per-process Python
+state - check /stats -> worker.memory (Pss / Private_*) in each worker.
+Each worker runs its own bundle watcher and swaps a retrained bundle in
+without a restart; POST /admin/reload only reloads the worker that serves it.
+`python app.py` remains the single-process development server.
+"""
+
+import os
+import multiprocessing
+
+# One BLAS thread per worker: the processes already use every core
+for var in ('OPENBLAS_NUM_THREADS', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(var, '1')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+workers = int(os.environ.get('CERBERUS_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('CERBERUS_THREADS', 8))
+
+# Import the app (and map the models) in the master before forking
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+accesslog = None
+errorlog = '-'
+loglevel = 'info'
+
+
+def post_fork(server, worker):
+    server.log.info(f"🐺 Worker {worker.pid} forked (sharing preloaded models)")
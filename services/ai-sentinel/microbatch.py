@@ -0,0 +1,210 @@
+"""
+Cerberus Micro-Batching Scheduler
+Collects concurrent single-transaction requests for a short window and
+scores them as one matrix, so clients that only send one tx at a time
+(monitor.js) still get batch throughput from the ensemble.
+"""
+
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# predict() waits at most the window plus this long for its batch to be scored
+SCORE_TIMEOUT_S = float(os.environ.get('CERBERUS_MICROBATCH_SCORE_TIMEOUT', 5.0))
+
+
+class MicroBatchScheduler:
+    """Hold requests for up to max_wait_ms or max_batch_size items, then score them together"""
+
+    def __init__(self, score_batch, max_wait_ms=2.0, max_batch_size=64, max_queue_size=10000,
+                 score_timeout=SCORE_TIMEOUT_S):
+        """
+        score_batch: callable taking a list of items and returning a list of
+        results in the same order (e.g. CerberusAI.predict_batch)
+        """
+        self.score_batch = score_batch
+        self.score_timeout = float(score_timeout)
+        self.max_wait_ms = float(max_wait_ms)
+        self.max_batch_size = int(max_batch_size)
+        self.max_queue_size = int(max_queue_size)
+
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._running = True
+
+        # Batch-size distribution in power-of-two buckets: 1, 2, 4, ... max_batch_size
+        self._size_buckets = {}
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._total_wait_s = 0.0
+
+    def submit(self, item):
+        """Queue one item and return a Future resolved with its own result"""
+        self._ensure_worker()
+
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            raise RuntimeError(f"Micro-batch queue full ({self.max_queue_size} pending)")
+
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+
+        return future
+
+    def predict(self, item, timeout=None):
+        """
+        Blocking helper: submit one item and wait for its result. Waits at most
+        `timeout` seconds (default: the window plus score_timeout), then raises
+        concurrent.futures.TimeoutError, so a dead dispatcher cannot hang callers.
+        """
+        if timeout is None:
+            timeout = self.max_wait_ms / 1000.0 + self.score_timeout
+        return self.submit(item).result(timeout=timeout)
+
+    def configure(self, max_wait_ms=None, max_batch_size=None):
+        """Retune the window at runtime; applies from the next batch"""
+        if max_wait_ms is not None:
+            self.max_wait_ms = float(max_wait_ms)
+        if max_batch_size is not None:
+            self.max_batch_size = int(max_batch_size)
+
+    def shutdown(self, timeout=1.0):
+        """Stop the dispatcher thread after the current batch; items still queued fail with RuntimeError"""
+        self._running = False
+        worker = self._worker
+        if worker is not None:
+            self._queue.put((None, None, None))
+            worker.join(timeout=timeout)
+        if worker is None or not worker.is_alive():
+            self._fail_pending(RuntimeError("Micro-batch scheduler shut down"))
+
+    def _fail_pending(self, error):
+        """Resolve every future still in the queue with `error` (sentinels are dropped)"""
+        failed = 0
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_exception(error)
+                failed += 1
+        if failed:
+            logger.warning(f"⚠️  {failed} queued micro-batch requests failed: {error}")
+
+    def stats(self):
+        """Queue depth and batch-size distribution"""
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            return {
+                'max_wait_ms': self.max_wait_ms,
+                'max_batch_size': self.max_batch_size,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': batches,
+                'items': items,
+                'avg_batch_size': (items / batches) if batches else 0.0,
+                'avg_queue_wait_ms': (self._total_wait_s / items * 1000) if items else 0.0,
+                'batch_size_distribution': {
+                    f'<={size}': count for size, count in sorted(self._size_buckets.items())
+                }
+            }
+
+    def _ensure_worker(self):
+        """Start the dispatcher lazily (and again in a forked child, where threads don't survive)"""
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._running = True
+            self._worker = threading.Thread(target=self._run, name='cerberus-microbatch', daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the window closes or the batch is full"""
+        first = self._queue.get()
+        if first[1] is None:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry[1] is None:
+                self._running = False
+                break
+            batch.append(entry)
+
+        return batch
+
+    def _record(self, batch_size, waited_s):
+        bucket = 1
+        while bucket < batch_size:
+            bucket *= 2
+        with self._lock:
+            self._size_buckets[bucket] = self._size_buckets.get(bucket, 0) + 1
+            self._batches += 1
+            self._items += batch_size
+            self._total_wait_s += waited_s
+
+    def _run(self):
+        try:
+            self._dispatch()
+        finally:
+            # Stopped (or crashed): nothing will score what is still queued
+            self._fail_pending(RuntimeError("Micro-batch dispatcher stopped"))
+
+    def _dispatch(self):
+        while self._running:
+            batch = self._collect()
+            if not batch:
+                break
+
+            # Futures the caller cancelled are dropped; the rest are marked running and can no longer be cancelled
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            items = [item for item, _, _ in batch]
+            futures = [future for _, future, _ in batch]
+            started = time.perf_counter()
+            self._record(len(batch), sum(started - queued_at for _, _, queued_at in batch))
+
+            try:
+                results = self.score_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"score_batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.error(f"Micro-batch scoring failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
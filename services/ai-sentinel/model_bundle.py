@@ -0,0 +1,564 @@
+"""
+Cerberus Model Bundle
+One versioned directory replaces the loose model_*.joblib / scaler.joblib /
+model_metadata.json files:
+
+    model_bundle -> model_bundle.versions/<version>    symlink, swapped atomically
+    model_bundle.versions/<version>/
+        manifest.json              version, feature schema, checksums, per-model latency
+        isolation_forest/*.npy     compiled arrays, uncompressed (memory-mapped on load)
+        random_forest/*.npy
+        gradient_boosting/*.npy
+        neural_network/*.npy       float32 MLP, scaler folded into layer 0
+        scaler/*.npy
+        reference/*.joblib         fitted sklearn estimators, only read by the sklearn backends
+
+Written by CerberusAdvancedTrainer.save_models(); loaded by app.py and
+production_ai_api.py in one verified pass. Each bundle is written to its own
+version directory and published by os.replace() of the symlink, so at every
+instant model_bundle resolves to one complete bundle.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from compiled_models import (
+    CompiledTreeEnsemble, CompiledIsolationForest, CompiledMLP, CompiledScaler,
+    compile_tree_model
+)
+from tx_features import schema_definitions
+
+logger = logging.getLogger(__name__)
+
+MODEL_BUNDLE_DIR = 'model_bundle'
+BUNDLE_MANIFEST = 'manifest.json'
+BUNDLE_FORMAT = 'cerberus-model-bundle'
+BUNDLE_FORMAT_VERSION = 1
+
+BUNDLE_MEMBERS = ('isolation_forest', 'random_forest', 'gradient_boosting', 'neural_network', 'scaler')
+REFERENCE_DIR = 'reference'
+# <directory>.versions/ holds every published bundle; the newest few stay for workers still mapping them
+VERSIONS_SUFFIX = '.versions'
+KEEP_VERSIONS = int(os.environ.get('CERBERUS_BUNDLE_KEEP_VERSIONS', 3))
+
+# Batch sizes timed for the manifest's per-model latency
+LATENCY_BATCH_SIZES = (1, 1000)
+
+# Loose files the bundle replaces (still read once to migrate an old deployment)
+LEGACY_MODEL_FILES = {
+    'isolation_forest': 'model_isolation_forest.joblib',
+    'random_forest': 'model_random_forest.joblib',
+    'gradient_boosting': 'model_gradient_boosting.joblib',
+    'neural_network': 'model_neural_network.joblib',
+    'scaler': 'scaler.joblib'
+}
+LEGACY_METADATA_FILE = 'model_metadata.json'
+
+_LOADERS = {
+    'CompiledIsolationForest': CompiledIsolationForest.load,
+    'CompiledTreeEnsemble': CompiledTreeEnsemble.load,
+    'CompiledMLP': CompiledMLP.load,
+    'CompiledScaler': CompiledScaler.load
+}
+
+
+class ModelBundleError(Exception):
+    """Bundle missing, corrupt, or incompatible with the serving feature schema"""
+
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _schema_hash(feature_names):
+    return hashlib.sha256(json.dumps(list(feature_names)).encode()).hexdigest()
+
+
+def _score(name, model, X):
+    """The call the serving path makes for each member"""
+    if name == 'scaler':
+        return model.transform(X)
+    if name == 'isolation_forest':
+        return model.decision_function(X)
+    return model.predict_proba(X)
+
+
+def _measure_latency(name, model, X, repeats=20):
+    """Mean milliseconds per call for each LATENCY_BATCH_SIZES batch"""
+    latency = {}
+    for size in LATENCY_BATCH_SIZES:
+        rows = X[:size]
+        _score(name, model, rows)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            _score(name, model, rows)
+        latency[str(size)] = round((time.perf_counter() - start) / repeats * 1000, 4)
+    return latency
+
+
+def _check_width(name, model, n_features):
+    width = getattr(model, 'n_features_in_', None)
+    if width is not None and width != n_features:
+        raise ModelBundleError(f"{name} takes {width} features, schema has {n_features}")
+
+
+def check_feature_schema(feature_names, expected_features):
+    """Raise ModelBundleError if the models need features the serving extractor does not produce"""
+    missing = [name for name in feature_names if name not in expected_features]
+    if missing:
+        raise ModelBundleError(
+            f"Feature schema mismatch: models expect {missing}, "
+            f"extractor produces {list(expected_features)}"
+        )
+
+
+def check_feature_definitions(manifest):
+    """
+    Compare the feature definitions the bundle was trained with against the current
+    tx_features.SCHEMA. A changed dtype or transform raises ModelBundleError; a bundle
+    that recorded none (written before they were recorded, or converted from loose
+    joblib files by migrate_legacy_models) cannot be verified and only logs a warning.
+    """
+    schema = manifest['feature_schema']
+    recorded = schema.get('definitions')
+    if recorded is None:
+        logger.warning(
+            f"⚠️  Model bundle {manifest['version']} does not record its feature definitions: "
+            f"cannot verify it was trained on the current tx_features transforms - retrain to fix"
+        )
+        return False
+
+    current = schema_definitions(schema['names'])
+    changed = sorted(name for name in set(recorded) | set(current) if recorded.get(name) != current.get(name))
+    if changed:
+        raise ModelBundleError(
+            f"Feature definitions changed since bundle {manifest['version']} was trained: {changed} "
+            f"(dtype or transform differs from tx_features.SCHEMA) - retrain the models"
+        )
+    return True
+
+
+def write_model_bundle(directory, models, scaler, feature_names, ensemble_weights,
+                       model_info=None, training_date=None, include_reference=True,
+                       feature_definitions=True):
+    """
+    Compile the fitted ensemble and write it as one bundle.
+
+    models: {'isolation_forest', 'random_forest', 'gradient_boosting', 'neural_network'}
+    -> fitted sklearn estimators; scaler: the fitted StandardScaler.
+    feature_definitions=False leaves out the tx_features definitions, for models
+    whose training transforms are unknown (see check_feature_definitions).
+    The bundle is assembled in a staging directory, renamed to
+    <directory>.versions/<version>/ and published by swapping the <directory>
+    symlink (see _publish), so readers never see a half-written or missing
+    bundle. Returns the manifest.
+    """
+    compiled = {
+        'isolation_forest': compile_tree_model(models['isolation_forest']),
+        'random_forest': compile_tree_model(models['random_forest']),
+        'gradient_boosting': compile_tree_model(models['gradient_boosting']),
+        'neural_network': (models['neural_network'] if isinstance(models['neural_network'], CompiledMLP)
+                           else CompiledMLP.from_sklearn(models['neural_network'], scaler)),
+        'scaler': scaler if isinstance(scaler, CompiledScaler) else CompiledScaler.from_sklearn(scaler)
+    }
+
+    n_features = len(feature_names)
+    for name, model in compiled.items():
+        _check_width(name, model, n_features)
+
+    # Synthetic rows around the training distribution, for the latency columns
+    rng = np.random.default_rng(0)
+    noise = rng.standard_normal((max(LATENCY_BATCH_SIZES), n_features))
+    X = compiled['scaler'].mean_ + compiled['scaler'].scale_ * noise
+    X_scaled = compiled['scaler'].transform(X)
+
+    directory = directory.rstrip(os.sep)
+    versions = f'{directory}{VERSIONS_SUFFIX}'
+    staging = os.path.join(versions, f'.tmp-{os.getpid()}')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    model_info = model_info or {}
+    members = {}
+    for name, model in compiled.items():
+        model.save(os.path.join(staging, name))
+        files = sorted(os.listdir(os.path.join(staging, name)))
+        members[name] = {
+            'class': type(model).__name__,
+            'type': model_info.get(name, {}).get('type', 'preprocessing' if name == 'scaler' else 'unknown'),
+            'accuracy': model_info.get(name, {}).get('accuracy'),
+            'latency_ms': _measure_latency(name, model, X_scaled if name == 'isolation_forest' else X),
+            'files': {f'{name}/{fname}': _sha256(os.path.join(staging, name, fname)) for fname in files}
+        }
+
+    reference = {}
+    if include_reference:
+        import joblib
+        os.makedirs(os.path.join(staging, REFERENCE_DIR))
+        for name, model in dict(models, scaler=scaler).items():
+            if isinstance(model, (CompiledTreeEnsemble, CompiledIsolationForest, CompiledMLP, CompiledScaler)):
+                continue
+            relpath = f'{REFERENCE_DIR}/{name}.joblib'
+            # Uncompressed so joblib.load(mmap_mode='r') can map the estimator arrays too
+            joblib.dump(model, os.path.join(staging, relpath))
+            reference[name] = {'file': relpath, 'sha256': _sha256(os.path.join(staging, relpath))}
+
+    checksums = sorted(sha for info in members.values() for sha in info['files'].values())
+    content_hash = hashlib.sha256(''.join(checksums).encode()).hexdigest()
+    created = datetime.now()
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'version': f"{created.strftime('%Y%m%d.%H%M%S')}-{content_hash[:8]}",
+        'created_at': created.isoformat(),
+        'training_date': training_date or created.isoformat(),
+        'feature_schema': {
+            'names': list(feature_names),
+            'dtype': 'float64',
+            'sha256': _schema_hash(feature_names),
+            'definitions': schema_definitions(feature_names) if feature_definitions else None
+        },
+        'ensemble_weights': ensemble_weights,
+        'ensemble': model_info.get('ensemble', {}),
+        'members': members,
+        'reference': reference
+    }
+    with open(os.path.join(staging, BUNDLE_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    target = os.path.join(versions, manifest['version'])
+    if os.path.exists(target):
+        # Same content written within the same second: the published copy is identical
+        shutil.rmtree(staging)
+    else:
+        os.rename(staging, target)
+    _publish(directory, target)
+    _prune_versions(versions, keep=target)
+
+    return manifest
+
+
+def _publish(directory, target):
+    """
+    Point the <directory> symlink at `target` with one os.replace(). A deployment
+    still using a plain model_bundle/ directory is moved into the versions
+    directory first - that one-time conversion is the only moment the path is missing.
+    """
+    link = f'{directory}.link-{os.getpid()}'
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.relpath(target, os.path.dirname(os.path.abspath(directory))), link)
+
+    if os.path.isdir(directory) and not os.path.islink(directory):
+        legacy = os.path.join(os.path.dirname(target), f"{datetime.now().strftime('%Y%m%d.%H%M%S')}-legacy")
+        os.rename(directory, legacy)
+        logger.info(f"📦 Moved plain bundle directory {directory}/ to {legacy}/")
+    os.replace(link, directory)
+
+
+def _prune_versions(versions, keep):
+    """
+    Delete all but the KEEP_VERSIONS newest bundle versions (never `keep`).
+    Workers still mapping a deleted version keep its (unlinked) pages.
+    """
+    entries = [os.path.join(versions, name) for name in os.listdir(versions) if not name.startswith('.')]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[KEEP_VERSIONS:]:
+        if os.path.samefile(path, keep):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class ModelBundle:
+    """A verified, memory-mapped bundle: compiled members plus manifest metadata"""
+
+    def __init__(self, directory, manifest, models, verify=True):
+        self.directory = directory
+        self.manifest = manifest
+        self.models = models
+        self.verify = verify
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def feature_names(self):
+        return self.manifest['feature_schema']['names']
+
+    @property
+    def ensemble_weights(self):
+        return self.manifest['ensemble_weights']
+
+    @property
+    def metadata(self):
+        """Same shape as the old model_metadata.json"""
+        models = {
+            name: {'accuracy': info.get('accuracy') or 0.0, 'type': info.get('type', 'unknown')}
+            for name, info in self.manifest['members'].items() if name != 'scaler'
+        }
+        if self.manifest.get('ensemble'):
+            models['ensemble'] = self.manifest['ensemble']
+        return {
+            'version': self.version,
+            'training_date': self.manifest['training_date'],
+            'feature_names': self.feature_names,
+            'models': models,
+            'ensemble_weights': self.ensemble_weights,
+            'latency_ms': {name: info['latency_ms'] for name, info in self.manifest['members'].items()}
+        }
+
+    def load_reference(self, name):
+        """Fitted sklearn estimator for the sklearn backends (imports joblib/sklearn lazily)"""
+        info = self.manifest.get('reference', {}).get(name)
+        if info is None:
+            raise ModelBundleError(f"Bundle {self.version} has no reference estimator for {name}")
+
+        path = os.path.join(self.directory, info['file'])
+        if self.verify and _sha256(path) != info['sha256']:
+            raise ModelBundleError(f"Checksum mismatch for {info['file']}")
+
+        import joblib
+        return joblib.load(path, mmap_mode='r')
+
+
+def read_manifest(directory=MODEL_BUNDLE_DIR):
+    path = os.path.join(directory, BUNDLE_MANIFEST)
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ModelBundleError(f"No model bundle at {directory}/")
+    except ValueError as e:
+        raise ModelBundleError(f"Unreadable manifest {path}: {e}")
+
+    if manifest.get('format') != BUNDLE_FORMAT or manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ModelBundleError(
+            f"Unsupported bundle format {manifest.get('format')} v{manifest.get('format_version')} "
+            f"(expected {BUNDLE_FORMAT} v{BUNDLE_FORMAT_VERSION})"
+        )
+    return manifest
+
+
+def load_model_bundle(directory=MODEL_BUNDLE_DIR, expected_features=None, members=None,
+                      verify=True, mmap_mode='r'):
+    """
+    Load a bundle in one pass: read the manifest, check the feature schema,
+    then for each requested member verify its checksums and memory-map its arrays.
+    members: subset of BUNDLE_MEMBERS (default all). Raises ModelBundleError on
+    any mismatch instead of serving with a partially valid ensemble.
+    The <directory> symlink is resolved once, so the manifest, the arrays and any
+    later load_reference() all come from the same version even if a new bundle
+    is published meanwhile.
+    """
+    directory = os.path.realpath(directory)
+    manifest = read_manifest(directory)
+
+    feature_names = manifest['feature_schema']['names']
+    if _schema_hash(feature_names) != manifest['feature_schema']['sha256']:
+        raise ModelBundleError("Feature schema hash does not match its names")
+    if expected_features is not None:
+        check_feature_schema(feature_names, expected_features)
+    check_feature_definitions(manifest)
+
+    models = {}
+    for name in (members or BUNDLE_MEMBERS):
+        info = manifest['members'].get(name)
+        if info is None:
+            raise ModelBundleError(f"Bundle {manifest['version']} has no member {name}")
+
+        if verify:
+            for relpath, expected in info['files'].items():
+                path = os.path.join(directory, relpath)
+                if not os.path.exists(path):
+                    raise ModelBundleError(f"Missing bundle file {relpath}")
+                if _sha256(path) != expected:
+                    raise ModelBundleError(f"Checksum mismatch for {relpath}")
+
+        model = _LOADERS[info['class']](os.path.join(directory, name), mmap_mode=mmap_mode)
+        _check_width(name, model, len(feature_names))
+        models[name] = model
+
+    return ModelBundle(directory, manifest, models, verify=verify)
+
+
+class ServingEnsemble:
+    """
+    Every model one scoring pass reads, resolved for the configured backends.
+    Engines keep a single reference and replace it in one assignment on reload,
+    so a request that picked up this ensemble finishes on it.
+    """
+
+    def __init__(self, bundle, tree_backend='compiled', nn_backend='float32'):
+        def member(name):
+            # Compiled arrays when mapped, otherwise the reference sklearn estimator
+            return bundle.models[name] if name in bundle.models else bundle.load_reference(name)
+
+        self.bundle = bundle
+        self.version = bundle.version
+        self.metadata = bundle.metadata
+        self.feature_names = bundle.feature_names
+        self.ensemble_weights = bundle.ensemble_weights
+
+        self.scaler = bundle.models['scaler']
+        self.isolation_forest = member('isolation_forest')
+        self.random_forest = member('random_forest')
+        self.gradient_boosting = member('gradient_boosting')
+
+        # Float32 MLP takes raw features (scaler folded into layer 0)
+        self.neural_network_fp32 = bundle.models.get('neural_network') if nn_backend == 'float32' else None
+        self.neural_network = None if self.neural_network_fp32 is not None else bundle.load_reference('neural_network')
+
+        self.tree_backend = 'compiled' if tree_backend == 'compiled' else 'sklearn'
+        self.nn_backend = 'float32' if self.neural_network_fp32 is not None else 'sklearn'
+
+    def warm_up(self, n_rows=16):
+        """Score a few synthetic rows through every member (page in mapped arrays, size buffers)"""
+        rng = np.random.default_rng(0)
+        X = self.scaler.mean_ + self.scaler.scale_ * rng.standard_normal((n_rows, len(self.feature_names)))
+        for rows in (X[:1], X):
+            X_scaled = self.scaler.transform(rows)
+            self.isolation_forest.predict(X_scaled)
+            self.random_forest.predict_proba(rows)
+            self.gradient_boosting.predict_proba(rows)
+            if self.neural_network_fp32 is not None:
+                self.neural_network_fp32.predict_proba(rows)
+            else:
+                self.neural_network.predict_proba(X_scaled)
+
+
+def load_serving_ensemble(directory=MODEL_BUNDLE_DIR, expected_features=None,
+                          tree_backend='compiled', nn_backend='float32', warm=True):
+    """Load and verify a bundle, mapping only the members the given backends use"""
+    members = ['scaler']
+    if tree_backend == 'compiled':
+        members += ['isolation_forest', 'random_forest', 'gradient_boosting']
+    if nn_backend == 'float32':
+        members.append('neural_network')
+
+    bundle = load_model_bundle(directory, expected_features=expected_features, members=members)
+    ensemble = ServingEnsemble(bundle, tree_backend, nn_backend)
+    if warm:
+        ensemble.warm_up()
+    return ensemble
+
+
+def migrate_legacy_models(directory=MODEL_BUNDLE_DIR, source_dir='.'):
+    """
+    Write a bundle from the loose joblib files + model_metadata.json of an older deployment.
+    Those files do not say which transforms the models were trained on, so the bundle
+    records no feature definitions and every load warns until the models are retrained.
+    """
+    import joblib
+
+    with open(os.path.join(source_dir, LEGACY_METADATA_FILE), 'r') as f:
+        metadata = json.load(f)
+    loaded = {name: joblib.load(os.path.join(source_dir, fname)) for name, fname in LEGACY_MODEL_FILES.items()}
+    scaler = loaded.pop('scaler')
+
+    return write_model_bundle(
+        directory, loaded, scaler,
+        feature_names=metadata['feature_names'],
+        ensemble_weights=metadata['ensemble_weights'],
+        model_info=metadata.get('models'),
+        training_date=metadata.get('training_date'),
+        feature_definitions=False
+    )
+
+
+def main():
+    """Migrate the loose files (if needed), verify the bundle, and benchmark bundle vs loose-file loading"""
+    import sys
+    import subprocess
+    import tempfile
+
+    from compiled_models import prefork_memory
+
+    print("=" * 80)
+    print("🐺 CERBERUS MODEL BUNDLE CHECK")
+    print("=" * 80)
+
+    if not os.path.exists(os.path.join(MODEL_BUNDLE_DIR, BUNDLE_MANIFEST)):
+        migrate_legacy_models(MODEL_BUNDLE_DIR)
+        print(f"\n📦 Migrated loose model files into {MODEL_BUNDLE_DIR}/")
+
+    bundle = load_model_bundle(MODEL_BUNDLE_DIR)
+    manifest = bundle.manifest
+    size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(MODEL_BUNDLE_DIR) for f in files)
+    print(f"\nversion {bundle.version} | {len(bundle.feature_names)} features | {size / 1024:.0f} KB on disk")
+    for name, info in manifest['members'].items():
+        latency = ' | '.join(f"{rows} rows {ms:.3f} ms" for rows, ms in info['latency_ms'].items())
+        print(f"   {name:<18} {info['class']:<24} {len(info['files'])} files | {latency}")
+
+    # Mapped arrays must reproduce the reference estimators bit for bit (MLP is float32 by design)
+    rng = np.random.default_rng(42)
+    noise = rng.standard_normal((1000, len(bundle.feature_names)))
+    X = bundle.models['scaler'].mean_ + bundle.models['scaler'].scale_ * noise
+    sk_scaler = bundle.load_reference('scaler')
+    if not np.array_equal(bundle.models['scaler'].transform(X), sk_scaler.transform(X)):
+        raise AssertionError("Bundle scaler does not reproduce StandardScaler.transform")
+    scaled = sk_scaler.transform(X)
+    if not np.array_equal(bundle.models['isolation_forest'].decision_function(scaled),
+                          bundle.load_reference('isolation_forest').decision_function(scaled)):
+        raise AssertionError("Bundle IsolationForest diverges from the reference estimator")
+    for name in ('random_forest', 'gradient_boosting'):
+        diff = np.max(np.abs(bundle.models[name].predict_proba(X) - bundle.load_reference(name).predict_proba(X)))
+        if diff > 1e-9:
+            raise AssertionError(f"Bundle {name} diverges from the reference estimator ({diff:.2e})")
+    print("\n✅ Checksums verified, mapped members match the reference estimators")
+
+    # Schema mismatch must fail fast
+    try:
+        load_model_bundle(MODEL_BUNDLE_DIR, expected_features=bundle.feature_names[1:])
+        raise AssertionError("Schema mismatch was not detected")
+    except ModelBundleError as e:
+        print(f"✅ Schema mismatch rejected: {e}")
+
+    # Cold-process load time: fresh interpreter per run, imports included
+    loose = ("import joblib, json; "
+             + "; ".join(f"joblib.load('{fname}')" for fname in LEGACY_MODEL_FILES.values())
+             + f"; json.load(open('{LEGACY_METADATA_FILE}'))")
+    mapped = f"from model_bundle import load_model_bundle; load_model_bundle('{MODEL_BUNDLE_DIR}')"
+    candidates = [('bundle (verified, mmap)', mapped)]
+    if all(os.path.exists(fname) for fname in LEGACY_MODEL_FILES.values()):
+        candidates.insert(0, ('loose joblib files', loose))
+
+    print("\nLoad time (fresh process, best of 5, imports included):")
+    for label, code in candidates:
+        timer = f"import time; t = time.perf_counter(); {code}; print(time.perf_counter() - t)"
+        runs = [float(subprocess.run([sys.executable, '-c', timer], capture_output=True, text=True,
+                                     check=True).stdout.strip().splitlines()[-1]) for _ in range(5)]
+        print(f"   {label:<24} {min(runs) * 1000:8.1f} ms")
+
+    print("\nLoad time (warm process, mean of 20):")
+    start = time.perf_counter()
+    for _ in range(20):
+        load_model_bundle(MODEL_BUNDLE_DIR)
+    print(f"   {'bundle (verified, mmap)':<24} {(time.perf_counter() - start) / 20 * 1000:8.1f} ms")
+    start = time.perf_counter()
+    for _ in range(20):
+        load_model_bundle(MODEL_BUNDLE_DIR, verify=False)
+    print(f"   {'bundle (mmap only)':<24} {(time.perf_counter() - start) / 20 * 1000:8.1f} ms")
+
+    print("\nPrefork memory (bundle mapped in the parent, every worker scores 1k rows):")
+    for workers in (1, 2, 4, 8):
+        per_worker = prefork_memory(bundle.models, X, workers)
+        print(f"   {workers} workers: Pss {per_worker['pss_kb'] / 1024:6.1f} MB/worker | "
+              f"Private {per_worker['private_kb'] / 1024:5.1f} MB/worker | "
+              f"Rss {per_worker['rss_kb'] / 1024:6.1f} MB/worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Cerberus Hot Model Reload
+Picks up a retrained model bundle without restarting the server: loads and
+warms the new ensemble on a background thread, then hands it to the engine
+which swaps it in with a single reference assignment. Requests already
+scoring keep the ensemble they started with.
+
+Triggered by the bundle watcher (manifest version changes) or POST /admin/reload.
+"""
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+
+from model_bundle import read_manifest, ModelBundleError, MODEL_BUNDLE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class ModelReloader:
+    """Background load -> warm -> swap, at most one reload at a time"""
+
+    def __init__(self, load, swap, directory=MODEL_BUNDLE_DIR, poll_interval=5.0, loaded_version=None):
+        """
+        load: callable returning a ready (verified, warmed) ensemble
+        swap: callable taking that ensemble and making it current
+        """
+        self.load = load
+        self.swap = swap
+        self.directory = directory
+        self.poll_interval = float(poll_interval)
+        self.loaded_version = loaded_version
+
+        self._reload_lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+        self._failed_version = None
+
+        self._reloads = 0
+        self._failures = 0
+        self._last = None
+
+    def reload(self, reason='admin', wait=False):
+        """
+        Start a reload on a background thread. Returns immediately with
+        {'status': 'started'} (or 'in_progress' if one is already running);
+        wait=True blocks until it finishes and returns its outcome instead.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {'status': 'in_progress'}
+
+        if wait:
+            return self._run(reason)
+
+        threading.Thread(target=self._run, args=(reason,), name='cerberus-model-reload', daemon=True).start()
+        return {'status': 'started', 'reason': reason}
+
+    def _run(self, reason):
+        """Body of one reload; the caller holds _reload_lock"""
+        started = time.perf_counter()
+        previous = self.loaded_version
+        try:
+            ensemble = self.load()
+            load_seconds = time.perf_counter() - started
+            self.swap(ensemble)
+            self.loaded_version = ensemble.version
+            self._failed_version = None
+            self._reloads += 1
+            self._last = {
+                'status': 'reloaded',
+                'reason': reason,
+                'previous_version': previous,
+                'version': ensemble.version,
+                'load_ms': round(load_seconds * 1000, 2),
+                'at': datetime.now().isoformat()
+            }
+            logger.info(f"🔄 Models reloaded ({reason}): {previous} -> {ensemble.version} "
+                        f"in {load_seconds * 1000:.1f} ms")
+        except Exception as e:
+            self._failures += 1
+            self._last = {
+                'status': 'failed',
+                'reason': reason,
+                'error': str(e),
+                'version': previous,
+                'at': datetime.now().isoformat()
+            }
+            logger.error(f"❌ Model reload failed ({reason}), keeping {previous}: {e}")
+        finally:
+            self._reload_lock.release()
+        return dict(self._last)
+
+    def start_watching(self):
+        """Poll the bundle manifest for a new version (restarted in forked workers, where threads don't survive)"""
+        if self.poll_interval <= 0:
+            return
+        pid = os.getpid()
+        if self._watcher is not None and self._watcher_pid == pid and self._watcher.is_alive():
+            return
+
+        with self._watch_lock:
+            if self._watcher is not None and self._watcher_pid == pid and self._watcher.is_alive():
+                return
+            self._watcher = threading.Thread(target=self._watch, name='cerberus-model-watch', daemon=True)
+            self._watcher_pid = pid
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                version = read_manifest(self.directory)['version']
+            except ModelBundleError:
+                # Missing or mid-swap bundle: try again next tick
+                continue
+            if version != self.loaded_version and version != self._failed_version:
+                outcome = self.reload(reason='watcher', wait=True)
+                if outcome.get('status') == 'failed':
+                    # Do not retry the same broken bundle every tick
+                    self._failed_version = version
+
+    def stats(self):
+        return {
+            'loaded_version': self.loaded_version,
+            'watching': self._watcher is not None and self._watcher_pid == os.getpid() and self._watcher.is_alive(),
+            'poll_interval_s': self.poll_interval,
+            'reloads': self._reloads,
+            'failures': self._failures,
+            'last_reload': self._last
+        }
+
+
+def main():
+    """Latency of app.py's CerberusAI under load, with and without back-to-back reloads"""
+    import random
+    import numpy as np
+
+    from app import CerberusAI
+    # app.py configures INFO logging on import; per-request log lines would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print("=" * 80)
+    print("🐺 CERBERUS HOT RELOAD BENCHMARK")
+    print("=" * 80)
+
+    engine = CerberusAI()
+    if not engine.models_loaded:
+        raise SystemExit(f"No model bundle in {MODEL_BUNDLE_DIR}/ - run advanced_trainer.py first")
+
+    rng = random.Random(7)
+    transactions = [{
+        'hash': f'0x{i:064x}',
+        'value': rng.choice([0, 0.01, 0.5, 2.0, 50.0]),
+        'gas': rng.choice([21000, 150000, 600000, 1500000]),
+        'gasPrice': int(rng.uniform(1, 250) * 1e9),
+        'to': None if rng.random() < 0.1 else '0xabc',
+        'input': '0x' if rng.random() < 0.5 else '0xa9059cbb' + '0' * 128
+    } for i in range(512)]
+
+    def run(seconds, threads, reload_every=None):
+        latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def client(seed):
+            local = []
+            i = seed
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                engine.predict_batch([transactions[i % len(transactions)]])
+                local.append(time.perf_counter() - start)
+                i += threads
+            with lock:
+                latencies.extend(local)
+
+        workers = [threading.Thread(target=client, args=(t,)) for t in range(threads)]
+        for w in workers:
+            w.start()
+        swaps = 0
+        while reload_every and time.perf_counter() < deadline:
+            time.sleep(reload_every)
+            if engine.reloader.reload(reason='benchmark', wait=True).get('status') == 'reloaded':
+                swaps += 1
+        for w in workers:
+            w.join()
+
+        ms = np.array(latencies) * 1000
+        return swaps, len(ms), np.percentile(ms, 50), np.percentile(ms, 99), ms.max()
+
+    print("\n4 client threads, 1 tx per call, 5 s per run:")
+    for label, reload_every in (('steady', None), ('reload every 250 ms', 0.25)):
+        swaps, calls, p50, p99, worst = run(5.0, 4, reload_every)
+        print(f"   {label:<20} swaps {swaps:3d} | calls {calls:6d} | "
+              f"p50 {p50:6.3f} ms | p99 {p99:6.3f} ms | max {worst:7.3f} ms")
+    print(f"\n   last reload: {engine.reloader.stats()['last_reload']}")
+
+
+if __name__ == "__main__":
+    main()
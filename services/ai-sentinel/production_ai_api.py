@@ -1,99 +1,103 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
 import numpy as np
 import pandas as pd
 from datetime import datetime
 import logging
 import os
 
+from compiled_models import process_memory
+from model_bundle import (
+    load_serving_ensemble, migrate_legacy_models, ModelBundleError,
+    MODEL_BUNDLE_DIR, BUNDLE_MANIFEST, LEGACY_METADATA_FILE
+)
+from model_reload import ModelReloader
+from tx_features import PIPELINE as FEATURES, FEATURE_NAMES
+from verdict_cache import VerdictCache, tx_fingerprint
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
+# Tree inference backend (IsolationForest, RF, GB): 'compiled' (flattened NumPy trees) or 'sklearn'
+TREE_BACKEND = os.environ.get('CERBERUS_TREE_BACKEND', 'compiled')
+
+# Neural network backend: 'float32' (exported forward pass) or 'sklearn'
+NN_BACKEND = os.environ.get('CERBERUS_NN_BACKEND', 'float32')
+
+# Hot reload: poll model_bundle/manifest.json every N seconds (0 disables the watcher)
+MODEL_WATCH_INTERVAL = float(os.environ.get('CERBERUS_MODEL_WATCH_INTERVAL', 5))
+# POST /admin/reload needs this token in X-Admin-Token; unset = loopback clients only
+ADMIN_TOKEN = os.environ.get('CERBERUS_ADMIN_TOKEN')
+
+# Features extract_features() produces; a model bundle needing anything else is rejected at load
+SERVING_FEATURES = FEATURE_NAMES
+
 class CerberusAI:
     """Production AI Engine untuk Threat Detection"""
     
     def __init__(self):
         logger.info("🐺 Initializing Cerberus AI Engine...")
         
+        # Re-polled pending transactions are answered from here (CERBERUS_VERDICT_CACHE_SIZE / _TTL)
+        self.verdict_cache = VerdictCache()
+        
         try:
-            self.isolation_forest = joblib.load('model_isolation_forest.joblib')
-            self.random_forest = joblib.load('model_random_forest.joblib')
-            self.gradient_boosting = joblib.load('model_gradient_boosting.joblib')
-            self.neural_network = joblib.load('model_neural_network.joblib')
-            self.scaler = joblib.load('scaler.joblib')
+            if not os.path.exists(os.path.join(MODEL_BUNDLE_DIR, BUNDLE_MANIFEST)):
+                if not os.path.exists(LEGACY_METADATA_FILE):
+                    raise FileNotFoundError(f"No model bundle at {MODEL_BUNDLE_DIR}/")
+                logger.info(f"📦 Migrating loose model files into {MODEL_BUNDLE_DIR}/")
+                migrate_legacy_models(MODEL_BUNDLE_DIR)
             
-            import json
-            with open('model_metadata.json', 'r') as f:
-                self.metadata = json.load(f)
-            
-            self.feature_names = self.metadata['feature_names']
-            self.ensemble_weights = self.metadata['ensemble_weights']
+            self.ensemble = self._load_ensemble()
             
             logger.info("✅ All models loaded successfully")
-            logger.info(f"📊 Feature count: {len(self.feature_names)}")
+            logger.info(f"📊 Feature count: {len(self.ensemble.feature_names)}")
+            logger.info(f"🌲 Tree backend: {self.ensemble.tree_backend}")
+            logger.info(f"🧠 Neural network backend: {self.ensemble.nn_backend}")
             
+        except ModelBundleError as e:
+            logger.error(f"❌ Model bundle rejected: {e}")
+            raise
         except FileNotFoundError as e:
             logger.error(f"❌ Model files not found: {e}")
             logger.error("Please run 'python advanced_trainer.py' first to train models")
             raise
-    
-    def extract_features(self, tx_data: dict) -> np.ndarray:
-        """Extract dan engineer features dari transaction data"""
-        
-        value = float(tx_data.get('value', 0))
-        if isinstance(value, str):
-            try:
-                value = int(value, 16) / 1e18
-            except:
-                value = 0
-        
-        gas = int(tx_data.get('gas', 0) or tx_data.get('gasLimit', 0) or 0)
-        if isinstance(gas, str):
-            gas = int(gas, 16)
-        
-        gas_price = int(tx_data.get('gasPrice', 0) or 0)
-        if isinstance(gas_price, str):
-            gas_price = int(gas_price, 16)
-        
-        nonce = int(tx_data.get('nonce', 0) or 0)
-        if isinstance(nonce, str):
-            nonce = int(nonce, 16)
-        
-        is_contract_creation = 1 if tx_data.get('to') is None or tx_data.get('to') == '' else 0
-        
-        input_data = tx_data.get('input', '0x') or tx_data.get('data', '0x') or '0x'
-        input_length = len(input_data)
-        has_input = 1 if input_length > 2 else 0
-        
-        gas_used = int(gas * 0.7)
-        logs_count = 0
-        gas_efficiency = 0.7
         
-        value_density = value / max(gas_used, 1)
-        gas_price_gwei = gas_price / 1e9
-        
-        features = {
-            'value': value,
-            'gas': gas,
-            'gasPrice': gas_price,
-            'gasUsed': gas_used,
-            'nonce': nonce,
-            'isContractCreation': is_contract_creation,
-            'inputLength': input_length,
-            'hasInput': has_input,
-            'logsCount': logs_count,
-            'gasEfficiency': gas_efficiency,
-            'valueDensity': value_density,
-            'gasPrice_gwei': gas_price_gwei
-        }
-        
-        feature_vector = np.array([features[name] for name in self.feature_names]).reshape(1, -1)
+        # Retrained bundles are swapped in without a restart
+        self.reloader = ModelReloader(
+            self._load_ensemble,
+            self._swap_ensemble,
+            directory=MODEL_BUNDLE_DIR,
+            poll_interval=MODEL_WATCH_INTERVAL,
+            loaded_version=self.ensemble.version
+        )
+    
+    def _load_ensemble(self):
+        """Load, verify and warm the bundle for the configured backends"""
+        ensemble = load_serving_ensemble(
+            MODEL_BUNDLE_DIR,
+            expected_features=SERVING_FEATURES,
+            tree_backend=TREE_BACKEND,
+            nn_backend=NN_BACKEND
+        )
+        logger.info(f"📦 Model bundle {ensemble.version} loaded from {MODEL_BUNDLE_DIR}/")
+        return ensemble
+    
+    def _swap_ensemble(self, ensemble):
+        # One reference assignment: requests already holding the old ensemble finish on it
+        self.ensemble = ensemble
+        # Their verdicts are still cached under the old version, so they can never be served again
+        self.verdict_cache.invalidate('model reload')
+    
+    def extract_features(self, tx_data: dict, feature_names=None) -> np.ndarray:
+        """Extract dan engineer features dari transaction data (tx_features schema, same as training)"""
         
-        return feature_vector, features
+        if feature_names is None:
+            feature_names = self.ensemble.feature_names
+        return FEATURES.extract(tx_data, feature_names)
     
     def categorize_threat(self, features: dict, danger_score: float) -> tuple:
         """
@@ -176,27 +180,40 @@ class CerberusAI:
     def predict(self, tx_data: dict) -> dict:
         """Main prediction function dengan ensemble models"""
         
+        # Pin the ensemble for the whole request; a concurrent reload affects the next one
+        ensemble = self.ensemble
+        
+        cache_key = None
+        if self.verdict_cache.enabled and isinstance(tx_data, dict):
+            cache_key = (tx_data.get('hash'), tx_fingerprint(tx_data), ensemble.version)
+            cached = self.verdict_cache.get(*cache_key)
+            if cached is not None:
+                return dict(cached)
+        
         try:
-            feature_vector, features_dict = self.extract_features(tx_data)
+            feature_vector, features_dict = self.extract_features(tx_data, ensemble.feature_names)
             
             predictions = {}
             
-            X_scaled = self.scaler.transform(feature_vector)
-            iso_pred = self.isolation_forest.predict(X_scaled)[0]
+            X_scaled = ensemble.scaler.transform(feature_vector)
+            iso_pred = ensemble.isolation_forest.predict(X_scaled)[0]
             iso_score = 1 if iso_pred == -1 else 0
             predictions['isolation_forest'] = iso_score
             
-            rf_pred = self.random_forest.predict_proba(feature_vector)[0][1]
+            rf_pred = ensemble.random_forest.predict_proba(feature_vector)[0][1]
             predictions['random_forest'] = rf_pred
             
-            gb_pred = self.gradient_boosting.predict_proba(feature_vector)[0][1]
+            gb_pred = ensemble.gradient_boosting.predict_proba(feature_vector)[0][1]
             predictions['gradient_boosting'] = gb_pred
             
-            nn_pred = self.neural_network.predict_proba(X_scaled)[0][1]
+            if ensemble.neural_network_fp32 is not None:
+                nn_pred = ensemble.neural_network_fp32.predict_proba(feature_vector)[0][1]
+            else:
+                nn_pred = ensemble.neural_network.predict_proba(X_scaled)[0][1]
             predictions['neural_network'] = nn_pred
             
             ensemble_score = sum(
-                predictions[model] * self.ensemble_weights[model]
+                predictions[model] * ensemble.ensemble_weights[model]
                 for model in predictions.keys()
             )
             
@@ -218,12 +235,16 @@ class CerberusAI:
                 'model_predictions': {k: float(v) for k, v in predictions.items()},
                 'ensemble_score': float(ensemble_score),
                 'analyzed_at': datetime.now().isoformat(),
-                'tx_hash': tx_data.get('hash', 'unknown')
+                'tx_hash': tx_data.get('hash', 'unknown'),
+                'model_version': ensemble.version
             }
             
             if is_malicious:
                 logger.warning(f"🚨 THREAT DETECTED: {threat_category} (Score: {danger_score:.2f})")
             
+            if cache_key is not None:
+                self.verdict_cache.put(*cache_key, dict(result))
+            
             return result
             
         except Exception as e:
@@ -246,6 +267,12 @@ except Exception as e:
     logger.error(f"Failed to initialize AI engine: {e}")
     ai_engine = None
 
+@app.before_request
+def ensure_model_watcher():
+    # Started lazily per process: gunicorn forks workers after preload and threads don't survive fork
+    if ai_engine is not None:
+        ai_engine.reloader.start_watching()
+
 @app.route('/', methods=['GET'])
 def index():
     """Health check endpoint"""
@@ -291,7 +318,7 @@ def health():
     return jsonify({
         'status': 'healthy',
         'ai_engine': 'loaded' if ai_engine else 'not loaded',
-        'models': list(ai_engine.ensemble_weights.keys()) if ai_engine else [],
+        'models': list(ai_engine.ensemble.ensemble_weights.keys()) if ai_engine else [],
         'timestamp': datetime.now().isoformat()
     })
 
@@ -301,13 +328,43 @@ def stats():
     if not ai_engine:
         return jsonify({'error': 'AI engine not initialized'}), 500
     
+    ensemble = ai_engine.ensemble
     return jsonify({
-        'model_info': ai_engine.metadata['models'],
-        'ensemble_weights': ai_engine.ensemble_weights,
-        'feature_count': len(ai_engine.feature_names),
-        'training_date': ai_engine.metadata['training_date']
+        'model_info': ensemble.metadata['models'],
+        'ensemble_weights': ensemble.ensemble_weights,
+        'feature_count': len(ensemble.feature_names),
+        'training_date': ensemble.metadata['training_date'],
+        'model_version': ensemble.version,
+        'model_latency_ms': ensemble.metadata['latency_ms'],
+        'tree_backend': ensemble.tree_backend,
+        'nn_backend': ensemble.nn_backend,
+        'reload': ai_engine.reloader.stats(),
+        'verdict_cache': ai_engine.verdict_cache.stats(),
+        'worker': {'pid': os.getpid(), 'memory': process_memory()}
     })
 
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload models from model_bundle/ without a restart (?wait=1 blocks until swapped)"""
+    if ai_engine is None:
+        return jsonify({'error': 'AI engine not initialized'}), 500
+    
+    if ADMIN_TOKEN:
+        if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+            return jsonify({'error': 'Forbidden'}), 403
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden (set CERBERUS_ADMIN_TOKEN for remote reloads)'}), 403
+    
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    outcome = ai_engine.reloader.reload(reason='admin', wait=wait)
+    outcome['worker'] = os.getpid()
+    
+    if outcome['status'] == 'in_progress':
+        return jsonify(outcome), 409
+    if outcome['status'] == 'failed':
+        return jsonify(outcome), 500
+    return jsonify(outcome), 200 if wait else 202
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
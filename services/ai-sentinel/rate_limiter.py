@@ -0,0 +1,212 @@
+"""
+Cerberus Rate Limiter
+Token bucket per client IP and route. A bucket holds up to `burst` requests
+and refills at max_requests / window per second, so a client never gets more
+than `burst` back to back (a fixed window allowed twice its limit across a
+window edge) and the steady rate is exactly the configured one.
+
+Buckets live in an LRU bounded by CERBERUS_RATE_LIMIT_CLIENTS per route,
+split into shards with a lock each: memory stays flat under a flood of
+distinct clients and concurrent requests from different clients rarely
+share a lock. A refused request gets Retry-After from the bucket's deficit.
+"""
+
+import os
+import sys
+import math
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Buckets kept per route; the least recently seen client is forgotten first
+RATE_LIMIT_CLIENTS = int(os.environ.get('CERBERUS_RATE_LIMIT_CLIENTS', 10000))
+RATE_LIMIT_SHARDS = int(os.environ.get('CERBERUS_RATE_LIMIT_SHARDS', 16))
+
+
+def parse_limits(spec):
+    """
+    Per-route overrides from CERBERUS_RATE_LIMITS, e.g. "predict=200/60,get_reports=50/60:10"
+    (route = view function name, value = max_requests/window_seconds[:burst])
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        try:
+            route, value = item.split('=', 1)
+            rate, _, burst = value.partition(':')
+            max_requests, window = rate.split('/', 1)
+            limits[route.strip()] = (int(max_requests), float(window), int(burst) if burst else None)
+        except ValueError:
+            logger.warning(f"⚠️  Ignoring rate limit override {item!r} (expected route=requests/seconds[:burst])")
+    return limits
+
+
+RATE_LIMIT_OVERRIDES = parse_limits(os.environ.get('CERBERUS_RATE_LIMITS'))
+
+
+class TokenBucketLimiter:
+    """Thread-safe token buckets keyed by client, in sharded LRUs of bounded size"""
+
+    def __init__(self, max_requests, window, burst=None, max_clients=RATE_LIMIT_CLIENTS,
+                 shards=RATE_LIMIT_SHARDS):
+        self.max_requests = int(max_requests)
+        self.window = float(window)
+        self.rate = self.max_requests / self.window     # tokens per second
+        self.burst = float(burst if burst is not None else self.max_requests)
+        self.n_shards = max(int(shards), 1)
+        self.max_clients = max(int(max_clients), self.n_shards)
+        self._per_shard = -(-self.max_clients // self.n_shards)
+
+        # client -> (tokens, updated_at); tokens are as of updated_at
+        self._buckets = [OrderedDict() for _ in range(self.n_shards)]
+        self._locks = [threading.Lock() for _ in range(self.n_shards)]
+
+        # Per shard and only touched under that shard's lock; stats() sums them
+        self._allowed = [0] * self.n_shards
+        self._limited = [0] * self.n_shards
+        self._evictions = [0] * self.n_shards
+
+    def acquire(self, client, now=None):
+        """Take one token for `client`; returns (allowed, retry_after_seconds)"""
+        now = time.monotonic() if now is None else now
+        shard = hash(client) % self.n_shards
+        buckets = self._buckets[shard]
+        with self._locks[shard]:
+            bucket = buckets.get(client)
+            if bucket is None:
+                tokens = self.burst
+                if len(buckets) >= self._per_shard:
+                    buckets.popitem(last=False)
+                    self._evictions[shard] += 1
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                buckets.move_to_end(client)
+
+            if tokens >= 1:
+                buckets[client] = (tokens - 1, now)
+                self._allowed[shard] += 1
+                return True, 0.0
+            buckets[client] = (tokens, now)
+            self._limited[shard] += 1
+            # Time until the deficit has refilled
+            return False, (1 - tokens) / self.rate
+
+    def stats(self):
+        return {
+            'max_requests': self.max_requests,
+            'window_seconds': self.window,
+            'burst': self.burst,
+            'clients': sum(len(buckets) for buckets in self._buckets),
+            'max_clients': self._per_shard * self.n_shards,
+            'allowed': sum(self._allowed),
+            'limited': sum(self._limited),
+            'evictions': sum(self._evictions)
+        }
+
+
+def retry_after_header(seconds):
+    """Retry-After is whole seconds; round up so a client that honours it is admitted"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def main():
+    """Per-call cost and memory at 10k+ distinct clients vs the fixed-window dict it replaces"""
+    import random
+    import tracemalloc
+    from collections import defaultdict
+
+    print("=" * 80)
+    print("🐺 CERBERUS RATE LIMITER CHECK")
+    print("=" * 80)
+
+    def fixed_window(max_requests, window):
+        # advanced_ai_sentinel.rate_limit before TokenBucketLimiter (state only, no Flask); a new
+        # client's window opens at `now` rather than time.time() + 3600 so the clock can be simulated
+        request_counts = defaultdict(dict)
+
+        def acquire(client, now):
+            if not request_counts[client] or now > request_counts[client]['reset_time']:
+                request_counts[client] = {'count': 0, 'reset_time': now + window}
+            if request_counts[client]['count'] >= max_requests:
+                return False, 0.0
+            request_counts[client]['count'] += 1
+            return True, 0.0
+        return acquire, request_counts
+
+    # Burst across a window edge: 100/60s, the client fires right before and right after the edge
+    acquire, _ = fixed_window(100, 60)
+    limiter = TokenBucketLimiter(100, 60)
+    # One request opens the window at t=0; the burst straddles its end at t=60
+    acquire('edge', 0.0)
+    limiter.acquire('edge', 0.0)
+    fixed_burst = sum(acquire('edge', 59.999)[0] for _ in range(200)) + \
+        sum(acquire('edge', 60.001)[0] for _ in range(200))
+    bucket_burst = sum(limiter.acquire('edge', 59.999)[0] for _ in range(200)) + \
+        sum(limiter.acquire('edge', 60.001)[0] for _ in range(200))
+    allowed, retry_after = limiter.acquire('edge', 60.001)
+    print(f"\n100 req / 60 s, 400 requests within 2 ms across a window edge:")
+    print(f"   fixed window  {fixed_burst} allowed")
+    print(f"   token bucket  {bucket_burst} allowed | next request: retry after {retry_after:.3f}s "
+          f"(header {retry_after_header(retry_after)})")
+
+    # Steady state: tokens refill at exactly max_requests / window
+    limiter = TokenBucketLimiter(100, 60)
+    admitted = sum(limiter.acquire('steady', t * 0.01)[0] for t in range(60000))   # 100 req/s for 600 s
+    print(f"   token bucket, 100 req/s for 600 s: {admitted} allowed (burst 100 + 599.99 s x 100/60 = 1099.98)")
+
+    rng = random.Random(20)
+    for clients in (10000, 100000):
+        addresses = [f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}:{i}'
+                     for i in range(clients)]
+        calls = [addresses[rng.randrange(clients)] for _ in range(500000)]
+        print(f"\n{clients} distinct clients, {len(calls)} requests:")
+        for label in ('fixed window dict', 'token bucket LRU'):
+            if label == 'fixed window dict':
+                acquire, state = fixed_window(100, 60)
+                size = lambda: len(state)
+            else:
+                limiter = TokenBucketLimiter(100, 60, max_clients=RATE_LIMIT_CLIENTS)
+                acquire, size = limiter.acquire, lambda: limiter.stats()['clients']
+            tracemalloc.start()
+            for i, client in enumerate(calls):
+                acquire(client, i * 1e-4)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            # tracemalloc slows every allocation, so time a second pass without it
+            started = time.perf_counter()
+            for i, client in enumerate(calls):
+                acquire(client, 60 + i * 1e-4)
+            elapsed = time.perf_counter() - started
+            print(f"   {label:<18} {elapsed / len(calls) * 1e6:5.2f} µs/call | tracked {size():>6} | "
+                  f"{memory / 2**20:5.1f} MiB")
+
+    # Contention: 64 threads on 10k clients, one shard vs the default
+    for shards in (1, RATE_LIMIT_SHARDS):
+        limiter = TokenBucketLimiter(10**9, 1, shards=shards)
+        addresses = [f'10.0.{i // 256}.{i % 256}' for i in range(10000)]
+        barrier = threading.Barrier(64)
+
+        def client(n):
+            barrier.wait()
+            for i in range(n, 320000, 64):
+                limiter.acquire(addresses[i % 10000])
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(64)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        sys.setswitchinterval(switch_interval)
+        stats = limiter.stats()
+        print(f"\n64 threads, 10000 clients, {shards:>2} shard(s): {elapsed / 320000 * 1e6:5.2f} µs/call | "
+              f"allowed {stats['allowed']} of 320000")
+
+
+if __name__ == "__main__":
+    main()
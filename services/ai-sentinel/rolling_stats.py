@@ -0,0 +1,203 @@
+"""
+Cerberus Rolling Statistics
+Sliding-window order statistics for the streaming feature extractors: the last
+N gas prices kept both in arrival order (to evict the oldest) and in an
+indexable skiplist (to rank a value), so insert, evict and rank are O(log N)
+and the mean is a running sum. Windows of 100k entries cost about the same
+per transaction as 1k.
+"""
+
+import os
+import math
+import random
+from collections import deque
+
+# Gas prices remembered for the percentile / deviation features
+GAS_PRICE_WINDOW = int(os.environ.get('CERBERUS_GAS_PRICE_WINDOW', 1000))
+
+
+class _Node:
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value, next, width):
+        self.value = value
+        self.next = next
+        self.width = width
+
+
+# Tail sentinel: compares greater than every value
+_NIL = _Node(math.inf, [], [])
+
+
+class IndexableSkiplist:
+    """
+    Sorted multiset with O(log n) insert, remove and rank. Each link stores
+    how many elements it skips, so walking to a value also counts the
+    elements before it.
+    """
+
+    def __init__(self, expected_size=1000):
+        self.size = 0
+        self.maxlevels = int(1 + math.log2(max(expected_size, 2)))
+        self.head = _Node(None, [_NIL] * self.maxlevels, [1] * self.maxlevels)
+        self._random = random.Random(0x5eed)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        node = self.head.next[0]
+        while node is not _NIL:
+            yield node.value
+            node = node.next[0]
+
+    def insert(self, value):
+        chain = [None] * self.maxlevels
+        steps_at_level = [0] * self.maxlevels
+        node = self.head
+        for level in reversed(range(self.maxlevels)):
+            while node.next[level].value <= value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        # Geometric tower height: level k with probability 2^-k
+        height = min(self.maxlevels, 1 - int(math.log2(1.0 - self._random.random())))
+        new = _Node(value, [None] * height, [None] * height)
+        steps = 0
+        for level in range(height):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.maxlevels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, value):
+        chain = [None] * self.maxlevels
+        node = self.head
+        for level in reversed(range(self.maxlevels)):
+            while node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is _NIL or target.value != value:
+            raise KeyError(value)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += prev.next[level].width[level] - 1
+            prev.next[level] = prev.next[level].next[level]
+        for level in range(len(target.next), self.maxlevels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, value):
+        """Number of elements strictly less than value"""
+        rank = 0
+        node = self.head
+        for level in reversed(range(self.maxlevels)):
+            while node.next[level].value < value:
+                rank += node.width[level]
+                node = node.next[level]
+        return rank
+
+
+class RollingPercentile:
+    """The last `window` values with O(log n) rank / percentile and an O(1) running mean"""
+
+    def __init__(self, window=GAS_PRICE_WINDOW):
+        self.window = int(window)
+        self._order = deque()
+        self._sorted = IndexableSkiplist(self.window)
+        self._sum = 0
+
+    def __len__(self):
+        return len(self._order)
+
+    def append(self, value):
+        """Add a value, evicting the oldest once the window is full"""
+        if len(self._order) >= self.window:
+            oldest = self._order.popleft()
+            self._sorted.remove(oldest)
+            self._sum -= oldest
+        self._order.append(value)
+        self._sorted.insert(value)
+        self._sum += value
+
+    def rank(self, value):
+        return self._sorted.rank(value)
+
+    def percentile(self, value):
+        """
+        Share of the window strictly below value, in percent. For a value that is
+        in the window this is sorted(window).index(value) / len(window) * 100,
+        i.e. duplicates rank at their first position.
+        """
+        return (self._sorted.rank(value) / len(self._order)) * 100 if self._order else 0.0
+
+    def mean(self):
+        # Integer inputs keep an exact running sum, so there is no drift over long streams
+        return self._sum / len(self._order) if self._order else 0.0
+
+
+def main():
+    """
+    Per-call cost by window size against the sort-per-request implementation
+    (equivalence is covered by tests/test_rolling_stats.py)
+    """
+    import time
+    import numpy as np
+
+    print("=" * 80)
+    print("🐺 CERBERUS ROLLING PERCENTILE CHECK")
+    print("=" * 80)
+
+    def reference_step(history, gas_price):
+        # AdvancedFeatureExtractor._extract_temporal_features before RollingPercentile
+        history.append(gas_price)
+        percentile = 50
+        if len(history) > 10:
+            sorted_prices = sorted(history)
+            try:
+                percentile = (sorted_prices.index(gas_price) / len(sorted_prices)) * 100
+            except ValueError:
+                percentile = 50
+        return percentile, abs(gas_price - np.mean(list(history)))
+
+    def rolling_step(rolling, gas_price):
+        rolling.append(gas_price)
+        percentile = rolling.percentile(gas_price) if len(rolling) > 10 else 50
+        return percentile, abs(gas_price - rolling.mean())
+
+    rng = random.Random(3)
+    print("Per-call cost (append + percentile + deviation):")
+    for window in (1000, 10000, 100000):
+        warm = [rng.randint(1, 300) * 10**9 for _ in range(window)]
+        probe = [rng.randint(1, 300) * 10**9 for _ in range(2000)]
+
+        history = deque(warm, maxlen=window)
+        calls = 20 if window >= 100000 else 200
+        started = time.perf_counter()
+        for gas_price in probe[:calls]:
+            reference_step(history, gas_price)
+        old_us = (time.perf_counter() - started) / calls * 1e6
+
+        rolling = RollingPercentile(window)
+        for gas_price in warm:
+            rolling.append(gas_price)
+        started = time.perf_counter()
+        for gas_price in probe:
+            rolling_step(rolling, gas_price)
+        new_us = (time.perf_counter() - started) / len(probe) * 1e6
+
+        print(f"   window {window:>6} | sort per call {old_us:9.1f} µs | rolling {new_us:6.1f} µs | "
+              f"{old_us / new_us:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Cerberus RPC Pool
+Several JSON-RPC endpoints behind the JsonRpcClient interface (batch, call,
+stats), so BlockFetcher can use it unchanged.
+
+Every endpoint keeps a health record: latency EWMA and deviation, error-rate
+EWMA and a cooldown after throttling or failures. A request goes to the
+endpoint with the lowest expected wait (latency x error penalty x load) among
+those not cooling down and below their concurrency limit.
+
+Each endpoint's limit is AIMD-controlled: +1 per limit's worth of successful
+requests sent while the limit was binding, halved on 429 (once per
+congestion event), and x0.9 when latency exceeds CERBERUS_RPC_LATENCY_TOLERANCE
+x the best latency seen for requests of that size (a 100-receipt batch is
+slower than a 10-block one without anything being congested). The
+per-request timeout follows the endpoint's latency (EWMA + 4 deviations)
+instead of a fixed 60 s. A throttled or failed request is retried elsewhere.
+
+    python rpc_pool.py      # convergence against throttling stand-in nodes
+"""
+
+import os
+import time
+import logging
+import threading
+
+from block_fetcher import JsonRpcClient, RpcError, RpcThrottled, RPC_TIMEOUT, RPC_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated endpoints for the collector (first one also used for web3)
+RPC_URLS = [url.strip() for url in os.environ.get('CERBERUS_RPC_URLS', '').split(',') if url.strip()]
+
+# Per-endpoint concurrency limits
+RPC_MIN_CONCURRENCY = int(os.environ.get('CERBERUS_RPC_MIN_CONCURRENCY', 1))
+RPC_INITIAL_CONCURRENCY = int(os.environ.get('CERBERUS_RPC_INITIAL_CONCURRENCY', 4))
+RPC_MAX_CONCURRENCY = int(os.environ.get('CERBERUS_RPC_MAX_CONCURRENCY', 16))
+# Latency above this multiple of the best seen counts as congestion
+RPC_LATENCY_TOLERANCE = float(os.environ.get('CERBERUS_RPC_LATENCY_TOLERANCE', 3.0))
+
+RPC_MIN_TIMEOUT = 2.0           # seconds; floor of the latency-derived timeout
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 4.0             # expected-wait multiplier per unit of error rate
+ERROR_COOLDOWN = 1.0            # seconds after a failure, doubled per consecutive failure
+MAX_ERROR_COOLDOWN = 30.0
+
+
+class Endpoint:
+    """Health and AIMD state of one URL; mutated only under RpcPool's lock"""
+
+    def __init__(self, url, initial, minimum, maximum):
+        self.url = url
+        self.client = JsonRpcClient(url, retries=0)
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.in_flight = 0
+        self.epoch = 0                  # bumped on every decrease; one decrease per congestion event
+        self.latency = None             # EWMA, seconds
+        self.deviation = 0.0
+        self.best_latency = None
+        self._by_size = {}              # log2(calls) -> [latency EWMA, best EWMA]
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.consecutive_errors = 0
+
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.peak_limit = self.limit
+
+    def available(self, now):
+        return now >= self.cooldown_until and self.in_flight < int(self.limit)
+
+    def expected_wait(self):
+        latency = self.latency if self.latency is not None else 0.0
+        return latency * (1 + ERROR_PENALTY * self.error_rate) * (self.in_flight + 1) / self.limit
+
+    def timeout(self):
+        if self.latency is None:
+            return RPC_TIMEOUT
+        return min(max(self.latency + 4 * self.deviation, RPC_MIN_TIMEOUT), RPC_TIMEOUT)
+
+    def _decrease(self, epoch, factor):
+        if epoch == self.epoch:
+            self.limit = max(self.minimum, self.limit * factor)
+            self.epoch += 1
+
+    def on_success(self, epoch, saturated, latency, calls):
+        self.requests += 1
+        self.consecutive_errors = 0
+        self.error_rate *= 1 - EWMA_ALPHA
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.deviation += EWMA_ALPHA * (abs(latency - self.latency) - self.deviation)
+            self.latency += EWMA_ALPHA * (latency - self.latency)
+        self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+
+        size = self._by_size.setdefault(calls.bit_length(), [latency, latency])
+        size[0] += EWMA_ALPHA * (latency - size[0])
+        size[1] = min(size[1], size[0])
+
+        if size[0] > RPC_LATENCY_TOLERANCE * size[1]:
+            self._decrease(epoch, 0.9)
+        elif saturated:
+            # Additive increase: about +1 per round trip at the current limit
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def on_throttled(self, epoch, retry_after, now):
+        self.requests += 1
+        self.throttled += 1
+        self._decrease(epoch, 0.5)
+        pause = retry_after if retry_after is not None else (self.latency or 0.0)
+        self.cooldown_until = max(self.cooldown_until, now + pause)
+
+    def on_error(self, now):
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_errors += 1
+        self.error_rate += EWMA_ALPHA * (1 - self.error_rate)
+        self.cooldown_until = now + min(ERROR_COOLDOWN * 2 ** (self.consecutive_errors - 1), MAX_ERROR_COOLDOWN)
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'limit': round(self.limit, 2),
+            'peak_limit': round(self.peak_limit, 2),
+            'in_flight': self.in_flight,
+            'latency_ms': round(self.latency * 1e3, 1) if self.latency is not None else None,
+            'best_latency_ms': round(self.best_latency * 1e3, 1) if self.best_latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'errors': self.errors
+        }
+
+
+class RpcPool:
+    """Thread-safe JSON-RPC client over several endpoints with health routing and AIMD limits"""
+
+    def __init__(self, urls, initial=RPC_INITIAL_CONCURRENCY, minimum=RPC_MIN_CONCURRENCY,
+                 maximum=RPC_MAX_CONCURRENCY, retries=RPC_RETRIES, deadline=RPC_TIMEOUT):
+        if not urls:
+            raise ValueError("RpcPool needs at least one endpoint URL")
+        self.endpoints = [Endpoint(url, initial, minimum, maximum) for url in urls]
+        self.retries = retries
+        self.deadline = deadline
+        self._cond = threading.Condition()
+
+        self._calls = 0
+        self._retried = 0
+        self._failed = 0
+
+    @property
+    def url(self):
+        return self.endpoints[0].url
+
+    @property
+    def max_concurrency(self):
+        """Most requests the pool will ever have in flight (threads worth giving BlockFetcher)"""
+        return int(sum(endpoint.maximum for endpoint in self.endpoints))
+
+    def _acquire(self, give_up):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                candidates = [e for e in self.endpoints if e.available(now)]
+                if candidates:
+                    endpoint = min(candidates, key=Endpoint.expected_wait)
+                    saturated = endpoint.in_flight + 1 >= int(endpoint.limit)
+                    endpoint.in_flight += 1
+                    return endpoint, endpoint.epoch, saturated
+                if now >= give_up:
+                    raise RpcError("No RPC endpoint available (all throttled, failing or at their limit)")
+                wake = min((e.cooldown_until for e in self.endpoints if e.cooldown_until > now), default=now + 0.05)
+                self._cond.wait(min(wake, give_up) - now)
+
+    def batch(self, calls, timeout=None):
+        """JsonRpcClient.batch() on the healthiest endpoint; 429s and failures are retried on others"""
+        give_up = time.monotonic() + self.deadline
+        failures = 0
+        while True:
+            endpoint, epoch, saturated = self._acquire(give_up)
+            started = time.monotonic()
+            outcome = None
+            try:
+                result = endpoint.client.batch(calls, timeout=timeout or endpoint.timeout())
+                outcome = 'ok'
+                return result
+            except RpcThrottled as e:
+                # Flow control, not failure: retried until the deadline without using the retry budget
+                outcome = e
+                if time.monotonic() >= give_up:
+                    raise
+            except RpcError as e:
+                outcome = e
+                failures += 1
+                if failures > self.retries:
+                    with self._cond:
+                        self._failed += 1
+                    raise
+            finally:
+                now = time.monotonic()
+                with self._cond:
+                    endpoint.in_flight -= 1
+                    if outcome == 'ok':
+                        endpoint.on_success(epoch, saturated, now - started, len(calls))
+                        self._calls += len(calls)
+                    elif isinstance(outcome, RpcThrottled):
+                        endpoint.on_throttled(epoch, outcome.retry_after, now)
+                        self._retried += 1
+                    elif outcome is not None:
+                        endpoint.on_error(now)
+                        self._retried += 1
+                        logger.warning(f"⚠️  RPC {endpoint.url} failed ({outcome}), retrying on another endpoint")
+                    self._cond.notify_all()
+
+    def call(self, method, params=()):
+        result = self.batch([(method, list(params))])[0]
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    def stats(self):
+        with self._cond:
+            endpoints = [endpoint.stats() for endpoint in self.endpoints]
+            return {
+                'requests': sum(e['requests'] for e in endpoints),
+                'calls': self._calls,
+                'retries': self._retried,
+                'failures': self._failed,
+                'concurrency_limit': round(sum(e['limit'] for e in endpoints), 2),
+                'endpoints': endpoints
+            }
+
+
+def main():
+    """AIMD convergence and routing against stand-in nodes with injected throttling"""
+    from block_fetcher import BlockFetcher, LocalRpcServer, synthetic_chain
+
+    logging.basicConfig(level=logging.ERROR)
+
+    print("=" * 80)
+    print("🐺 CERBERUS RPC POOL CHECK")
+    print("=" * 80)
+
+    chain = synthetic_chain(1200, mean_transactions=4)
+    first = int(chain['blocks'][0]['number'], 16)
+    end = first + len(chain['blocks'])
+
+    def run(client, concurrency, label, trace=None):
+        fetcher = BlockFetcher(client, concurrency=concurrency, blocks_per_request=2)
+        sampler_stop = threading.Event()
+        samples = []
+
+        def sample():
+            while not sampler_stop.wait(0.25):
+                samples.append([e.limit for e in client.endpoints])
+
+        if trace:
+            threading.Thread(target=sample, daemon=True).start()
+        try:
+            blocks = list(fetcher.iter_blocks(first, end))
+            outcome = f"{fetcher.stats()['blocks_per_second']:7.1f} blocks/s"
+        except RpcError as e:
+            blocks, outcome = [], f"aborted: {e}"
+        sampler_stop.set()
+        if blocks and [number for number, _, _ in blocks] != list(range(first, end)):
+            raise AssertionError(f"{label}: blocks missing or out of order")
+        print(f"   {label:<44} {outcome}")
+        if trace and samples:
+            step = max(1, len(samples) // 8)
+            print("      limit over time: " + " | ".join(
+                "/".join(f"{limit:4.1f}" for limit in sample) for sample in samples[::step]))
+        return blocks
+
+    # Idle node: the limit should climb to the maximum
+    with LocalRpcServer(chain, latency=0.02) as node:
+        print(f"\nOne unthrottled node (20 ms), limits start at {RPC_INITIAL_CONCURRENCY}, max {RPC_MAX_CONCURRENCY}:")
+        run(JsonRpcClient(node.url), 4, "single client, fixed 4 in flight")
+        pool = RpcPool([node.url])
+        run(pool, pool.max_concurrency, "pool, AIMD", trace=True)
+        print(f"      final limit {pool.stats()['endpoints'][0]['limit']}")
+
+    # A: fast, 429 above 4 in flight; B: slower and degrades with load, 429 above 10; C: down
+    node_a = LocalRpcServer(chain, latency=0.02, max_concurrent=4, retry_after=0)
+    node_b = LocalRpcServer(chain, latency=0.04, load_latency=0.004, max_concurrent=10, retry_after=0)
+    with node_a, node_b:
+        dead = 'http://127.0.0.1:9/'
+        print(f"\nNode A: 20 ms, 429 above 4 in flight | Node B: 40 ms + 4 ms per request in flight, "
+              f"429 above 10 | Node C: connection refused")
+        run(JsonRpcClient(node_a.url), 16, "single client on A, fixed 16 in flight")
+        print(f"      429s from A: {node_a.throttled}")
+        node_a.throttled = node_b.throttled = 0
+
+        pool = RpcPool([node_a.url, node_b.url, dead])
+        run(pool, pool.max_concurrency, "pool A+B+C, AIMD", trace=True)
+        for endpoint in pool.stats()['endpoints']:
+            print(f"      {endpoint['url']:<26} limit {endpoint['limit']:5.2f} (peak {endpoint['peak_limit']:5.2f}) | "
+                  f"{endpoint['requests']:5} requests | {endpoint['throttled']:4} throttled | "
+                  f"{endpoint['errors']:3} errors | latency {endpoint['latency_ms']} ms")
+        stats = pool.stats()
+        print(f"      429 share: {(node_a.throttled + node_b.throttled) / max(stats['requests'], 1):.1%} of requests")
+
+
+if __name__ == "__main__":
+    main()
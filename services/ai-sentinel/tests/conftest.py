@@ -0,0 +1,108 @@
+"""
+Tests for the ai-sentinel service. The service modules are flat files
+imported by name (as gunicorn does from this directory), so the service
+directory goes on sys.path.
+
+    cd services/ai-sentinel && python -m pytest tests            # everything
+    python -m pytest tests -m "not slow"                         # skip forking / timing-heavy tests
+"""
+
+import os
+import sys
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: forks workers or runs stand-in servers for several seconds")
+
+
+@pytest.fixture(scope='session')
+def sentinel(tmp_path_factory):
+    """
+    advanced_ai_sentinel imported in a scratch directory: the isolation model it
+    trains (model.joblib) and threat_intelligence.db land there, not in the service dir
+    """
+    workdir = tmp_path_factory.mktemp('sentinel')
+    previous = os.getcwd()
+    os.environ.setdefault('CERBERUS_MODEL_LOADING', 'eager')
+    os.chdir(workdir)
+    try:
+        import advanced_ai_sentinel
+        yield advanced_ai_sentinel
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture(scope='session')
+def serving_bundle(tmp_path_factory):
+    """
+    Directory holding a model_bundle/ trained on synthetic transactions (every
+    member small, labels from gas price and value), for CerberusAI in app.py
+    """
+    import warnings
+
+    import numpy as np
+    from sklearn.ensemble import GradientBoostingClassifier, IsolationForest, RandomForestClassifier
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    from model_bundle import MODEL_BUNDLE_DIR, write_model_bundle
+    from tx_features import MODEL_FEATURES, PIPELINE, monitor_json, synthetic_transactions
+
+    chain, _ = synthetic_transactions(3000, seed=5)
+    rows, _ = PIPELINE.extract_batch([monitor_json(tx) for tx in chain], MODEL_FEATURES)
+    X = np.vstack([vector for _, vector, _ in rows])
+    y = ((X[:, MODEL_FEATURES.index('gasPrice_gwei')] > 100) | (X[:, MODEL_FEATURES.index('value')] > 10)).astype(int)
+
+    scaler = StandardScaler().fit(X)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        models = {
+            'isolation_forest': IsolationForest(n_estimators=20, random_state=0).fit(scaler.transform(X)),
+            'random_forest': RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0).fit(X, y),
+            'gradient_boosting': GradientBoostingClassifier(n_estimators=20, random_state=0).fit(X, y),
+            'neural_network': MLPClassifier((16,), max_iter=200, random_state=0).fit(scaler.transform(X), y)
+        }
+    weights = {'isolation_forest': 0.1, 'random_forest': 0.35, 'gradient_boosting': 0.35, 'neural_network': 0.2}
+
+    directory = tmp_path_factory.mktemp('serving')
+    write_model_bundle(str(directory / MODEL_BUNDLE_DIR), models, scaler, list(MODEL_FEATURES), weights)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """app.py imported where there is no bundle: its module-level ai_engine is rule-based and idle"""
+    os.environ.setdefault('CERBERUS_MODEL_WATCH_INTERVAL', '0')
+    os.environ.setdefault('CERBERUS_MICROBATCH', '0')
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        import app
+    finally:
+        os.chdir(previous)
+    return app
+
+
+@pytest.fixture
+def engine(app_module, serving_bundle, monkeypatch):
+    """CerberusAI serving the synthetic bundle (the cwd stays there so reloads find it)"""
+    monkeypatch.chdir(serving_bundle)
+    ai = app_module.CerberusAI()
+    assert ai.models_loaded
+    return ai
+
+
+@pytest.fixture
+def rule_engine(app_module, tmp_path, monkeypatch):
+    """CerberusAI with no bundle to load (rule-based mode)"""
+    monkeypatch.chdir(tmp_path)
+    ai = app_module.CerberusAI()
+    assert not ai.models_loaded
+    return ai
@@ -0,0 +1,59 @@
+from collections import defaultdict
+from dataclasses import asdict
+
+import pytest
+
+ROWS = 1500
+
+
+@pytest.fixture(scope='module')
+def bench(sentinel):
+    import anomaly_benchmark
+    return anomaly_benchmark
+
+
+@pytest.fixture(scope='module')
+def rows(bench):
+    return bench.feature_rows(ROWS)
+
+
+def reference_run(bench, model, rows):
+    feature_stats = defaultdict(lambda: {'mean': 0, 'std': 1, 'count': 0})
+    return [asdict(bench.reference_predict(model, feature_stats, features)) for features in rows]
+
+
+@pytest.fixture(scope='module')
+def expected(bench, rows):
+    # sklearn forest fed a one-row DataFrame per call, as before the compiled model and predict_batch
+    return reference_run(bench, bench.reference_model(), rows)
+
+
+def test_predict_is_bitwise_identical_to_the_dataframe_version(sentinel, rows, expected):
+    assert sentinel.isolation_model is not None
+    detector = sentinel.AnomalyDetector()
+    assert [asdict(detector.predict(features)) for features in rows] == expected
+
+
+@pytest.mark.parametrize('batch_size', [1, 16, 64, 1000])
+def test_predict_batch_is_bitwise_identical_to_the_dataframe_version(sentinel, rows, expected, batch_size):
+    detector = sentinel.AnomalyDetector()
+    got = []
+    for start in range(0, len(rows), batch_size):
+        got.extend(asdict(p) for p in detector.predict_batch(rows[start:start + batch_size]))
+    assert got == expected
+
+
+def test_statistics_only_without_an_isolation_model(sentinel, bench, rows, monkeypatch):
+    monkeypatch.setattr(sentinel, 'isolation_model', None)
+    detector = sentinel.AnomalyDetector()
+    got = [asdict(p) for p in detector.predict_batch(rows[:500])]
+    assert got == reference_run(bench, None, rows[:500])
+
+
+def test_feature_stats_view_matches_the_dict_version(sentinel, bench, rows):
+    detector = sentinel.AnomalyDetector()
+    detector.predict_batch(rows)
+    feature_stats = defaultdict(lambda: {'mean': 0, 'std': 1, 'count': 0})
+    for features in rows:
+        bench.reference_predict(None, feature_stats, features)
+    assert detector.feature_stats == {name: dict(feature_stats[name]) for name in detector.NUMERIC_FEATURES}
@@ -0,0 +1,145 @@
+import pytest
+
+from tx_features import monitor_json, rpc_json, synthetic_transactions
+from verdict_cache import VerdictCache
+
+N_TRANSACTIONS = 600
+
+# Rows extraction rejects: the batch must answer them with the same error verdict predict() gives
+UNPARSEABLE = [
+    {'hash': '0xbad1', 'value': 'lots', 'gasPrice': '1000000000', 'gasLimit': '21000'},
+    {'hash': '0xbad2', 'value': '0', 'gasPrice': {'wei': 1}, 'gasLimit': '21000'},
+    {'hash': '0xbad3', 'value': '0', 'gasPrice': '1000000000', 'gasLimit': 'nan'},
+]
+
+
+@pytest.fixture(scope='module')
+def transactions():
+    chain, _ = synthetic_transactions(N_TRANSACTIONS, seed=1)
+    txs = [monitor_json(tx) if i % 2 else rpc_json(tx) for i, tx in enumerate(chain)]
+    for offset, bad in enumerate(UNPARSEABLE):
+        txs.insert(100 * offset + 37, bad)
+    return txs
+
+
+def comparable(result):
+    # The only field that legitimately differs between two scoring passes
+    return {k: v for k, v in result.items() if k != 'analyzed_at'}
+
+
+def uncached(ai):
+    ai.verdict_cache = VerdictCache(max_entries=0)
+    return ai
+
+
+@pytest.mark.parametrize('batch_size', [2, 7, 64, 1000])
+def test_predict_batch_matches_predict_with_the_ensemble(engine, transactions, batch_size):
+    ai = uncached(engine)
+    expected = [comparable(ai.predict(tx)) for tx in transactions]
+    assert {r.get('analysis_method') for r in expected} == {'ensemble_ml_enhanced', None}
+    assert sum(r['threat_category'] == 'ERROR' for r in expected) == len(UNPARSEABLE)
+
+    got = []
+    for start in range(0, len(transactions), batch_size):
+        got.extend(comparable(r) for r in ai.predict_batch(transactions[start:start + batch_size]))
+
+    # The float32 MLP rounds a matrix product differently from a single row (~1e-7 relative);
+    # everything derived from its probability agrees to that precision, the rest exactly
+    for row, (g, e) in enumerate(zip(got, expected)):
+        if 'model_predictions' in e:
+            assert g.pop('model_predictions') == pytest.approx(e.pop('model_predictions'), rel=1e-6, abs=1e-7), row
+            for field in ('ensemble_score', 'danger_score', 'confidence_score'):
+                assert g.pop(field) == pytest.approx(e.pop(field), rel=1e-6, abs=1e-5), (row, field)
+        assert g == e, row
+    assert len(got) == len(expected)
+
+
+@pytest.mark.parametrize('batch_size', [2, 64, 1000])
+def test_predict_batch_matches_predict_with_rules(rule_engine, transactions, batch_size):
+    ai = uncached(rule_engine)
+    expected = [comparable(ai.predict(tx)) for tx in transactions]
+    assert {r.get('analysis_method') for r in expected} == {'rule_based_enhanced', None}
+
+    got = []
+    for start in range(0, len(transactions), batch_size):
+        got.extend(comparable(r) for r in ai.predict_batch(transactions[start:start + batch_size]))
+    assert got == expected
+
+
+def test_batch_of_only_unparseable_rows(engine):
+    ai = uncached(engine)
+    got = [comparable(r) for r in ai.predict_batch(UNPARSEABLE)]
+    assert got == [comparable(ai.predict(tx)) for tx in UNPARSEABLE]
+    assert all(r['threat_category'] == 'ERROR' for r in got)
+
+
+def rule_features(n, seed=2):
+    """Feature dicts on, just above and just below every threshold the rules compare against"""
+    import random
+
+    rng = random.Random(seed)
+    gwei = [0, 1, 25, 50, 80, 100, 120, 150, 180, 250]
+    values = [0, 1e-9, 0.5, 1, 1.0000001, 5, 10, 50, 100, 1e6]
+    gas = [0, 21000, 99999, 100000, 200000, 500000, 500001, 1000000, 3000000]
+
+    def near(points):
+        x = rng.choice(points)
+        return rng.choice([x, x * (1 + 1e-9), x * (1 - 1e-9), x + rng.random()])
+
+    return [{
+        'value': near(values),
+        'gas': int(near(gas)),
+        'gasPrice_gwei': near(gwei),
+        'isContractCreation': int(rng.random() < 0.2),
+        'hasInput': int(rng.random() < 0.6)
+    } for _ in range(n)]
+
+
+@pytest.fixture(scope='module')
+def features_list():
+    return rule_features(20000)
+
+
+def test_batch_rules_match_the_scalar_rules(rule_engine, features_list):
+    batch = rule_engine.enhanced_rule_based_detection_batch(rule_engine.feature_columns(features_list))
+
+    for row, features in enumerate(features_list):
+        expected = rule_engine.enhanced_rule_based_detection(features)
+        got = {
+            'danger_score': float(batch['danger_score'][row]),
+            'is_malicious': bool(batch['is_malicious'][row]),
+            'threat_category': batch['threat_category'][row],
+            'threat_signature': batch['threat_signature'][row],
+            'threat_level': int(batch['threat_level'][row]),
+            'threat_factors': batch['threat_factors'][row],
+            'confidence_score': float(batch['confidence_score'][row])
+        }
+        assert got == expected, (row, features)
+
+
+def test_batch_rules_without_explanations(rule_engine, features_list):
+    columns = rule_engine.feature_columns(features_list)
+    full = rule_engine.enhanced_rule_based_detection_batch(columns)
+    bare = rule_engine.enhanced_rule_based_detection_batch(columns, explain=False)
+
+    assert bare['threat_factors'] is None and bare['threat_signature'] is None
+    for field in ('danger_score', 'is_malicious', 'threat_category', 'threat_level', 'confidence_score'):
+        assert list(bare[field]) == list(full[field]), field
+
+
+def test_batch_categorisation_matches_the_scalar_one(rule_engine, features_list):
+    import random
+
+    rng = random.Random(3)
+    # Danger = score * 100: on and around the 50 / 70 / 90 boundaries and the floors
+    scores = [rng.choice([0.0, 0.2, 0.5, 0.7, 0.78, 0.85, 0.9, 0.95, 1.0]) + rng.choice([0, 1e-9, -1e-9, rng.random() / 10])
+              for _ in features_list]
+    scores = [min(max(s, 0.0), 1.0) for s in scores]
+
+    categories, descriptions, levels, dangers = rule_engine.categorize_threat_ml_batch(
+        rule_engine.feature_columns(features_list), scores
+    )
+    for row, (features, score) in enumerate(zip(features_list, scores)):
+        expected = rule_engine.categorize_threat_ml(features, score)
+        got = (categories[row], descriptions[row], int(levels[row]), float(dangers[row]))
+        assert got == expected, (row, features, score)
@@ -0,0 +1,133 @@
+import pytest
+
+from block_fetcher import BlockFetcher, JsonRpcClient, LocalRpcServer, synthetic_chain
+
+FIRST_BLOCK = 61615671
+
+
+@pytest.fixture(scope='module')
+def chain():
+    return synthetic_chain(60, first_block=FIRST_BLOCK)
+
+
+def block_numbers(fetched):
+    return [number for number, _, _ in fetched]
+
+
+class FailingBlockServer(LocalRpcServer):
+    """Answers an error object for some blocks and HTTP 500 for any request containing others"""
+
+    def __init__(self, chain, error_blocks=(), failing_blocks=(), failing_receipts=False, **kwargs):
+        super().__init__(chain, latency=0.0, per_call=0.0, **kwargs)
+        self.error_blocks = {hex(n) for n in error_blocks}
+        self.failing_blocks = {hex(n) for n in failing_blocks}
+        self.failing_receipts = failing_receipts
+
+    def handle(self, call):
+        if call.get('method') == 'eth_getBlockByNumber' and call['params'][0] in self.error_blocks:
+            return {'error': {'code': -32000, 'message': 'header not found'}}
+        return super().handle(call)
+
+    def respond(self, payload):
+        calls = payload if isinstance(payload, list) else [payload]
+        for call in calls:
+            method, params = call.get('method'), call.get('params') or []
+            if method == 'eth_getBlockByNumber' and params[0] in self.failing_blocks:
+                return 500, {'error': 'internal error'}
+            if method == 'eth_getTransactionReceipt' and self.failing_receipts:
+                return 500, {'error': 'internal error'}
+        return super().respond(payload)
+
+
+def fetch_all(node, chain, **kwargs):
+    fetcher = BlockFetcher(JsonRpcClient(node.url, retries=0), **kwargs)
+    end = FIRST_BLOCK + len(chain['blocks'])
+    return list(fetcher.iter_blocks(FIRST_BLOCK, end)), fetcher.stats()
+
+
+def test_missing_block_is_skipped_and_the_rest_of_its_chunk_kept(chain):
+    gone = FIRST_BLOCK + 13
+    pruned = dict(chain, blocks=[b for b in chain['blocks'] if int(b['number'], 16) != gone])
+
+    with LocalRpcServer(pruned, latency=0.0, per_call=0.0) as node:
+        fetched, stats = fetch_all(node, chain, concurrency=4, blocks_per_request=10)
+
+    expected = [n for n in range(FIRST_BLOCK, FIRST_BLOCK + 60) if n != gone]
+    assert block_numbers(fetched) == expected
+    assert stats['skipped_blocks'] == 1
+    assert stats['blocks'] == 59
+
+
+def test_block_error_object_is_skipped(chain):
+    bad = FIRST_BLOCK + 42
+    with FailingBlockServer(chain, error_blocks=[bad]) as node:
+        fetched, stats = fetch_all(node, chain, concurrency=4, blocks_per_request=10)
+
+    assert block_numbers(fetched) == [n for n in range(FIRST_BLOCK, FIRST_BLOCK + 60) if n != bad]
+    assert stats['skipped_blocks'] == 1
+
+
+def test_failed_chunk_is_skipped_and_later_blocks_still_yielded_in_order(chain):
+    bad = FIRST_BLOCK + 25              # chunk 20..29 of the scan
+    with FailingBlockServer(chain, failing_blocks=[bad]) as node:
+        fetched, stats = fetch_all(node, chain, concurrency=4, blocks_per_request=10)
+
+    lost = set(range(FIRST_BLOCK + 20, FIRST_BLOCK + 30))
+    assert block_numbers(fetched) == [n for n in range(FIRST_BLOCK, FIRST_BLOCK + 60) if n not in lost]
+    assert stats['skipped_blocks'] == 10
+    assert stats['blocks'] == 50
+
+
+def test_failed_receipt_request_keeps_the_blocks(chain):
+    with FailingBlockServer(chain, failing_receipts=True) as node:
+        fetched, stats = fetch_all(node, chain, concurrency=2, blocks_per_request=10)
+
+    assert block_numbers(fetched) == list(range(FIRST_BLOCK, FIRST_BLOCK + 60))
+    assert all(receipt is None for _, _, receipts in fetched for receipt in receipts)
+    assert stats['missing_receipts'] == stats['transactions'] > 0
+    assert stats['skipped_blocks'] == 0
+
+
+@pytest.fixture(scope='module')
+def node(chain):
+    # Every 7th receipt is unknown to the node (pruned / not yet indexed)
+    hashes = sorted(chain['receipts'])
+    served = dict(chain, receipts={h: chain['receipts'][h] for i, h in enumerate(hashes) if i % 7})
+    with LocalRpcServer(served, latency=0.002, per_call=0.0) as server:
+        server.pruned = set(hashes[::7])
+        yield server
+
+
+@pytest.mark.parametrize('concurrency', [1, 2, 4, 8, 16])
+@pytest.mark.parametrize('blocks_per_request', [1, 7, 10])
+def test_blocks_in_order_with_aligned_receipts(chain, node, concurrency, blocks_per_request):
+    # 13 receipts per request: receipt batches straddle block boundaries
+    fetched, stats = fetch_all(node, chain, concurrency=concurrency, blocks_per_request=blocks_per_request,
+                               receipts_per_request=13)
+
+    assert block_numbers(fetched) == list(range(FIRST_BLOCK, FIRST_BLOCK + 60))
+    assert [block for _, block, _ in fetched] == chain['blocks']
+    for _, block, receipts in fetched:
+        assert len(receipts) == len(block['transactions'])
+        for tx, receipt in zip(block['transactions'], receipts):
+            if tx['hash'] in node.pruned:
+                assert receipt is None
+            else:
+                assert receipt == chain['receipts'][tx['hash']]
+
+    assert stats['blocks'] == 60
+    assert stats['transactions'] == len(chain['receipts'])
+    assert stats['missing_receipts'] == len(node.pruned)
+    assert stats['skipped_blocks'] == 0
+
+
+def test_matches_a_serial_scan(chain, node):
+    client = JsonRpcClient(node.url)
+    serial = []
+    for number in range(FIRST_BLOCK, FIRST_BLOCK + 60):
+        block = client.call('eth_getBlockByNumber', [hex(number), True])
+        serial.append((number, block, [client.call('eth_getTransactionReceipt', [tx['hash']])
+                                       for tx in block['transactions']]))
+
+    fetched, _ = fetch_all(node, chain, concurrency=8)
+    assert fetched == serial
@@ -0,0 +1,147 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+import calldata
+from calldata import EMPTY_FEATURES, CalldataAnalyzer, calldata_features, decode_hex, push_density
+
+
+def reference_byte_entropy(raw):
+    return -sum(c / len(raw) * math.log2(c / len(raw)) for c in Counter(raw).values())
+
+
+def reference_push_density(code):
+    instructions = pushes = position = 0
+    while position < len(code):
+        opcode = code[position]
+        instructions += 1
+        width = opcode - 0x5f if 0x60 <= opcode <= 0x7f else 0
+        pushes += width > 0
+        position += 1 + width
+    return pushes / instructions if instructions else 0.0
+
+
+def abi_call(rng, words):
+    selector = rng.getrandbits(32).to_bytes(4, 'big')
+    # Left-padded addresses and amounts: plenty of zero bytes
+    return selector + b''.join(bytes(12) + rng.getrandbits(160).to_bytes(20, 'big') if rng.random() < 0.5
+                               else bytes(24) + rng.getrandbits(64).to_bytes(8, 'big') for _ in range(words))
+
+
+def creation_code(rng, size):
+    code = bytearray()
+    while len(code) < size:
+        if rng.random() < 0.35:
+            width = rng.choice([1, 1, 1, 2, 4, 20, 32])
+            code.append(0x5f + width)
+            code.extend(rng.getrandbits(8) for _ in range(width))
+        else:
+            code.append(rng.randrange(0, 0x60))
+    return bytes(code[:size])
+
+
+def payloads():
+    rng = random.Random(22)
+    return [
+        ('transfer', abi_call(rng, 2), False),
+        ('router swap', abi_call(rng, 32), False),
+        ('random', rng.randbytes(777), False),
+        ('all zero', bytes(100), False),
+        ('short', b'\x01\x02', False),
+        ('creation 24 KiB', creation_code(rng, 24576), True),
+        ('creation truncated push', creation_code(rng, 300) + b'\x7f\x01', True),
+    ]
+
+
+@pytest.mark.parametrize('label, raw, creation', payloads(), ids=[p[0] for p in payloads()])
+def test_features_match_the_references(label, raw, creation):
+    features = calldata_features('0x' + raw.hex(), creation)
+
+    assert features['calldata_bytes'] == len(raw)
+    assert features['data_entropy'] == pytest.approx(reference_byte_entropy(raw), abs=1e-9)
+    assert features['zero_byte_ratio'] == raw.count(0) / len(raw)
+    assert features['push_density'] == (reference_push_density(raw) if creation else 0.0)
+    expected_selector = int.from_bytes(raw[:4], 'big') if len(raw) >= 4 and not creation else -1
+    assert features['selector_id'] == expected_selector
+
+
+def test_entropy_is_bits_per_byte():
+    every_byte = bytes(range(256))
+    assert calldata_features('0x' + every_byte.hex())['data_entropy'] == pytest.approx(8.0)
+    assert calldata_features('0x' + 'ab' * 64)['data_entropy'] == 0.0
+    assert calldata_features('0x' + '00ff' * 32)['data_entropy'] == pytest.approx(1.0)
+    # Not hex characters: '0x' and the digits themselves play no part
+    assert calldata_features('0x0123')['data_entropy'] == calldata_features('0x4567')['data_entropy'] == 1.0
+
+
+def test_push_immediates_are_not_read_as_opcodes():
+    # PUSH1 0x80 PUSH1 0x40 MSTORE
+    assert push_density(bytes.fromhex('6080604052')) == pytest.approx(2 / 3)
+    # PUSH32 whose immediate is all PUSH1 opcodes: one instruction
+    assert push_density(b'\x7f' + b'\x60' * 32) == 1.0
+    assert push_density(b'') == 0.0
+
+
+@pytest.mark.parametrize('data', [None, '', '0x', '0xzz', '0x123', 12345])
+def test_empty_or_invalid_calldata(data):
+    assert calldata_features(data) == EMPTY_FEATURES
+
+
+def test_decode_hex_accepts_either_prefix():
+    assert decode_hex('0XA9059CBB') == decode_hex('a9059cbb') == bytes.fromhex('a9059cbb')
+
+
+def test_memo_returns_the_computed_features():
+    analyzer = CalldataAnalyzer(max_bytes=2**20)
+    for _, raw, creation in payloads():
+        data = '0x' + raw.hex()
+        assert analyzer.analyze(data, creation) == calldata_features(data, creation)
+        # A new str with the same content hits
+        assert analyzer.analyze(data[:1] + data[1:], creation) == calldata_features(data, creation)
+    # The same bytes as creation code are a different entry
+    data = '0x' + payloads()[0][1].hex()
+    assert analyzer.analyze(data, True)['selector_id'] == -1
+
+    stats = analyzer.stats()
+    assert (stats['hits'], stats['misses']) == (len(payloads()), len(payloads()) + 1)
+
+
+def test_memo_stays_within_its_byte_budget_and_evicts_lru():
+    budget = 20000
+    analyzer = CalldataAnalyzer(max_bytes=budget)
+    rng = random.Random(7)
+    pinned = '0x' + abi_call(rng, 4).hex()
+    analyzer.analyze(pinned)
+    inserted = []
+
+    for _ in range(500):
+        inserted.append('0x' + abi_call(rng, rng.randint(1, 40)).hex())
+        analyzer.analyze(inserted[-1])
+        analyzer.analyze(pinned)                  # most recently used after every insert
+
+        stats = analyzer.stats()
+        held = sum(len(data) + calldata._ENTRY_OVERHEAD for _, data in analyzer._entries)
+        assert stats['bytes'] == held <= budget
+
+    stats = analyzer.stats()
+    assert stats['evictions'] > 0
+    assert stats['entries'] + stats['evictions'] == 501
+    assert (False, pinned) in analyzer._entries
+    # Everything else kept is the newest run of inserts, oldest first
+    kept = [data for _, data in analyzer._entries if data != pinned]
+    assert kept == inserted[-len(kept):]
+
+
+def test_payload_larger_than_the_budget_is_not_memoized():
+    analyzer = CalldataAnalyzer(max_bytes=5000)
+    big = '0x' + bytes(4000).hex()
+    assert analyzer.analyze(big)['zero_byte_ratio'] == 1.0
+    assert analyzer.stats()['entries'] == 0
+
+
+def test_zero_budget_disables_the_memo():
+    analyzer = CalldataAnalyzer(max_bytes=0)
+    assert analyzer.analyze('0xa9059cbb')['selector_id'] == 0xa9059cbb
+    assert analyzer.stats()['entries'] == analyzer.stats()['misses'] == 0
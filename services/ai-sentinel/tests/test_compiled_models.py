@@ -0,0 +1,224 @@
+import os
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, IsolationForest, RandomForestClassifier
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler
+
+from compiled_models import (
+    MLP_PARITY_ATOL, PARITY_ATOL, CompiledIsolationForest, CompiledMLP, CompiledTreeEnsemble,
+    prefork_memory, process_memory
+)
+
+# Per-worker private memory after scoring with the shared, mmap'd bundle. Python plus the
+# scoring temporaries measure ~5-9 MB; a worker holding its own copy of the models would not fit.
+PREFORK_PRIVATE_BOUND_KB = 16 * 1024
+
+
+def synthetic_data(n_rows=600, n_features=8, seed=7):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features)) * rng.uniform(0.1, 1e6, n_features)
+    y = ((X[:, 0] > 0) ^ (X[:, 1] * X[:, 2] > 0) | (rng.random(n_rows) < 0.05)).astype(int)
+    return X, y
+
+
+def with_nan(X, fraction=0.2, seed=3):
+    rng = np.random.default_rng(seed)
+    X = X.copy()
+    X[rng.random(X.shape) < fraction] = np.nan
+    return X
+
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = synthetic_data()
+    probe, _ = synthetic_data(n_rows=1000, seed=11)
+    return X, y, probe
+
+
+@pytest.fixture(scope='module')
+def random_forest(data):
+    X, y, _ = data
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def gradient_boosting(data):
+    X, y, _ = data
+    return GradientBoostingClassifier(n_estimators=30, max_depth=3, random_state=0).fit(X, y)
+
+
+@pytest.mark.parametrize('model_name', ['random_forest', 'gradient_boosting'])
+def test_predict_proba_matches_sklearn(request, data, model_name):
+    model = request.getfixturevalue(model_name)
+    compiled = CompiledTreeEnsemble.from_sklearn(model)
+    _, _, probe = data
+
+    for rows in (probe, probe[:1], probe[17]):
+        expected = model.predict_proba(np.atleast_2d(rows))
+        np.testing.assert_allclose(compiled.predict_proba(rows), expected, rtol=0, atol=PARITY_ATOL)
+    np.testing.assert_array_equal(compiled.predict(probe), model.predict(probe))
+
+
+def test_random_forest_routes_nan_like_sklearn(data, random_forest):
+    compiled = CompiledTreeEnsemble.from_sklearn(random_forest)
+    probe = with_nan(data[2])
+
+    np.testing.assert_allclose(compiled.predict_proba(probe), random_forest.predict_proba(probe),
+                               rtol=0, atol=PARITY_ATOL)
+    all_missing = np.full((1, probe.shape[1]), np.nan)
+    np.testing.assert_allclose(compiled.predict_proba(all_missing), random_forest.predict_proba(all_missing),
+                               rtol=0, atol=PARITY_ATOL)
+
+
+def test_nan_routing_survives_save_and_load(tmp_path, data, random_forest):
+    CompiledTreeEnsemble.from_sklearn(random_forest).save(str(tmp_path / 'rf'))
+    loaded = CompiledTreeEnsemble.load(str(tmp_path / 'rf'))
+    probe = with_nan(data[2])
+
+    np.testing.assert_allclose(loaded.predict_proba(probe), random_forest.predict_proba(probe),
+                               rtol=0, atol=PARITY_ATOL)
+
+
+def test_gradient_boosting_rejects_nan_like_sklearn(data, gradient_boosting):
+    compiled = CompiledTreeEnsemble.from_sklearn(gradient_boosting)
+    probe = with_nan(data[2][:10])
+
+    with pytest.raises(ValueError, match='NaN'):
+        gradient_boosting.predict_proba(probe)
+    with pytest.raises(ValueError, match='NaN'):
+        compiled.predict_proba(probe)
+
+
+def test_isolation_forest_matches_sklearn_and_rejects_nan(data):
+    X, _, probe = data
+    model = IsolationForest(n_estimators=30, random_state=0).fit(X)
+    compiled = CompiledIsolationForest.from_sklearn(model)
+
+    np.testing.assert_array_equal(compiled.decision_function(probe), model.decision_function(probe))
+    with pytest.raises(ValueError, match='NaN'):
+        compiled.score_samples(with_nan(probe[:10]))
+
+
+@pytest.fixture(scope='module')
+def scaled_mlp(data):
+    X, y, _ = data
+    scaler = StandardScaler().fit(X)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        mlp = MLPClassifier(hidden_layer_sizes=(128, 64, 32), max_iter=200, random_state=0)
+        mlp.fit(scaler.transform(X), y)
+    return scaler, mlp
+
+
+@pytest.mark.parametrize('n_rows', [1, 1000])
+def test_mlp_folded_scaler_matches_sklearn(data, scaled_mlp, n_rows):
+    scaler, mlp = scaled_mlp
+    compiled = CompiledMLP.from_sklearn(mlp, scaler)
+    rng = np.random.default_rng(n_rows)
+    probe = data[2][rng.integers(0, len(data[2]), n_rows)] * rng.uniform(0.5, 2.0, (n_rows, data[2].shape[1]))
+
+    expected = mlp.predict_proba(scaler.transform(probe))
+    np.testing.assert_allclose(compiled.predict_proba(probe), expected, rtol=0, atol=MLP_PARITY_ATOL)
+    for row in probe[:20]:
+        np.testing.assert_allclose(compiled.predict_proba(row), mlp.predict_proba(scaler.transform(row[None, :])),
+                                   rtol=0, atol=MLP_PARITY_ATOL)
+
+
+def serving_scale_data(n_rows=4000, seed=7):
+    """
+    Serving features (gas, wei gas prices, nonces, ETH values) plus the columns
+    where folding the mean into a float32 bias cancels: a block number (large
+    offset, narrow spread) and raw wei values (0 to 1e24)
+    """
+    from tx_features import MODEL_FEATURES, PIPELINE, monitor_json, synthetic_transactions
+
+    chain, _ = synthetic_transactions(n_rows, seed=seed)
+    rows, _ = PIPELINE.extract_batch([monitor_json(tx) for tx in chain], MODEL_FEATURES)
+    X = np.vstack([vector for _, vector, _ in rows])
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        X,
+        np.array([tx['blockNumber'] for tx in chain], dtype=np.float64) + rng.normal(0, 500, n_rows),
+        np.array([tx['value'] for tx in chain], dtype=np.float64)
+    ])
+    gwei = X[:, MODEL_FEATURES.index('gasPrice_gwei')]
+    y = ((gwei > 100) ^ (X[:, -2] % 2 > 1) | (rng.random(n_rows) < 0.05)).astype(int)
+    return X, y
+
+
+@pytest.fixture(scope='module')
+def serving_scale_mlp():
+    X, y = serving_scale_data()
+    scaler = StandardScaler().fit(X)
+    assert np.abs(scaler.mean_ / scaler.scale_).max() > 1e4
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        mlp = MLPClassifier(hidden_layer_sizes=(128, 64, 32), max_iter=200, random_state=0)
+        mlp.fit(scaler.transform(X), y)
+    return X, scaler, mlp
+
+
+def test_mlp_matches_sklearn_on_large_offset_features(serving_scale_mlp, tmp_path):
+    X, scaler, mlp = serving_scale_mlp
+    probe, _ = serving_scale_data(2000, seed=11)
+    compiled = CompiledMLP.from_sklearn(mlp, scaler)
+    compiled.save(str(tmp_path / 'mlp'))
+    loaded = CompiledMLP.load(str(tmp_path / 'mlp'))
+
+    for rows in (X, probe):
+        expected = mlp.predict_proba(scaler.transform(rows))
+        # Measured ~2e-6 here (and ~5e-7 on the serving features alone)
+        np.testing.assert_allclose(compiled.predict_proba(rows), expected, rtol=0, atol=MLP_PARITY_ATOL)
+        np.testing.assert_array_equal(loaded.predict_proba(rows), compiled.predict_proba(rows))
+    for row in probe[:50]:
+        np.testing.assert_allclose(compiled.predict_proba(row), mlp.predict_proba(scaler.transform(row[None, :])),
+                                   rtol=0, atol=MLP_PARITY_ATOL)
+
+
+def test_mlp_buffers_do_not_leak_between_batch_sizes(data, scaled_mlp):
+    scaler, mlp = scaled_mlp
+    compiled = CompiledMLP.from_sklearn(mlp, scaler)
+    probe = data[2]
+
+    big = compiled.predict_proba(probe).copy()
+    single = compiled.predict_proba(probe[:1])
+    np.testing.assert_array_equal(compiled.predict_proba(probe), big)
+    assert single.shape == (1, 2)
+    np.testing.assert_allclose(single, big[:1], rtol=0, atol=MLP_PARITY_ATOL)
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not process_memory(), reason='needs /proc/<pid>/smaps_rollup')
+def test_prefork_workers_share_the_mapped_bundle(tmp_path):
+    from model_bundle import load_model_bundle, write_model_bundle
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(4000, 10))
+    y = (X[:, 0] * X[:, 1] + X[:, 2] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        models = {
+            'isolation_forest': IsolationForest(n_estimators=100, random_state=0).fit(scaler.transform(X)),
+            'random_forest': RandomForestClassifier(n_estimators=150, random_state=0).fit(X, y),
+            'gradient_boosting': GradientBoostingClassifier(n_estimators=50, random_state=0).fit(X, y),
+            'neural_network': MLPClassifier((64, 32), max_iter=50, random_state=0).fit(scaler.transform(X), y)
+        }
+    directory = str(tmp_path / 'model_bundle')
+    write_model_bundle(directory, models, scaler, [f'f{i}' for i in range(10)], {}, include_reference=False)
+    bundle = load_model_bundle(directory)
+    bundle_kb = sum(os.path.getsize(os.path.join(root, f))
+                    for root, _, files in os.walk(directory) for f in files) / 1024
+
+    per_worker = {workers: prefork_memory(bundle.models, X[:100], workers) for workers in (1, 2, 4)}
+
+    for workers, memory in per_worker.items():
+        assert memory['private_kb'] < PREFORK_PRIVATE_BOUND_KB, (workers, memory)
+    # Once the mapped pages are shared, adding workers adds no private memory per worker...
+    assert per_worker[4]['private_kb'] <= per_worker[2]['private_kb'] + 1024
+    # ...and each worker's proportional share of the bundle pages shrinks
+    assert per_worker[4]['pss_kb'] < per_worker[1]['pss_kb'] - bundle_kb / 2
@@ -0,0 +1,110 @@
+import random
+
+from feature_state import AddressStateStore, ShardedAddressStateStore
+
+CAPACITY = 200
+
+
+def addresses(n, seed=14):
+    rng = random.Random(seed)
+    return [f'0x{rng.getrandbits(160):040x}' for _ in range(n)]
+
+
+def stream(senders, n, seed=15):
+    """A hot set of repeat senders plus a long tail of one-offs, one tx per simulated second"""
+    rng = random.Random(seed)
+    hot = senders[:CAPACITY // 4]
+    for i in range(n):
+        address = rng.choice(hot) if rng.random() < 0.5 else rng.choice(senders)
+        yield float(i), address, rng.choice([0.0, 0.25, 1.5, 40.0]), rng.random() < 0.1
+
+
+def replay(store, senders, n, check_eviction_order=True):
+    """Observe the stream, checking the bound and LRU order; returns the reference state of tracked senders"""
+    expected = {}
+    for now, address, value, creation in stream(senders, n):
+        tracked_before = set(expected)
+        tx_count, total_value, _ = store.observe(address, value, creation, now=now)
+
+        state = expected.get(address)
+        if tx_count == 1:
+            # New to the store, or forgotten since: counting starts over
+            state = expected[address] = {'tx_count': 0, 'total_value': 0.0, 'contract_interactions': 0,
+                                         'first_seen': now, 'last_seen': now}
+        state['tx_count'] += 1
+        state['total_value'] += value
+        state['contract_interactions'] += int(creation)
+        state['last_seen'] = now
+        assert (tx_count, total_value) == (state['tx_count'], state['total_value']), address
+
+        evicted = {a for a in tracked_before if a not in store}
+        for a in evicted:
+            del expected[a]
+        if evicted and check_eviction_order:
+            # A sweep drops the least recently seen: nobody it kept is older than anyone it dropped
+            newest_dropped = max(last_seen[a] for a in evicted)
+            assert all(last_seen[a] > newest_dropped for a in expected if a != address)
+        last_seen = {a: s['last_seen'] for a, s in expected.items()}
+
+        assert len(store) == len(expected) <= store.max_addresses
+    return expected
+
+
+def test_store_stays_at_its_bound_and_evicts_least_recently_seen():
+    store = AddressStateStore(max_addresses=CAPACITY, ttl_seconds=10**9, initial_capacity=16)
+    expected = replay(store, addresses(2000), 6000)
+
+    stats = store.stats()
+    assert stats['allocated_slots'] == CAPACITY
+    assert stats['lru_evictions'] > 0 and stats['ttl_evictions'] == 0
+    # Each sweep takes a full store down to 90% of capacity
+    assert stats['lru_evictions'] == stats['sweeps'] * CAPACITY // 10
+    # Surviving senders were not touched by the slot reuse around them
+    for address, state in expected.items():
+        assert store.get(address) == state, address
+
+
+def test_evicted_sender_starts_over():
+    store = AddressStateStore(max_addresses=10, ttl_seconds=10**9, initial_capacity=10)
+    senders = addresses(11)
+    for i, address in enumerate(senders[:10]):
+        store.observe(address, 1.0, False, now=float(i))
+    store.observe(senders[0], 1.0, False, now=10.0)       # most recent now; senders[1] is the oldest
+
+    store.observe(senders[10], 5.0, True, now=11.0)       # full: sweep down to 9, then insert
+
+    assert senders[1] not in store
+    assert store.get(senders[0])['tx_count'] == 2
+    assert store.get(senders[10]) == {'tx_count': 1, 'total_value': 5.0, 'contract_interactions': 1,
+                                      'first_seen': 11.0, 'last_seen': 11.0}
+    assert store.observe(senders[1], 1.0, False, now=12.0)[0] == 1
+
+
+def test_idle_senders_expire_before_recent_ones_are_evicted():
+    store = AddressStateStore(max_addresses=10, ttl_seconds=100, initial_capacity=10)
+    senders = addresses(12)
+    for address in senders[:5]:
+        store.observe(address, 1.0, False, now=0.0)
+    for address in senders[5:10]:
+        store.observe(address, 1.0, False, now=150.0)
+
+    store.observe(senders[10], 1.0, False, now=160.0)
+
+    assert all(address not in store for address in senders[:5])
+    assert all(store.get(address)['tx_count'] == 1 for address in senders[5:11])
+    stats = store.stats()
+    assert (stats['ttl_evictions'], stats['lru_evictions']) == (5, 0)
+
+    # Idle past the TTL without a sweep: the next transaction starts a new record
+    assert store.observe(senders[5], 1.0, False, now=251.0) == (1, 1.0, 0.0)
+
+
+def test_sharded_store_keeps_every_shard_at_its_bound():
+    store = ShardedAddressStateStore(max_addresses=CAPACITY, ttl_seconds=10**9, shards=4, initial_capacity=16)
+    # Eviction order is per shard, so only the bound and the surviving state are global
+    expected = replay(store, addresses(2000), 6000, check_eviction_order=False)
+
+    assert all(len(shard) <= shard.max_addresses == CAPACITY // 4 for shard in store.shards)
+    assert store.stats()['lru_evictions'] > 0
+    for address, state in expected.items():
+        assert store.get(address) == state, address
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import pytest
+
+from microbatch import MicroBatchScheduler
+
+
+def test_results_come_back_in_submission_order():
+    scheduler = MicroBatchScheduler(lambda items: [item * 2 for item in items], max_wait_ms=5)
+    futures = [scheduler.submit(i) for i in range(100)]
+    assert [future.result(timeout=5) for future in futures] == [i * 2 for i in range(100)]
+    scheduler.shutdown()
+
+
+def test_predict_times_out_when_the_dispatcher_is_stuck():
+    release = threading.Event()
+
+    def stuck(items):
+        release.wait(10)
+        return items
+
+    scheduler = MicroBatchScheduler(stuck, max_wait_ms=1, score_timeout=0.2)
+    started = time.perf_counter()
+    with pytest.raises(FutureTimeoutError):
+        scheduler.predict('tx')
+    assert time.perf_counter() - started < 2
+    release.set()
+    scheduler.shutdown()
+
+
+def test_shutdown_fails_requests_queued_behind_the_sentinel():
+    gate = threading.Event()
+
+    def slow(items):
+        gate.wait(5)
+        return items
+
+    scheduler = MicroBatchScheduler(slow, max_wait_ms=1, max_batch_size=1)
+    first = scheduler.submit('first')
+    time.sleep(0.05)                    # the dispatcher is now scoring 'first'
+    scheduler._queue.put((None, None, None))
+    scheduler._running = False
+    leftovers = [scheduler.submit(i) for i in range(5)]
+    gate.set()
+    scheduler.shutdown()
+
+    assert first.result(timeout=5) == 'first'
+    for future in leftovers:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+
+def test_shutdown_before_the_worker_started_fails_queued_requests():
+    scheduler = MicroBatchScheduler(lambda items: items)
+    future = Future()
+    scheduler._queue.put(('tx', future, time.perf_counter()))
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+
+
+def test_cancelled_request_is_skipped_and_the_dispatcher_keeps_running():
+    gate = threading.Event()
+    scored = []
+
+    def slow(items):
+        gate.wait(5)
+        scored.extend(items)
+        return items
+
+    scheduler = MicroBatchScheduler(slow, max_wait_ms=1, max_batch_size=1)
+    first = scheduler.submit('first')
+    time.sleep(0.05)                    # the dispatcher is now scoring 'first'
+    cancelled = scheduler.submit('cancelled')
+    kept = scheduler.submit('kept')
+    assert cancelled.cancel()
+    gate.set()
+
+    assert first.result(timeout=5) == 'first'
+    assert kept.result(timeout=5) == 'kept'
+    assert scored == ['first', 'kept']
+    assert scheduler._worker.is_alive()
+    assert scheduler.predict('after', timeout=5) == 'after'
+    scheduler.shutdown()
+
+
+def test_max_queue_depth_under_concurrent_submits():
+    gate = threading.Event()
+
+    def blocked(items):
+        gate.wait(5)
+        return items
+
+    scheduler = MicroBatchScheduler(blocked, max_wait_ms=1, max_batch_size=1)
+    scheduler.submit('held')
+    time.sleep(0.05)                    # the dispatcher holds 'held'; everything else stays queued
+    barrier = threading.Barrier(8)
+    futures = []
+
+    def client():
+        barrier.wait()
+        futures.extend(scheduler.submit(i) for i in range(50))
+
+    threads = [threading.Thread(target=client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert scheduler.stats()['max_queue_depth'] == 400
+    gate.set()
+    for future in futures:
+        future.result(timeout=10)
+    scheduler.shutdown()
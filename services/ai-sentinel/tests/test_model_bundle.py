@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import threading
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, IsolationForest, RandomForestClassifier
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler
+
+import model_bundle
+import tx_features
+from model_bundle import (
+    BUNDLE_MANIFEST, LEGACY_METADATA_FILE, LEGACY_MODEL_FILES, VERSIONS_SUFFIX, ModelBundleError,
+    load_model_bundle, migrate_legacy_models, read_manifest, write_model_bundle
+)
+
+FEATURES = [f'f{i}' for i in range(6)]
+
+
+def fitted_models(seed, n_features=len(FEATURES)):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, n_features))
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        models = {
+            'isolation_forest': IsolationForest(n_estimators=5, random_state=seed).fit(scaler.transform(X)),
+            'random_forest': RandomForestClassifier(n_estimators=5, max_depth=4, random_state=seed).fit(X, y),
+            'gradient_boosting': GradientBoostingClassifier(n_estimators=5, random_state=seed).fit(X, y),
+            'neural_network': MLPClassifier((8,), max_iter=20, random_state=seed).fit(scaler.transform(X), y)
+        }
+    return models, scaler
+
+
+def publish(directory, seed):
+    models, scaler = fitted_models(seed)
+    return write_model_bundle(directory, models, scaler, FEATURES, {'random_forest': 1.0})
+
+
+def test_publish_swaps_a_symlink_and_prunes_old_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_bundle, 'KEEP_VERSIONS', 2)
+    directory = str(tmp_path / 'model_bundle')
+
+    manifests = [publish(directory, seed) for seed in range(4)]
+
+    assert os.path.islink(directory)
+    assert read_manifest(directory)['version'] == manifests[-1]['version']
+    versions = sorted(name for name in os.listdir(directory + VERSIONS_SUFFIX) if not name.startswith('.'))
+    assert versions == sorted(m['version'] for m in manifests[-2:])
+    assert not [name for name in os.listdir(tmp_path) if '.link-' in name]
+
+
+def test_readers_never_see_a_missing_bundle_while_publishing(tmp_path):
+    directory = str(tmp_path / 'model_bundle')
+    publish(directory, 0)
+    candidates = [fitted_models(seed) for seed in range(1, 4)]
+
+    errors = []
+    loads = [0]
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                bundle = load_model_bundle(directory)
+                bundle.load_reference('random_forest')
+                loads[0] += 1
+            except (ModelBundleError, OSError) as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for models, scaler in candidates:
+            write_model_bundle(directory, models, scaler, FEATURES, {'random_forest': 1.0})
+    finally:
+        done.set()
+        thread.join()
+
+    assert loads[0] > 0
+    assert errors == []
+
+
+def test_loaded_bundle_keeps_reading_its_own_version(tmp_path):
+    directory = str(tmp_path / 'model_bundle')
+    first = publish(directory, 0)
+    bundle = load_model_bundle(directory)
+    publish(directory, 1)
+
+    assert bundle.version == first['version']
+    assert read_manifest(bundle.directory)['version'] == first['version']
+    bundle.load_reference('random_forest')
+
+
+def test_plain_directory_from_an_older_deployment_is_converted(tmp_path):
+    directory = str(tmp_path / 'model_bundle')
+    publish(directory, 0)
+    target = os.path.realpath(directory)
+    os.remove(directory)
+    os.rename(target, directory)
+    assert os.path.isfile(os.path.join(directory, BUNDLE_MANIFEST))
+
+    manifest = publish(directory, 1)
+
+    assert os.path.islink(directory)
+    assert load_model_bundle(directory).version == manifest['version']
+
+
+def test_tampered_bundle_is_rejected(tmp_path):
+    directory = str(tmp_path / 'model_bundle')
+    publish(directory, 0)
+    with open(os.path.join(directory, 'scaler', 'mean.npy'), 'ab') as f:
+        f.write(b'\0')
+
+    with pytest.raises(ModelBundleError, match='Checksum'):
+        load_model_bundle(directory)
+
+
+def publish_trained_on_schema(directory, **kwargs):
+    models, scaler = fitted_models(0, len(tx_features.MODEL_FEATURES))
+    return write_model_bundle(directory, models, scaler, list(tx_features.MODEL_FEATURES), {}, **kwargs)
+
+
+def test_manifest_records_the_feature_definitions(tmp_path):
+    manifest = publish_trained_on_schema(str(tmp_path / 'model_bundle'))
+
+    definitions = manifest['feature_schema']['definitions']
+    assert definitions == tx_features.schema_definitions(tx_features.MODEL_FEATURES)
+    # Features the model columns are computed from are covered too
+    assert 'intrinsicGas' in definitions
+    load_model_bundle(str(tmp_path / 'model_bundle'))
+
+
+def test_changed_transform_is_rejected(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'model_bundle')
+    publish_trained_on_schema(directory)
+
+    # Same names, different semantics: the name hash alone would accept this bundle
+    schema = tuple(
+        feature._replace(transform='gas') if feature.name == 'gasUsed' else feature
+        for feature in tx_features.SCHEMA
+    )
+    monkeypatch.setattr(tx_features, 'SCHEMA', schema)
+
+    with pytest.raises(ModelBundleError, match='gasUsed'):
+        load_model_bundle(directory)
+
+
+def test_changed_dtype_of_an_upstream_feature_is_rejected(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'model_bundle')
+    publish_trained_on_schema(directory)
+
+    schema = tuple(
+        feature._replace(dtype='float64') if feature.name == 'intrinsicGas' else feature
+        for feature in tx_features.SCHEMA
+    )
+    monkeypatch.setattr(tx_features, 'SCHEMA', schema)
+
+    with pytest.raises(ModelBundleError, match='intrinsicGas'):
+        load_model_bundle(directory)
+
+
+def test_bundle_without_definitions_loads_with_a_warning(tmp_path, caplog):
+    directory = str(tmp_path / 'model_bundle')
+    publish_trained_on_schema(directory)
+    path = os.path.join(directory, BUNDLE_MANIFEST)
+    with open(path) as f:
+        manifest = json.load(f)
+    del manifest['feature_schema']['definitions']
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+
+    with caplog.at_level(logging.WARNING, logger='model_bundle'):
+        load_model_bundle(directory)
+    assert 'does not record its feature definitions' in caplog.text
+
+
+def test_migrated_loose_models_are_not_marked_verified(tmp_path, caplog):
+    import joblib
+
+    models, scaler = fitted_models(0, len(tx_features.MODEL_FEATURES))
+    for name, fname in LEGACY_MODEL_FILES.items():
+        joblib.dump(scaler if name == 'scaler' else models[name], tmp_path / fname)
+    with open(tmp_path / LEGACY_METADATA_FILE, 'w') as f:
+        json.dump({'feature_names': list(tx_features.MODEL_FEATURES), 'ensemble_weights': {}}, f)
+
+    directory = str(tmp_path / 'model_bundle')
+    manifest = migrate_legacy_models(directory, source_dir=str(tmp_path))
+
+    assert manifest['feature_schema']['definitions'] is None
+    with caplog.at_level(logging.WARNING, logger='model_bundle'):
+        load_model_bundle(directory)
+    assert 'does not record its feature definitions' in caplog.text
@@ -0,0 +1,129 @@
+import sys
+import threading
+
+import pytest
+
+from rate_limiter import TokenBucketLimiter, parse_limits, retry_after_header
+
+
+def test_fresh_client_gets_exactly_its_burst():
+    limiter = TokenBucketLimiter(100, 60, burst=10)
+    assert [limiter.acquire('a', now=0.0)[0] for _ in range(12)] == [True] * 10 + [False] * 2
+    # Buckets are per client
+    assert limiter.acquire('b', now=0.0) == (True, 0.0)
+
+
+def test_burst_defaults_to_max_requests():
+    limiter = TokenBucketLimiter(5, 60)
+    assert sum(limiter.acquire('a', now=0.0)[0] for _ in range(20)) == 5
+
+
+def test_tokens_refill_at_max_requests_per_window():
+    limiter = TokenBucketLimiter(60, 60, burst=1)          # one token per second
+    assert limiter.acquire('a', now=0.0)[0]
+    assert not limiter.acquire('a', now=0.5)[0]
+    assert limiter.acquire('a', now=1.0)[0]
+
+    # Refill stops at the burst however long the client was idle
+    limiter = TokenBucketLimiter(60, 60, burst=3)
+    for _ in range(3):
+        limiter.acquire('a', now=0.0)
+    assert sum(limiter.acquire('a', now=1000.0)[0] for _ in range(10)) == 3
+
+
+def test_steady_rate_is_exact_over_a_long_run():
+    limiter = TokenBucketLimiter(100, 60)
+    # 100 req/s for 600 s against 100 / 60 s: the burst plus 599.99 s of refill
+    admitted = sum(limiter.acquire('a', now=t * 0.01)[0] for t in range(60000))
+    assert admitted == 100 + int(599.99 * 100 / 60)
+
+
+def test_no_double_burst_across_a_window_edge():
+    limiter = TokenBucketLimiter(100, 60)
+    limiter.acquire('edge', now=0.0)
+    admitted = sum(limiter.acquire('edge', now=59.999)[0] for _ in range(200)) + \
+        sum(limiter.acquire('edge', now=60.001)[0] for _ in range(200))
+    assert admitted == 100
+
+
+def test_retry_after_is_the_time_to_the_next_token():
+    limiter = TokenBucketLimiter(10, 60, burst=2)          # a token every 6 s
+    limiter.acquire('a', now=0.0)
+    limiter.acquire('a', now=0.0)
+
+    allowed, retry_after = limiter.acquire('a', now=1.5)
+    assert not allowed
+    assert retry_after == pytest.approx(4.5)
+    assert retry_after_header(retry_after) == '5'
+
+    assert not limiter.acquire('a', now=1.5 + retry_after - 0.01)[0]
+    assert limiter.acquire('a', now=1.5 + retry_after + 1e-9)[0]
+
+    # A client that waits out the header is admitted
+    allowed, retry_after = limiter.acquire('a', now=7.0)
+    assert not allowed
+    assert limiter.acquire('a', now=7.0 + int(retry_after_header(retry_after)))[0]
+
+
+@pytest.mark.parametrize('seconds, header', [(0.0, '1'), (0.001, '1'), (1.0, '1'), (1.01, '2'), (59.5, '60')])
+def test_retry_after_header_rounds_up_to_whole_seconds(seconds, header):
+    assert retry_after_header(seconds) == header
+
+
+def test_lru_bound_forgets_the_least_recently_seen_client():
+    limiter = TokenBucketLimiter(10, 60, burst=1, max_clients=3, shards=1)
+    for client in ('a', 'b', 'c'):
+        limiter.acquire(client, now=0.0)
+    limiter.acquire('a', now=0.1)                         # refused, but seen: 'b' is now the oldest
+
+    limiter.acquire('d', now=0.2)
+
+    stats = limiter.stats()
+    assert (stats['clients'], stats['max_clients'], stats['evictions']) == (3, 3, 1)
+    assert limiter.acquire('c', now=0.3)[0] is False      # kept: still has no token
+    assert limiter.acquire('b', now=0.3)[0] is True       # forgotten: starts with a full bucket
+
+
+def test_flood_of_distinct_clients_stays_at_the_bound():
+    limiter = TokenBucketLimiter(10, 60, max_clients=1000, shards=16)
+    for i in range(20000):
+        limiter.acquire(f'10.0.{i // 256}.{i % 256}:{i}', now=i * 1e-3)
+
+    stats = limiter.stats()
+    assert stats['clients'] <= stats['max_clients'] == 1008      # 16 shards of ceil(1000 / 16)
+    assert all(len(buckets) <= limiter._per_shard for buckets in limiter._buckets)
+    assert stats['evictions'] == 20000 - stats['clients']
+
+
+def test_counters_do_not_lose_updates_under_contention():
+    limiter = TokenBucketLimiter(10, 10**6, burst=10, max_clients=64, shards=4)
+    threads, per_thread = 16, 4000
+    barrier = threading.Barrier(threads)
+
+    def hammer(n):
+        barrier.wait()
+        for i in range(per_thread):
+            limiter.acquire(f'client-{(n * per_thread + i) % 200}')
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=hammer, args=(n,)) for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    stats = limiter.stats()
+    assert stats['allowed'] + stats['limited'] == threads * per_thread
+    assert stats['clients'] <= stats['max_clients']
+
+
+def test_parse_limits():
+    assert parse_limits('predict=200/60, get_reports=50/60:10,,bad,also=bad/x') == {
+        'predict': (200, 60.0, None),
+        'get_reports': (50, 60.0, 10)
+    }
+    assert parse_limits(None) == {}
@@ -0,0 +1,75 @@
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from rolling_stats import IndexableSkiplist, RollingPercentile
+
+STREAM_LENGTH = 7000
+
+
+def reference_step(history, gas_price):
+    # AdvancedFeatureExtractor._extract_temporal_features before RollingPercentile
+    history.append(gas_price)
+    percentile = 50
+    if len(history) > 10:
+        sorted_prices = sorted(history)
+        try:
+            percentile = (sorted_prices.index(gas_price) / len(sorted_prices)) * 100
+        except ValueError:
+            percentile = 50
+    return percentile, abs(gas_price - np.mean(list(history)))
+
+
+def rolling_step(rolling, gas_price):
+    rolling.append(gas_price)
+    percentile = rolling.percentile(gas_price) if len(rolling) > 10 else 50
+    return percentile, abs(gas_price - rolling.mean())
+
+
+def make_stream(name, seed=3):
+    rng = random.Random(seed)
+    if name == 'uniform wei':
+        return [rng.randint(1, 300) * 10**9 + rng.randint(0, 10**6) for _ in range(STREAM_LENGTH)]
+    if name == 'heavy duplicates':
+        return [rng.choice([1, 2, 5, 20, 100]) * 10**9 for _ in range(STREAM_LENGTH)]
+    return [int(rng.lognormvariate(23, 1.2)) for _ in range(STREAM_LENGTH)]
+
+
+@pytest.mark.parametrize('window', [10, 1000, pytest.param(5000, marks=pytest.mark.slow)])
+@pytest.mark.parametrize('stream_name', ['uniform wei', 'heavy duplicates', 'bursty'])
+def test_matches_sort_per_request_semantics(stream_name, window):
+    history = deque(maxlen=window)
+    rolling = RollingPercentile(window)
+
+    for gas_price in make_stream(stream_name):
+        p_ref, d_ref = reference_step(history, gas_price)
+        p_new, d_new = rolling_step(rolling, gas_price)
+        assert p_new == p_ref
+        # np.mean sums in float, the running sum is exact: only rounding may differ
+        assert abs(d_new - d_ref) <= 1e-9 * max(d_ref, 1.0)
+
+    assert list(rolling._sorted) == sorted(history)
+    assert len(rolling) == len(history)
+
+
+def test_skiplist_rank_and_remove_with_duplicates():
+    skiplist = IndexableSkiplist(expected_size=16)
+    values = [5, 1, 5, 3, 5, 2]
+    for value in values:
+        skiplist.insert(value)
+
+    assert list(skiplist) == sorted(values)
+    assert [skiplist.rank(v) for v in (0, 1, 3, 5, 6)] == [0, 0, 2, 3, 6]
+
+    skiplist.remove(5)
+    assert list(skiplist) == [1, 2, 3, 5, 5]
+    with pytest.raises(KeyError):
+        skiplist.remove(4)
+
+
+def test_empty_window():
+    rolling = RollingPercentile(3)
+    assert rolling.percentile(10) == 0.0
+    assert rolling.mean() == 0.0
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from block_fetcher import BlockFetcher, LocalRpcServer, synthetic_chain
+from rpc_pool import RpcPool
+
+DEAD_URL = 'http://127.0.0.1:9/'
+SAMPLE_INTERVAL = 0.05
+
+
+@pytest.fixture(scope='module')
+def chain():
+    return synthetic_chain(1200, mean_transactions=4)
+
+
+@pytest.fixture(scope='module')
+def converged(chain):
+    """The rpc_pool.py setup: A 429s above 4 in flight, B slows with load and 429s above 10, C is down"""
+    first = int(chain['blocks'][0]['number'], 16)
+    end = first + len(chain['blocks'])
+    node_a = LocalRpcServer(chain, latency=0.02, max_concurrent=4, retry_after=0)
+    node_b = LocalRpcServer(chain, latency=0.04, load_latency=0.004, max_concurrent=10, retry_after=0)
+
+    with node_a, node_b:
+        pool = RpcPool([node_a.url, node_b.url, DEAD_URL])
+        samples = []
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(SAMPLE_INTERVAL):
+                samples.append([endpoint.limit for endpoint in pool.endpoints])
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            fetcher = BlockFetcher(pool, concurrency=pool.max_concurrency, blocks_per_request=2)
+            blocks = list(fetcher.iter_blocks(first, end))
+        finally:
+            stop.set()
+            sampler.join()
+
+    return {
+        'blocks': [number for number, _, _ in blocks],
+        'expected_blocks': list(range(first, end)),
+        'nodes': (node_a, node_b),
+        # Second half of the run: past the initial climb from RPC_INITIAL_CONCURRENCY
+        'settled': samples[len(samples) // 2:],
+        'stats': pool.stats()
+    }
+
+
+def test_scan_completes_in_order(converged):
+    assert converged['blocks'] == converged['expected_blocks']
+    assert converged['stats']['failures'] == 0
+
+
+@pytest.mark.parametrize('index', [0, 1], ids=['A', 'B'])
+def test_limit_settles_at_the_node_capacity(converged, index):
+    capacity = converged['nodes'][index].max_concurrent
+    limits = [sample[index] for sample in converged['settled']]
+    assert limits
+
+    mean = sum(limits) / len(limits)
+    # AIMD oscillates around the knee: on average at or below it, in use, and no runaway peaks
+    assert capacity / 2 <= mean <= capacity + 1
+    assert max(limits) <= 1.5 * capacity + 1
+
+
+def test_dead_endpoint_gets_next_to_no_traffic(converged):
+    stats = converged['stats']
+    dead = next(e for e in stats['endpoints'] if e['url'] == DEAD_URL)
+    assert dead['requests'] == dead['errors']
+    # Exponential cooldown: a handful of probes over the whole scan
+    assert dead['requests'] <= 0.01 * stats['requests']
+
+
+def test_throttled_share_stays_low(converged):
+    node_a, node_b = converged['nodes']
+    assert (node_a.throttled + node_b.throttled) / converged['stats']['requests'] < 0.10
@@ -0,0 +1,151 @@
+"""
+Shared feature / detector / rate-limiter state under 64 concurrent clients
+against a single-threaded replay of the same transactions.
+"""
+
+import bisect
+import random
+import sys
+import threading
+from collections import defaultdict
+
+import pytest
+
+CLIENTS = 64
+PER_CLIENT = 120
+TOTAL = CLIENTS * PER_CLIENT
+
+
+def make_transactions(total, seed=19):
+    rng = random.Random(seed)
+    senders = [f'0x{rng.getrandbits(160):040x}' for _ in range(2000)]
+    transactions = []
+    for i in range(total):
+        # Hot senders contend on the same shard; whole-ETH values keep every sum exact
+        transactions.append({
+            'hash': f'0x{i:064x}',
+            'from': senders[min(int(rng.paretovariate(1.1)), len(senders)) - 1],
+            'to': None if rng.random() < 0.02 else '0x' + '2' * 40,
+            'value': str(rng.randint(0, 50) * 10**18),
+            'gasPrice': str(rng.randint(1, 300) * 10**9),
+            'gasLimit': str(rng.choice([21000, 51000, 100000, 250000])),
+            'data': '0x' + ''.join(rng.choice('0123456789abcdef') for _ in range(rng.choice([0, 8, 72, 136])))
+        })
+    return transactions
+
+
+def run_concurrently(target, clients):
+    """Start every client together; a short switch interval forces interleaving"""
+    barrier = threading.Barrier(clients)
+    errors = []
+
+    def client(n):
+        barrier.wait()
+        try:
+            target(n)
+        except Exception as e:
+            errors.append(repr(e))
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    return errors
+
+
+@pytest.fixture(scope='module')
+def states(sentinel):
+    transactions = make_transactions(TOTAL)
+
+    def run(extractor, detector, indices, out):
+        for i in indices:
+            features = extractor.extract_comprehensive_features(transactions[i])
+            detector.predict(features)
+            out[i] = features
+
+    replay = (sentinel.AdvancedFeatureExtractor(gas_price_window=TOTAL), sentinel.AnomalyDetector(), [None] * TOTAL)
+    run(replay[0], replay[1], range(TOTAL), replay[2])
+
+    concurrent = (sentinel.AdvancedFeatureExtractor(gas_price_window=TOTAL), sentinel.AnomalyDetector(), [None] * TOTAL)
+    errors = run_concurrently(
+        lambda n: run(concurrent[0], concurrent[1], range(n, TOTAL, CLIENTS), concurrent[2]), CLIENTS
+    )
+    return transactions, replay, concurrent, errors
+
+
+def test_no_client_failed(states):
+    _, _, (_, _, features), errors = states
+    assert errors == []
+    assert all(row is not None for row in features)
+
+
+def test_per_sender_counters_match_replay(states):
+    transactions, (replay_extractor, _, _), (extractor, _, features), _ = states
+
+    seen = defaultdict(list)
+    for i, row in enumerate(features):
+        seen[transactions[i]['from']].append(row['from_tx_count'])
+
+    for address in set(tx['from'] for tx in transactions):
+        expected = replay_extractor.address_patterns.get(address)
+        got = extractor.address_patterns.get(address)
+        for column in ('tx_count', 'total_value', 'contract_interactions'):
+            assert got[column] == expected[column], (address, column)
+        # Each sender saw tx_count 1..n exactly once: no lost or doubled read-modify-write
+        assert sorted(seen[address]) == list(range(1, expected['tx_count'] + 1)), address
+
+
+def test_gas_price_window_matches_replay(states):
+    _, (replay_extractor, _, _), (extractor, _, _), _ = states
+    window, replay_window = extractor.gas_price_history, replay_extractor.gas_price_history
+
+    ordered = list(window._sorted)
+    assert ordered == list(replay_window._sorted)
+    assert window._sum == replay_window._sum
+    assert ordered == sorted(window._order)
+    # Link widths drive the percentile: every rank must match a bisect of the sorted window
+    assert all(window.rank(value) == bisect.bisect_left(ordered, value) for value in set(ordered))
+
+
+def test_value_histograms_match_replay(states):
+    _, (replay_extractor, _, _), (extractor, _, _), _ = states
+    assert extractor.value_patterns.stats() == replay_extractor.value_patterns.stats()
+
+
+def test_detector_statistics_match_replay(states):
+    _, (_, replay_detector, _), (_, detector, _), _ = states
+
+    for feature, expected in replay_detector.feature_stats.items():
+        got = detector.feature_stats[feature]
+        assert got['count'] == expected['count'] == TOTAL
+        # The mean only differs by summation order (the std update depends on order by design)
+        assert got['mean'] == pytest.approx(expected['mean'], rel=1e-9)
+
+
+def test_rate_limiter_admits_exactly_its_burst(sentinel, monkeypatch):
+    # Private registry: the throwaway endpoint must not show up in the live /analytics limits
+    live = sentinel.rate_limiters
+    monkeypatch.setattr(sentinel, 'rate_limiters', {})
+    allowed = []
+
+    def stress_endpoint():
+        allowed.append(1)
+        return 'ok'
+
+    limit = TOTAL // 4
+    limited_endpoint = sentinel.rate_limit(max_requests=limit, window=10**9)(stress_endpoint)
+
+    def hammer(n):
+        with sentinel.app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.19'}):
+            for _ in range(PER_CLIENT):
+                limited_endpoint()
+
+    assert run_concurrently(hammer, CLIENTS) == []
+    assert len(allowed) == limit
+    assert 'stress_endpoint' not in live
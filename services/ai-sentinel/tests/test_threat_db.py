@@ -0,0 +1,641 @@
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pytest
+
+import threat_db
+from threat_db import DatabaseManager
+
+
+@dataclass
+class Prediction:
+    model_name: str
+    confidence: float
+    threat_category: str
+    threat_level: int
+    reasoning: str
+    feature_importance: dict = field(default_factory=dict)
+
+
+@dataclass
+class Result:
+    final_confidence: float
+    threat_category: str
+    threat_level: int
+    is_malicious: bool
+    individual_predictions: list
+
+
+CATEGORIES = ['NORMAL', 'NORMAL', 'FRONT_RUNNING', 'PHISHING_CONTRACT', 'RUG_PULL']
+
+
+def make_report(rng, tx_hash=None, sender=None):
+    """(tx_hash, result, features, sender) shaped like a /predict report"""
+    confidence = rng.random() * 100
+    category = rng.choice(CATEGORIES)
+    result = Result(confidence, category, int(confidence // 25), confidence > 70,
+                    [Prediction('rule_based', rng.random() * 100, category, 0, 'Normal transaction', {'value': 0.1})])
+    features = {'gas_price_gwei': rng.randint(1, 300) + rng.random(), 'value_eth': rng.random() * 10,
+                'function_signature': rng.choice(['', '0xa9059cbb', '0x095ea7b3'])}
+    return (tx_hash or f'0x{rng.getrandbits(256):064x}', result, features,
+            sender or f'0x{rng.getrandbits(160):040x}')
+
+
+@pytest.fixture
+def rng():
+    return random.Random(16)
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """DatabaseManager factory on a scratch file; every store is closed at teardown"""
+    stores = []
+
+    def open_(name='threats.db', **kwargs):
+        kwargs.setdefault('retention_days', 0)
+        store = DatabaseManager(str(tmp_path / name), **kwargs)
+        stores.append(store)
+        return store
+
+    yield open_
+    for store in stores:
+        store.close()
+
+
+def stored_rows(store):
+    conn = store._read_connection()
+    return sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in store.partitions(conn))
+
+
+def store_all(store, reports):
+    return [store.store_threat_report(tx_hash, result, features, from_address=sender)
+            for tx_hash, result, features, sender in reports]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def record_batches(store, monkeypatch, gate=None):
+    """Record the size of every batch the writer inserts; with a gate, the first batch waits for it"""
+    sizes, entered = [], threading.Event()
+    real = store._insert
+
+    def insert(conn, reports):
+        sizes.append(len(reports))
+        entered.set()
+        if gate is not None:
+            gate.wait(10)
+        return real(conn, reports)
+
+    monkeypatch.setattr(store, '_insert', insert)
+    return sizes, entered
+
+
+# --- Write-behind queue ---
+
+def test_full_queue_drops_new_reports_under_the_drop_policy(open_store, rng, monkeypatch):
+    store = open_store(queue_size=5, batch_size=1, full_policy='drop')
+    gate = threading.Event()
+    _, entered = record_batches(store, monkeypatch, gate)
+
+    assert store_all(store, [make_report(rng)]) == [True]
+    assert entered.wait(5)                       # the writer holds one report and is stuck on disk
+    assert store_all(store, [make_report(rng) for _ in range(7)]) == [True] * 5 + [False] * 2
+
+    stats = store.stats()
+    assert (stats['enqueued'], stats['dropped'], stats['max_queue_depth']) == (6, 2, 5)
+    gate.set()
+    assert store.flush()
+    assert stored_rows(store) == 6
+
+
+def test_full_queue_blocks_then_drops_under_the_block_policy(open_store, rng, monkeypatch):
+    monkeypatch.setattr(threat_db, 'DB_BLOCK_MS', 100)
+    store = open_store(queue_size=2, batch_size=1, full_policy='block')
+    gate = threading.Event()
+    _, entered = record_batches(store, monkeypatch, gate)
+    store_all(store, [make_report(rng)])
+    assert entered.wait(5)
+    assert store_all(store, [make_report(rng) for _ in range(2)]) == [True, True]
+
+    # Still full after DB_BLOCK_MS: dropped, but only after waiting for it
+    started = time.perf_counter()
+    assert store_all(store, [make_report(rng)]) == [False]
+    assert time.perf_counter() - started >= 0.09
+
+    # Space frees up within DB_BLOCK_MS: the request waits and the report is kept
+    threading.Timer(0.03, gate.set).start()
+    assert store_all(store, [make_report(rng)]) == [True]
+
+    assert store.flush()
+    stats = store.stats()
+    assert (stats['written'], stats['dropped']) == (4, 1)
+    assert stored_rows(store) == 4
+
+
+def test_close_drains_the_queue_and_stops_the_writer(open_store, rng):
+    # A window far longer than the test: only close() can commit these
+    store = open_store(batch_size=1000, batch_ms=60000)
+    store_all(store, [make_report(rng) for _ in range(25)])
+
+    store.close()
+
+    assert not store._writer.is_alive()
+    assert stored_rows(store) == 25
+    assert store.stats()['written'] == 25
+
+
+def test_batches_close_at_batch_size_rows(open_store, rng, monkeypatch):
+    store = open_store(batch_size=10, batch_ms=60000)
+    sizes, _ = record_batches(store, monkeypatch)
+
+    store_all(store, [make_report(rng) for _ in range(35)])
+    assert wait_for(lambda: stored_rows(store) == 30)
+    assert sizes == [10, 10, 10]                 # the last 5 wait for a full batch or the window
+
+    assert store.flush()
+    assert sizes == [10, 10, 10, 5]
+    stats = store.stats()
+    assert (stats['written'], stats['batches'], stats['avg_batch_size']) == (35, 4, 8.75)
+
+
+def test_batches_close_after_batch_ms(open_store, rng, monkeypatch):
+    store = open_store(batch_size=1000, batch_ms=100)
+    sizes, _ = record_batches(store, monkeypatch)
+
+    store_all(store, [make_report(rng) for _ in range(3)])
+    # No flush: the window closing on its own commits the batch
+    assert wait_for(lambda: stored_rows(store) == 3)
+    store_all(store, [make_report(rng) for _ in range(2)])
+    assert wait_for(lambda: stored_rows(store) == 5)
+
+    assert sizes == [3, 2]
+
+
+def test_synchronous_mode_writes_on_the_request_thread(open_store, rng):
+    store = open_store(write_behind=False)
+    assert store_all(store, [make_report(rng) for _ in range(3)]) == [True] * 3
+    assert stored_rows(store) == 3
+    assert store._writer is None
+
+
+def test_unknown_full_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        DatabaseManager(str(tmp_path / 'threats.db'), full_policy='wait')
+
+
+# --- Daily partitions: one report per hash, migration ---
+
+DAY = 86400
+
+
+def insert_at(store, timestamp, reports):
+    """Write reports stamped `timestamp` synchronously, as the writer would"""
+    with store._get_connection() as conn:
+        return store._insert(conn, [(tx_hash, timestamp, result, features, None, None, None, sender)
+                                    for tx_hash, result, features, sender in reports])
+
+
+def assert_rollups_match_rows(store, window=60 * DAY):
+    rolled, scanned = store.recent_statistics(window), store._scan_statistics(window)
+    assert [r['threat_category'] for r in rolled] == [r['threat_category'] for r in scanned]
+    for r, s in zip(rolled, scanned):
+        assert (r['category_count'], r['malicious_count']) == (s['category_count'], s['malicious_count'])
+        assert r['avg_confidence'] == pytest.approx(s['avg_confidence'], rel=1e-9)
+
+
+def partition_counts(store):
+    conn = store._read_connection()
+    return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in store.partitions(conn)}
+
+
+def test_hash_resubmitted_on_a_later_day_replaces_its_report(open_store, rng):
+    store = open_store(write_behind=False)
+    now = int(time.time())
+    first = [make_report(rng) for _ in range(50)]
+    insert_at(store, now - 3 * DAY, first)
+    # 20 of them come back two days later with new verdicts
+    again = [make_report(rng, tx_hash=tx_hash, sender=sender) for tx_hash, _, _, sender in first[:20]]
+    insert_at(store, now - DAY, again)
+
+    assert stored_rows(store) == 50
+    assert sorted(partition_counts(store).values()) == [20, 30]
+    for tx_hash, result, _, _ in again:
+        report = store.get_report(tx_hash)
+        assert (report['timestamp'], report['confidence']) == (now - DAY, result.final_confidence)
+    reports, _ = store.query_reports(limit=1000)
+    assert len({r['tx_hash'] for r in reports}) == len(reports) == 50
+    assert sum(r['category_count'] for r in store.recent_statistics(7 * DAY)) == 50
+    assert_rollups_match_rows(store)
+
+
+def test_duplicates_within_a_batch_spanning_midnight(open_store, rng):
+    store = open_store(write_behind=False)
+    midnight = int(time.time()) // DAY * DAY
+    tx_hash, _, _, sender = report = make_report(rng)
+    late = make_report(rng, tx_hash=tx_hash, sender=sender)
+    with store._get_connection() as conn:
+        written = store._insert(conn, [
+            (tx_hash, midnight - 1, report[1], report[2], None, None, None, sender),
+            (tx_hash, midnight, late[1], late[2], None, None, None, sender),
+            (None, midnight, late[1], late[2], None, None, None, sender),
+            (None, midnight, late[1], late[2], None, None, None, sender),
+        ])
+
+    # The last report for the hash wins; reports without a hash never replace each other
+    assert written == stored_rows(store) == 3
+    assert store.get_report(tx_hash)['confidence'] == late[1].final_confidence
+    assert_rollups_match_rows(store)
+
+
+def test_opening_an_unindexed_database_removes_older_duplicates(open_store, rng, tmp_path):
+    store = open_store('old.db', write_behind=False)
+    now = int(time.time())
+    reports = [make_report(rng) for _ in range(30)]
+    insert_at(store, now - 2 * DAY, reports)
+    insert_at(store, now, [make_report(rng, tx_hash=h, sender=s) for h, _, _, s in reports[:10]])
+    # What an older version left behind: no hash index, the same hash in two partitions, rollups counting both
+    with store._get_connection() as conn:
+        today = store.partitions(conn)[-1]
+        columns = ', '.join(c[1] for c in conn.execute(f'PRAGMA table_info({today})') if c[1] != 'id')
+        conn.execute(f'INSERT INTO {store.partitions(conn)[0]} ({columns}) SELECT {columns} FROM {today}')
+        conn.execute('DROP TABLE report_hashes')
+        store._rebuild_rollups(conn)
+        conn.commit()
+    assert stored_rows(store) == 40
+
+    reopened = open_store('old.db', write_behind=False)
+
+    assert stored_rows(reopened) == 30
+    assert partition_counts(reopened)[today] == 10
+    assert_rollups_match_rows(reopened)
+    # and new reports keep replacing across days
+    insert_at(reopened, now, [make_report(rng, tx_hash=h, sender=s) for h, _, _, s in reports[10:15]])
+    assert stored_rows(reopened) == 30
+    assert_rollups_match_rows(reopened)
+
+
+def test_retention_forgets_the_dropped_days_hashes(open_store, rng):
+    store = open_store(write_behind=False, retention_days=3)
+    now = int(time.time())
+    old = [make_report(rng) for _ in range(5)]
+    insert_at(store, now - 10 * DAY, old)
+    insert_at(store, now, [make_report(rng)])       # a new day's partition triggers retention
+
+    conn = store._read_connection()
+    assert len(store.partitions(conn)) == 1
+    assert conn.execute('SELECT COUNT(*) FROM report_hashes').fetchone()[0] == 1
+    insert_at(store, now, old[:1])
+    assert stored_rows(store) == 2
+
+
+def build_legacy_db(path, rng, rows=3000, days=5):
+    """The single threat_reports table of earlier versions (JSON text columns), spread over `days`"""
+    import json
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE threat_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tx_hash TEXT UNIQUE,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            confidence REAL,
+            threat_category TEXT,
+            threat_level INTEGER,
+            is_malicious BOOLEAN,
+            features TEXT,
+            model_predictions TEXT,
+            model_version TEXT,
+            fingerprint TEXT,
+            verdict TEXT
+        );
+        CREATE INDEX idx_timestamp ON threat_reports(timestamp);
+    ''')
+    now = time.time()
+    for i in range(rows):
+        tx_hash, result, features, _ = make_report(rng)
+        stamp = now - (rows - i) / rows * days * DAY
+        verdict = {'danger_score': result.final_confidence, 'threat_category': result.threat_category}
+        conn.execute('''
+            INSERT INTO threat_reports (tx_hash, timestamp, confidence, threat_category, threat_level, is_malicious,
+            features, model_predictions, model_version, fingerprint, verdict) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (tx_hash, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(stamp)), result.final_confidence,
+              result.threat_category, result.threat_level, result.is_malicious, json.dumps(features),
+              json.dumps([vars(p) for p in result.individual_predictions]), 'v1', f'{rng.getrandbits(64):016x}',
+              json.dumps(verdict) if i % 2 else None))
+    conn.commit()
+    conn.row_factory = sqlite3.Row
+    legacy = [dict(row) for row in conn.execute('SELECT * FROM threat_reports')]
+    conn.close()
+    return legacy
+
+
+def test_migration_round_trips_every_report(open_store, rng, tmp_path):
+    import calendar
+    import json
+
+    legacy = build_legacy_db(str(tmp_path / 'legacy.db'), rng)
+
+    store = open_store('legacy.db', write_behind=False)
+
+    conn = store._read_connection()
+    assert not store._has_legacy_table(conn)
+    assert len(store.partitions(conn)) >= 5
+    assert stored_rows(store) == len(legacy)
+    assert conn.execute('SELECT COUNT(*) FROM report_hashes').fetchone()[0] == len(legacy)
+    for old in legacy:
+        new = store.get_report(old['tx_hash'])
+        assert new['timestamp'] == calendar.timegm(time.strptime(old['timestamp'], '%Y-%m-%d %H:%M:%S'))
+        assert new['features'] == json.loads(old['features'])
+        assert new['model_predictions'] == json.loads(old['model_predictions'])
+        assert new['verdict'] == (json.loads(old['verdict']) if old['verdict'] else None)
+        assert (new['confidence'], new['threat_category'], new['threat_level'], new['is_malicious']) == \
+            (old['confidence'], old['threat_category'], old['threat_level'], bool(old['is_malicious']))
+        assert (new['fingerprint'], new['model_version']) == (old['fingerprint'], old['model_version'])
+        assert new['gas_price_gwei'] == json.loads(old['features'])['gas_price_gwei']
+    assert_rollups_match_rows(store)
+
+    # Opening the migrated file again changes nothing
+    assert stored_rows(open_store('legacy.db', write_behind=False)) == len(legacy)
+
+
+# --- Minute rollups ---
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Wall clock pinned to the middle of a minute: rollups and the row scan see the same window"""
+    now = int(time.time()) // 60 * 60 + 30
+    monkeypatch.setattr(threat_db.time, 'time', lambda: now)
+    return now
+
+
+def insert_spread(store, rng, n, now, days):
+    """n reports with random timestamps over the last `days`, in one transaction"""
+    reports = [make_report(rng) for _ in range(n)]
+    stamps = sorted(now - rng.randrange(int(days * DAY)) for _ in range(n))
+    with store._get_connection() as conn:
+        store._insert(conn, [(tx_hash, stamp, result, features, None, None, None, sender)
+                             for stamp, (tx_hash, result, features, sender) in zip(stamps, reports)])
+    return reports
+
+
+def rollup_buckets(store):
+    return [tuple(row) for row in store._read_connection().execute(
+        'SELECT minute, threat_category, count, malicious, confidence_sum FROM report_rollups '
+        'WHERE count != 0 ORDER BY minute, threat_category'
+    )]
+
+
+@pytest.mark.parametrize('window', ['90s', '5m', '1h', '24h', '7d', '30d'])
+def test_rollups_match_the_rows_for_any_window(open_store, rng, frozen_now, window):
+    store = open_store(write_behind=False)
+    insert_spread(store, rng, 3000, frozen_now, days=8)
+    # A dense last few minutes so the short windows are not empty
+    insert_spread(store, rng, 200, frozen_now, days=600 / DAY)
+
+    seconds = threat_db.parse_window(window)
+    assert_rollups_match_rows(store, seconds)
+    assert store.recent_statistics(seconds)
+    # The merge reads whole-minute buckets of the window only
+    merged = store._read_connection().execute(
+        'SELECT COUNT(DISTINCT minute) FROM report_rollups WHERE minute >= ?', (int(frozen_now - seconds) // 60,)
+    ).fetchone()[0]
+    assert merged <= seconds // 60 + 1
+
+
+def test_rollups_follow_resubmitted_hashes_through_the_writer(open_store, rng, frozen_now):
+    store = open_store()
+    reports = [make_report(rng) for _ in range(2000)]
+    store_all(store, reports)
+    # Re-submitted with new verdicts, some twice in the same batch: the rollups must back the old ones out
+    store_all(store, [make_report(rng, tx_hash=h, sender=s) for h, _, _, s in reports[:600] + reports[:100]])
+    assert store.flush()
+
+    assert stored_rows(store) == 2000
+    assert sum(r['category_count'] for r in store.recent_statistics(3600)) == 2000
+    assert_rollups_match_rows(store, 3600)
+
+
+def test_rollups_follow_hashes_resubmitted_on_a_later_day(open_store, rng, frozen_now):
+    store = open_store(write_behind=False)
+    reports = insert_spread(store, rng, 1000, frozen_now - 3 * DAY, days=2)
+    insert_spread(store, rng, 500, frozen_now, days=1)
+    moved = [make_report(rng, tx_hash=h, sender=s) for h, _, _, s in rng.sample(reports, 300)]
+    insert_at(store, frozen_now - 3600, moved)
+
+    for window in (3600 * 2, 2 * DAY, 7 * DAY):
+        assert_rollups_match_rows(store, window)
+    assert sum(r['category_count'] for r in store.recent_statistics(2 * DAY)) == 800
+    assert sum(r['category_count'] for r in store.recent_statistics(7 * DAY)) == 1500
+
+
+def test_rebuild_reproduces_the_incremental_rollups(open_store, rng, frozen_now):
+    store = open_store(write_behind=False)
+    reports = insert_spread(store, rng, 2000, frozen_now, days=3)
+    insert_at(store, frozen_now, [make_report(rng, tx_hash=h, sender=s) for h, _, _, s in reports[::3]])
+    incremental = rollup_buckets(store)
+
+    assert store.rebuild_rollups() == len(incremental)
+
+    rebuilt = rollup_buckets(store)
+    assert [row[:4] for row in rebuilt] == [row[:4] for row in incremental]
+    assert [row[4] for row in rebuilt] == pytest.approx([row[4] for row in incremental], rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize('text, seconds', [('90s', 90), ('5m', 300), ('1h', 3600), ('7d', 604800),
+                                           ('1.5h', 5400), ('120', 120), (' 2H ', 7200)])
+def test_parse_window(text, seconds):
+    assert threat_db.parse_window(text) == seconds
+
+
+@pytest.mark.parametrize('text', ['', 'h', '5w', '-1h', '0', 'soon'])
+def test_parse_window_rejects(text):
+    with pytest.raises(ValueError):
+        threat_db.parse_window(text)
+
+
+# --- /reports: keyset pages ---
+
+@pytest.fixture(scope='module')
+def report_store(tmp_path_factory):
+    """
+    1500 reports over 5 days from a dozen senders, stamped on whole hours so
+    a dozen share each timestamp and only the id orders them
+    """
+    rng = random.Random(18)
+    store = DatabaseManager(str(tmp_path_factory.mktemp('reports') / 'threats.db'), write_behind=False,
+                            retention_days=0)
+    senders = [f'0x{rng.getrandbits(160):040x}' for _ in range(12)]
+    now = int(time.time()) // 3600 * 3600
+    rows = []
+    for _ in range(1500):
+        tx_hash, result, features, _ = make_report(rng, sender=rng.choice(senders))
+        rows.append((tx_hash, now - rng.randrange(5 * 24) * 3600, result, features, None, None, None,
+                     rng.choice(senders)))
+    with store._get_connection() as conn:
+        store._insert(conn, rows)
+    return store, senders, now
+
+
+def all_reports(store):
+    """Every stored report in /reports order: newest day first, then (timestamp, id) descending"""
+    conn = store._read_connection()
+    keyed = []
+    for table in store.partitions(conn):
+        for row in conn.execute(f'SELECT r.*, a.address FROM {table} r LEFT JOIN addresses a ON a.id = r.from_id'):
+            keyed.append(((table, row['timestamp'], row['id']), store._decode(row)))
+    return [report for _, report in sorted(keyed, key=lambda pair: pair[0], reverse=True)]
+
+
+def matches(report, category=None, malicious=None, threat_level=None, sender=None, since=None, until=None):
+    return ((category is None or report['threat_category'] == category)
+            and (malicious is None or report['is_malicious'] == malicious)
+            and (threat_level is None or report['threat_level'] == threat_level)
+            and (sender is None or report['from_address'] == sender.lower())
+            and (since is None or report['timestamp'] >= since)
+            and (until is None or report['timestamp'] < until))
+
+
+def filter_sets(senders, now):
+    return [
+        {},
+        {'category': 'RUG_PULL'},
+        {'malicious': True},
+        {'malicious': False},
+        {'threat_level': 3},
+        {'sender': senders[0]},
+        {'sender': senders[1].upper().replace('0X', '0x')},
+        # since inclusive, until exclusive, on timestamps that many reports share
+        {'since': now - 2 * DAY, 'until': now - DAY},
+        {'since': now - 36 * 3600},
+        {'until': now - 3 * DAY},
+        {'category': 'NORMAL', 'malicious': False, 'since': now - 4 * DAY},
+        {'sender': senders[2], 'malicious': True, 'until': now - 12 * 3600},
+        {'category': 'FRONT_RUNNING', 'threat_level': 2, 'sender': senders[3]},
+        {'category': 'NO_SUCH_CATEGORY'},
+        {'sender': '0x' + 'ee' * 20},
+    ]
+
+
+def walk(store, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = store.query_reports(limit=limit, cursor=cursor, detail=False, **filters)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('limit', [1, 7, 100, 1000])
+def test_pages_cover_every_match_once_in_order(report_store, limit):
+    store, senders, now = report_store
+    everything = all_reports(store)
+    assert len(store.partitions(store._read_connection())) >= 5
+
+    for filters in filter_sets(senders, now):
+        expected = [r['tx_hash'] for r in everything if matches(r, **filters)]
+        if limit == 1 and len(expected) > 200:
+            continue
+        pages = walk(store, limit, **filters)
+
+        assert [r['tx_hash'] for page in pages for r in page] == expected, filters
+        assert all(len(page) == limit for page in pages[:-1]), filters
+        assert 0 < len(pages[-1]) <= limit or expected == [], filters
+
+
+def test_pages_do_not_shift_when_newer_reports_arrive(tmp_path, rng):
+    store = DatabaseManager(str(tmp_path / 'threats.db'), write_behind=False, retention_days=0)
+    now = int(time.time())
+    insert_at(store, now - 2 * DAY, [make_report(rng) for _ in range(30)])
+    insert_at(store, now - DAY, [make_report(rng) for _ in range(30)])
+    expected = [r['tx_hash'] for r in all_reports(store)]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.query_reports(limit=8, cursor=cursor)
+        seen.extend(r['tx_hash'] for r in page)
+        # Newer reports land ahead of the cursor, OFFSET would have shifted the next page
+        insert_at(store, now, [make_report(rng) for _ in range(5)])
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_iter_reports_streams_the_same_rows(report_store):
+    store, senders, now = report_store
+    filters = {'malicious': True, 'since': now - 3 * DAY}
+    expected = [r for r in all_reports(store) if matches(r, **filters)]
+
+    assert list(store.iter_reports(page_size=50, **filters)) == expected
+    assert list(store.iter_reports(page_size=50, max_rows=73, **filters)) == expected[:73]
+    first, cursor = store.query_reports(limit=20, **filters)
+    assert first + list(store.iter_reports(page_size=9, cursor=cursor, **filters)) == expected
+
+
+@pytest.mark.parametrize('cursor', ['nonsense', '2024013.1.2', '20240131.x.2', '20240131.1'])
+def test_invalid_cursor(report_store, cursor):
+    with pytest.raises(ValueError):
+        report_store[0].query_reports(cursor=cursor)
+
+
+@pytest.fixture
+def reports_client(sentinel, report_store, monkeypatch):
+    monkeypatch.setattr(sentinel, 'db_manager', report_store[0])
+    client = sentinel.app.test_client()
+    # Its own client address: the /reports limiter is shared by the whole session
+    client.environ_base['REMOTE_ADDR'] = f'10.18.0.{random.randrange(1, 250)}'
+    return client
+
+
+def test_reports_endpoint_pages_with_next_cursor(reports_client, report_store):
+    store, senders, now = report_store
+    expected = [r for r in all_reports(store) if matches(r, category='NORMAL', since=now - 2 * DAY)]
+    query = {'category': 'NORMAL', 'since': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now - 2 * DAY)),
+             'limit': 250}
+
+    got, cursor = [], None
+    while True:
+        body = reports_client.get('/reports', query_string=dict(query, cursor=cursor) if cursor else query).get_json()
+        assert body['count'] == len(body['reports'])
+        got.extend(body['reports'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert got == expected
+
+
+def test_reports_endpoint_streams_ndjson(reports_client, report_store):
+    import json
+
+    store, senders, now = report_store
+    expected = [r for r in all_reports(store) if matches(r, malicious=True)]
+
+    response = reports_client.get('/reports', query_string={'format': 'ndjson', 'malicious': '1'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == expected
+
+    response = reports_client.get('/reports', query_string={'format': 'ndjson', 'sender': senders[4],
+                                                            'detail': '0', 'limit': '5'})
+    streamed = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['tx_hash'] for r in streamed] == [r['tx_hash'] for r in all_reports(store)
+                                                if matches(r, sender=senders[4])][:5]
+    assert all('features' not in r for r in streamed)
+
+
+@pytest.mark.parametrize('query', [{'cursor': 'nonsense'}, {'limit': '0'}, {'limit': '1001'}, {'malicious': 'maybe'},
+                                   {'threat_level': 'high'}, {'since': 'yesterday'}])
+def test_reports_endpoint_rejects_bad_parameters(reports_client, query):
+    response = reports_client.get('/reports', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'invalid_input'
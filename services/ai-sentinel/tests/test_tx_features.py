@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tx_features import (
+    MODEL_FEATURES, PIPELINE, monitor_json, rpc_json, synthetic_transactions, transaction_record
+)
+
+N_TRANSACTIONS = 2000
+
+
+@pytest.fixture(scope='module')
+def chain():
+    return synthetic_transactions(N_TRANSACTIONS)[0]
+
+
+@pytest.fixture(scope='module')
+def training(chain, tmp_path_factory):
+    """Collection -> CSV -> the trainer's own loading code, as advanced_trainer.py runs it"""
+    from advanced_trainer import CerberusAdvancedTrainer
+
+    _, receipts = synthetic_transactions(N_TRANSACTIONS)
+    frame = pd.DataFrame([transaction_record(tx, receipt) for tx, receipt in zip(chain, receipts)])
+    frame['is_malicious'] = 0
+    path = tmp_path_factory.mktemp('parity') / 'parity.csv'
+    frame.to_csv(path, index=False)
+
+    trainer = CerberusAdvancedTrainer(str(path))
+    X_train, _ = trainer.load_and_prepare_data()
+    return X_train, trainer.feature_names
+
+
+def test_trainer_uses_the_model_features(training):
+    _, names = training
+    assert list(names) == list(MODEL_FEATURES)
+
+
+@pytest.mark.parametrize('encode', [monitor_json, rpc_json], ids=['monitor', 'rpc'])
+def test_scalar_path_matches_training_bitwise(chain, training, encode):
+    X_train, names = training
+    for row, tx in enumerate(chain):
+        vector, _ = PIPELINE.extract(encode(tx), names)
+        assert np.array_equal(vector[0].view(np.int64), X_train[row].view(np.int64)), row
+
+
+def test_batch_path_matches_training_bitwise(chain, training):
+    X_train, names = training
+    rows, _ = PIPELINE.extract_batch([monitor_json(tx) for tx in chain], names)
+    assert [i for i, _, _ in rows] == list(range(len(chain)))
+    for i, vector, _ in rows:
+        assert np.array_equal(vector[0].view(np.int64), X_train[i].view(np.int64)), i
+
+
+def test_both_encodings_give_the_same_feature_dicts(chain):
+    for tx in chain[:200]:
+        _, from_monitor = PIPELINE.extract(monitor_json(tx), MODEL_FEATURES)
+        _, from_rpc = PIPELINE.extract(rpc_json(tx), MODEL_FEATURES)
+        assert from_monitor == from_rpc
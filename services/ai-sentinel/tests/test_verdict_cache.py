@@ -0,0 +1,216 @@
+import pytest
+
+import verdict_cache
+from tx_features import monitor_json, synthetic_transactions
+from verdict_cache import ApproximateVerdictCache, VerdictCache, tx_fingerprint
+
+
+@pytest.fixture(scope='module')
+def transactions():
+    chain, _ = synthetic_transactions(40, seed=4)
+    return [monitor_json(tx) for tx in chain]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(verdict_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def verdict(score=10.0):
+    return {'danger_score': score, 'is_malicious': False, 'threat_category': 'NORMAL'}
+
+
+def test_hit_only_for_the_same_content_and_version(clock):
+    cache = VerdictCache(max_entries=10, ttl_seconds=60)
+    tx = {'hash': '0x1', 'value': '0'}
+    cache.put('0x1', tx_fingerprint(tx), 'v1', verdict())
+
+    assert cache.get('0x1', tx_fingerprint(tx), 'v1') == verdict()
+    assert cache.get('0x1', tx_fingerprint(dict(tx, value='1')), 'v1') is None
+    assert cache.get('0x1', tx_fingerprint(tx), 'v2') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['stale']) == (1, 2)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = VerdictCache(max_entries=10, ttl_seconds=60)
+    cache.put('0x1', 'f', 'v1', verdict())
+    clock[0] += 59
+    assert cache.get('0x1', 'f', 'v1') is not None
+    clock[0] += 2
+    assert cache.get('0x1', 'f', 'v1') is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_lru_bound_and_uncacheable_entries():
+    cache = VerdictCache(max_entries=3, ttl_seconds=60)
+    for i in range(3):
+        cache.put(f'0x{i}', 'f', 'v1', verdict())
+    cache.get('0x0', 'f', 'v1')                 # most recently used now
+    cache.put('0x3', 'f', 'v1', verdict())
+
+    assert cache.get('0x1', 'f', 'v1') is None
+    assert all(cache.get(h, 'f', 'v1') is not None for h in ('0x0', '0x2', '0x3'))
+    assert cache.stats()['evictions'] == 1
+
+    cache.put('unknown', 'f', 'v1', verdict())
+    cache.put('0x4', 'f', 'v1', {'error': 'boom'})
+    assert cache.stats()['entries'] == 3
+
+
+def with_caches(ai):
+    ai.verdict_cache = VerdictCache(max_entries=1000, ttl_seconds=300)
+    ai.approx_cache = ApproximateVerdictCache(max_entries=1000, ttl_seconds=300, verify_rate=0)
+    return ai
+
+
+def fail_ml_once(ai, monkeypatch):
+    real = ai._ensemble_predictions
+    calls = []
+
+    def flaky(X, ensemble):
+        calls.append(len(X))
+        if len(calls) == 1:
+            raise RuntimeError('transient scoring failure')
+        return real(X, ensemble)
+
+    monkeypatch.setattr(ai, '_ensemble_predictions', flaky)
+    return calls
+
+
+def test_second_predict_is_served_from_the_cache(engine, transactions):
+    ai = with_caches(engine)
+    tx = transactions[0]
+
+    first = ai.predict(tx)
+    second = ai.predict(tx)
+
+    assert first['analysis_method'] == 'ensemble_ml_enhanced'
+    assert second == first
+    assert ai.verdict_cache.stats()['hits'] == 1
+    # Verdicts are copied in and out: callers cannot edit the cached one
+    second['danger_score'] = -1
+    assert ai.predict(tx)['danger_score'] == first['danger_score']
+
+
+def test_near_duplicate_is_served_from_the_approximate_cache(engine, transactions):
+    ai = with_caches(engine)
+    tx = transactions[1]
+    ai.predict(tx)
+
+    bumped = dict(tx, hash='0x' + 'ab' * 32, gasPrice=str(int(tx['gasPrice']) + 7))
+    result = ai.predict(bumped)
+    assert result['approximate'] is True
+    assert result['tx_hash'] == bumped['hash']
+    assert ai.approx_cache.stats()['hits'] == 1
+
+
+def test_rule_fallback_after_a_failed_ml_pass_is_not_cached(engine, transactions, monkeypatch):
+    ai = with_caches(engine)
+    calls = fail_ml_once(ai, monkeypatch)
+    tx = transactions[2]
+
+    fallback = ai.predict(tx)
+    assert fallback['analysis_method'] == 'rule_based_enhanced'
+    assert ai.verdict_cache.stats()['entries'] == 0
+    assert ai.approx_cache.stats()['entries'] == 0
+
+    # The next request reaches the model again instead of replaying the rule verdict
+    scored = ai.predict(tx)
+    assert scored['analysis_method'] == 'ensemble_ml_enhanced'
+    assert scored['model_version'] == ai.model_version
+    assert len(calls) == 2
+    assert ai.predict(tx) == scored
+    assert len(calls) == 2
+
+
+def test_rule_fallback_in_a_batch_is_not_cached(engine, transactions, monkeypatch):
+    ai = with_caches(engine)
+    fail_ml_once(ai, monkeypatch)
+    batch = transactions[3:10]
+
+    assert {r['analysis_method'] for r in ai.predict_batch(batch)} == {'rule_based_enhanced'}
+    assert ai.verdict_cache.stats()['entries'] == 0
+    assert {r['analysis_method'] for r in ai.predict_batch(batch)} == {'ensemble_ml_enhanced'}
+    assert ai.verdict_cache.stats()['entries'] == len(batch)
+
+
+def test_rule_verdicts_are_cached_in_rule_based_mode(rule_engine, transactions):
+    ai = with_caches(rule_engine)
+    first = ai.predict(transactions[0])
+    assert first['analysis_method'] == 'rule_based_enhanced'
+    assert ai.predict(transactions[0]) == first
+    assert ai.verdict_cache.stats()['hits'] == 1
+
+
+def test_swap_invalidates_both_caches(engine, transactions):
+    ai = with_caches(engine)
+    for tx in transactions[:5]:
+        ai.predict(tx)
+    assert ai.verdict_cache.stats()['entries'] == 5
+
+    ai._swap_ensemble(ai._load_ensemble())
+
+    assert ai.verdict_cache.stats()['entries'] == 0
+    assert ai.approx_cache.stats()['entries'] == 0
+    ai.predict(transactions[0])
+    assert ai.verdict_cache.stats()['hits'] == 0
+
+
+def test_reload_invalidates_and_new_verdicts_carry_the_new_version(engine, transactions):
+    ai = with_caches(engine)
+    ai.predict(transactions[0])
+
+    outcome = ai.reloader.reload(reason='test', wait=True)
+
+    assert outcome['status'] == 'reloaded'
+    assert ai.verdict_cache.stats()['invalidations'] == 1
+    assert ai.approx_cache.stats()['invalidations'] == 1
+    result = ai.predict(transactions[0])
+    assert result['model_version'] == outcome['version']
+    assert ai.verdict_cache.stats()['hits'] == 0
+
+
+@pytest.mark.parametrize('field, raw', [
+    ('value', 'nan'), ('value', 'inf'), ('value', '1e400'), ('value', float('inf')), ('value', 10**400),
+    ('gasPrice', '-inf'), ('gas', float('nan')), ('value', 'lots')
+])
+def test_unparseable_quantities_have_no_signature(field, raw):
+    cache = ApproximateVerdictCache(max_entries=10)
+    tx = {'hash': '0x1', 'value': '0', 'gas': '21000', 'gasPrice': '1000000000', 'to': '0x2'}
+    assert cache.signature(dict(tx, **{field: raw})) is None
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '1e400'])
+def test_predict_endpoint_answers_an_error_verdict_for_non_finite_values(app_module, monkeypatch, value):
+    monkeypatch.setattr(app_module.ai_engine, 'approx_cache', ApproximateVerdictCache(max_entries=100))
+    client = app_module.app.test_client()
+
+    response = client.post('/predict', json={'hash': '0x' + '1' * 64, 'value': value,
+                                             'gasPrice': '1000000000', 'gasLimit': '21000'})
+
+    assert response.status_code == 200
+    assert response.get_json()['threat_category'] == 'ERROR'
+
+
+def test_signature_parses_quantities_like_the_features():
+    from tx_features import PIPELINE
+
+    cache = ApproximateVerdictCache(max_entries=10)
+    base = {'hash': '0x1', 'to': '0x2', 'gasLimit': '100000', 'gasPrice': '30000000000',
+            'value': '1500000000000000000', 'data': '0xa9059cbb'}
+    encodings = [
+        base,
+        dict(base, value=hex(1500000000000000000), gasLimit=hex(100000), gasPrice=hex(30000000000)),
+        dict(base, value=1500000000000000000, gasLimit=100000, gasPrice=30000000000)
+    ]
+    assert len({cache.signature(tx) for tx in encodings}) == 1
+    assert len({tuple(PIPELINE.features(tx).items()) for tx in encodings}) == 1
+
+    # Decimal strings are wei: '1' and '1.5' are both 1 wei, same features and same signature
+    one, one_and_a_half = dict(base, value='1'), dict(base, value='1.5')
+    assert PIPELINE.features(one) == PIPELINE.features(one_and_a_half)
+    assert cache.signature(one) == cache.signature(one_and_a_half)
+    assert cache.signature(one) != cache.signature(base)
@@ -0,0 +1,1406 @@
+"""
+Cerberus Threat Intelligence Store
+SQLite persistence for advanced_ai_sentinel.py. Threat reports are written
+behind the request: store_threat_report() only enqueues, and one writer
+thread per process drains the queue over a long-lived WAL connection with
+executemany() transactions of up to DB_BATCH_SIZE rows or DB_BATCH_MS.
+Request latency no longer includes JSON encoding, connect or fsync.
+
+When the queue is full (DB_QUEUE_FULL):
+    drop   (default) the new report is discarded and counted; scoring never waits on disk
+    block  the request waits up to DB_BLOCK_MS for space, then drops
+
+Layout: one table per UTC day (reports_YYYYMMDD). The columns /analytics and
+lookups touch are typed (epoch timestamp, gas price, value, sender id,
+selector, 32-byte hash); the features, member predictions and stored verdict
+are deflate-compressed JSON blobs. Partitions older than DB_RETENTION_DAYS
+are dropped whole and their pages returned with an incremental vacuum.
+A database with the old single threat_reports table is migrated on open.
+
+One report per hash, as in the old table: report_hashes maps every stored
+hash to the day holding it, so a hash re-submitted on a later day replaces
+its report (the earlier day's row is deleted) instead of adding a second one.
+
+Analytics: every insert also folds its reports into per-minute rollups
+(count, malicious count, confidence sum per category), in the same
+transaction. A window query merges at most window/60 buckets per category,
+however many reports the window holds. `python threat_db.py rebuild-rollups
+[db]` recomputes them from the raw rows.
+
+Queries: query_reports() filters by category, malicious flag, threat level,
+sender and time range with keyset pagination on (timestamp, id); each
+filter has an index ending in timestamp, so a page is one seek at any depth.
+"""
+
+import os
+import json
+import time
+import zlib
+import queue
+import atexit
+import sqlite3
+import calendar
+import threading
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# CERBERUS_DB_WRITE_BEHIND=0 writes synchronously on the request thread (previous behaviour)
+DB_WRITE_BEHIND = os.environ.get('CERBERUS_DB_WRITE_BEHIND', '1') != '0'
+DB_QUEUE_SIZE = int(os.environ.get('CERBERUS_DB_QUEUE_SIZE', 10000))
+DB_BATCH_SIZE = int(os.environ.get('CERBERUS_DB_BATCH_SIZE', 500))
+DB_BATCH_MS = float(os.environ.get('CERBERUS_DB_BATCH_MS', 50))
+DB_QUEUE_FULL = os.environ.get('CERBERUS_DB_QUEUE_FULL', 'drop')
+DB_BLOCK_MS = float(os.environ.get('CERBERUS_DB_BLOCK_MS', 1000))
+# Daily partitions kept; 0 keeps everything
+DB_RETENTION_DAYS = int(os.environ.get('CERBERUS_DB_RETENTION_DAYS', 30))
+
+PARTITION_PREFIX = 'reports_'
+
+PARTITION_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY,
+        tx_hash BLOB UNIQUE,
+        timestamp INTEGER NOT NULL,
+        confidence REAL,
+        threat_category TEXT,
+        threat_level INTEGER,
+        is_malicious INTEGER,
+        gas_price_gwei REAL,
+        value_eth REAL,
+        from_id INTEGER,
+        selector INTEGER,
+        model_version TEXT,
+        fingerprint BLOB,
+        detail BLOB,
+        verdict BLOB
+    )
+    ''',
+    # query_reports() pages in (timestamp, id) order. Every index ends in timestamp, and SQLite
+    # appends the rowid, so each filter seeks straight to the cursor and reads one page in order.
+    'CREATE INDEX IF NOT EXISTS {table}_time ON {table}(timestamp)',
+    'CREATE INDEX IF NOT EXISTS {table}_category ON {table}(threat_category, timestamp)',
+    'CREATE INDEX IF NOT EXISTS {table}_sender ON {table}(from_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS {table}_level ON {table}(threat_level, timestamp)',
+    # Malicious reports are the minority: a partial index holds only them
+    'CREATE INDEX IF NOT EXISTS {table}_malicious ON {table}(timestamp) WHERE is_malicious = 1'
+)
+
+# Stored hash -> day of the partition holding its report (YYYYMMDD). tx_hash UNIQUE only
+# holds within one partition; this keeps one report per hash across all of them.
+HASH_INDEX_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS report_hashes (
+        tx_hash BLOB PRIMARY KEY,
+        day INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    # Retention drops a day's entries with its partition
+    'CREATE INDEX IF NOT EXISTS report_hashes_day ON report_hashes(day)'
+)
+
+UPSERT_HASH = 'INSERT OR REPLACE INTO report_hashes (tx_hash, day) VALUES (?, ?)'
+
+# Superseded indexes, dropped from existing partitions on open
+_OLD_PARTITION_INDEXES = ('{table}_timestamp',)
+
+INSERT_THREAT_REPORT = '''
+    INSERT OR REPLACE INTO {table}
+    (tx_hash, timestamp, confidence, threat_category, threat_level, is_malicious, gas_price_gwei, value_eth,
+     from_id, selector, model_version, fingerprint, detail, verdict)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Per-minute, per-category aggregates kept in step with the partitions
+ROLLUP_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS report_rollups (
+        minute INTEGER NOT NULL,
+        threat_category TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        malicious INTEGER NOT NULL,
+        confidence_sum REAL NOT NULL,
+        PRIMARY KEY (minute, threat_category)
+    ) WITHOUT ROWID
+'''
+
+UPSERT_ROLLUP = '''
+    INSERT INTO report_rollups (minute, threat_category, count, malicious, confidence_sum)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (minute, threat_category) DO UPDATE SET
+        count = count + excluded.count,
+        malicious = malicious + excluded.malicious,
+        confidence_sum = confidence_sum + excluded.confidence_sum
+'''
+
+# Window suffixes accepted by parse_window / /analytics?window=
+_WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Sender address -> id, shared by every partition
+ADDRESS_SCHEMA = 'CREATE TABLE IF NOT EXISTS addresses (id INTEGER PRIMARY KEY, address BLOB UNIQUE)'
+_ADDRESS_ID_CACHE = 100000
+
+# Blob format byte + preset deflate dictionary. A report is too small for deflate to
+# learn its own keys, so the dictionary carries them. Never edit a released
+# dictionary: blobs need it to decode. Add a new version instead.
+_DETAIL_VERSION = 1
+_DETAIL_ZDICTS = {
+    1: (
+        '{"danger_score": "threat_category": "threat_level": "is_malicious": "model_consensus": '
+        '"anomaly_score": "model_version": "model_hash": "detection_mode": "analysis_timestamp": '
+        '"ensemble_details": {"individual_predictions": "meta_features": "model_weights": '
+        '"threat_signature": "confidence_std": "confidence_range": "high_confidence_count": '
+        '"model_agreement": "avg_confidence": "feature_complexity_score": "features_analyzed": '
+        '"NORMAL" "UNKNOWN" "ANOMALOUS_BEHAVIOR" "BEHAVIORAL_ANOMALY" "PHISHING_CONTRACT" '
+        '"SMART_CONTRACT_EXPLOIT" "FRONT_RUNNING" "RUG_PULL" "HONEY_POT" "META_ANALYSIS" '
+        '"No malicious patterns detected" "Normal transaction" "Normal behavior" '
+        '"Automated gas optimization" "Suspicious function signature detected" '
+        '"Meta-analysis confidence: " "Stat anomaly: ; ML_conf: " '
+        '"feature_importance": {"gas_price": "value": "contract_creation": "isolation_ml": '
+        '"pattern_match": "behavior_score": "meta_complexity": '
+        '{"model_name": "rule_based", "confidence": "threat_category": "threat_level": "reasoning": '
+        '{"model_name": "anomaly_detector", "confidence": "threat_category": "threat_level": "reasoning": '
+        '{"model_name": "pattern_matcher", "confidence": "threat_category": "threat_level": "reasoning": '
+        '{"model_name": "behavioral_analyzer", "confidence": "threat_category": "threat_level": "reasoning": '
+        '{"model_name": "meta_learner", "confidence": "threat_category": "threat_level": "reasoning": '
+        '{"features": {"gas_price_gwei": "gas_limit": "value_eth": "value_wei": "is_contract_creation": '
+        'false, "data_size": "has_data": true, "nonce": "hour_of_day": "is_weekend": false, '
+        '"is_night_time": false, "gas_price_percentile": "gas_price_deviation": "from_tx_count": '
+        '"from_total_value": "value_bucket": "is_round_number": false, "address_age_hours": '
+        '"function_signature": "0x", "has_suspicious_signature": false, "data_entropy": '
+        '"has_proxy_pattern": false, "gas_efficiency": "is_zero_value": false, "is_exact_gas_limit": '
+        'false, "value_to_gas_ratio": }, "predictions": [{"model_name": '
+    ).encode()
+}
+
+# Queue control markers (reports are plain tuples)
+_FLUSH = object()
+_STOP = object()
+
+
+def pack_detail(obj):
+    """JSON-serializable object -> version byte + raw deflate with the preset dictionary"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, _DETAIL_ZDICTS[_DETAIL_VERSION])
+    return bytes([_DETAIL_VERSION]) + compressor.compress(json.dumps(obj).encode()) + compressor.flush()
+
+
+def unpack_detail(blob):
+    if blob is None:
+        return None
+    zdict = _DETAIL_ZDICTS.get(blob[0])
+    if zdict is None:
+        raise ValueError(f"Unknown detail blob version {blob[0]}")
+    decompressor = zlib.decompressobj(-15, zdict=zdict)
+    return json.loads(decompressor.decompress(blob[1:]) + decompressor.flush())
+
+
+def pack_hex(value):
+    """'0x…' hex string -> bytes (half the size, case-insensitive match); anything else unchanged"""
+    if isinstance(value, str) and value[:2] in ('0x', '0X') and len(value) % 2 == 0:
+        try:
+            return bytes.fromhex(value[2:])
+        except ValueError:
+            pass
+    return value
+
+
+def unpack_hex(value):
+    return '0x' + value.hex() if isinstance(value, bytes) else value
+
+
+def pack_selector(signature):
+    """'0xa9059cbb' -> int; '' / malformed -> None"""
+    try:
+        return int(signature, 16) if signature else None
+    except (TypeError, ValueError):
+        return None
+
+
+def partition_name(timestamp):
+    return PARTITION_PREFIX + time.strftime('%Y%m%d', time.gmtime(timestamp))
+
+
+def partition_day(table):
+    """'reports_20240131' -> 20240131 (the report_hashes day)"""
+    return int(table[len(PARTITION_PREFIX):])
+
+
+def parse_timestamp(text):
+    """Epoch seconds or an ISO-8601 time (naive = UTC) -> epoch seconds"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(text).strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid time {text!r}: use epoch seconds or ISO-8601") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_cursor(cursor):
+    """query_reports() cursor 'YYYYMMDD.timestamp.id' -> (partition, timestamp, id)"""
+    try:
+        day, timestamp, row_id = cursor.split('.')
+        if not (len(day) == 8 and day.isdigit()):
+            raise ValueError
+        return PARTITION_PREFIX + day, int(timestamp), int(row_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor {cursor!r}") from None
+
+
+def parse_window(text):
+    """'5m', '1h', '7d', '90s' or plain seconds -> seconds"""
+    text = str(text).strip().lower()
+    unit = _WINDOW_UNITS.get(text[-1:]) if text else None
+    try:
+        seconds = float(text[:-1]) * unit if unit else float(text)
+    except ValueError:
+        raise ValueError(f"Invalid window {text!r}: use e.g. 5m, 1h, 7d") from None
+    if not seconds > 0:
+        raise ValueError(f"Invalid window {text!r}: must be positive")
+    return seconds
+
+
+class DatabaseManager:
+    """Advanced database management for threat intelligence"""
+
+    def __init__(self, db_path: str = 'threat_intelligence.db', write_behind: bool = DB_WRITE_BEHIND,
+                 queue_size: int = DB_QUEUE_SIZE, batch_size: int = DB_BATCH_SIZE,
+                 batch_ms: float = DB_BATCH_MS, full_policy: str = DB_QUEUE_FULL,
+                 retention_days: int = DB_RETENTION_DAYS):
+        if full_policy not in ('drop', 'block'):
+            raise ValueError(f"CERBERUS_DB_QUEUE_FULL must be 'drop' or 'block', got {full_policy!r}")
+
+        self.db_path = db_path
+        self.write_behind = write_behind
+        self.queue_size = int(queue_size)
+        self.batch_size = int(batch_size)
+        self.batch_ms = float(batch_ms)
+        self.full_policy = full_policy
+        self.retention_days = int(retention_days)
+
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+        self._partitions = set()
+        self._address_ids = {}
+        self._local = threading.local()
+
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+        self._commit_seconds = 0.0
+        self._max_queue_depth = 0
+        self._partitions_dropped = 0
+        self._last_error = None
+
+        self._initialize_db()
+        if self.write_behind:
+            atexit.register(self.close)
+
+    def _initialize_db(self):
+        """Initialize database tables"""
+        # Generous timeout: another worker may be migrating the same file
+        conn = sqlite3.connect(self.db_path, timeout=300)
+        conn.row_factory = sqlite3.Row
+        try:
+            # Only takes effect on a new file (or at the VACUUM after a migration)
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            # WAL: the writer's commits don't block /analytics readers (persistent per file)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(ADDRESS_SCHEMA)
+            has_rollups = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_rollups'"
+            ).fetchone() is not None
+            conn.execute(ROLLUP_SCHEMA)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS model_performance (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    model_name TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    accuracy REAL,
+                    precision_score REAL,
+                    recall REAL,
+                    f1_score REAL
+                )
+            ''')
+            conn.commit()
+            migrated = self._migrate_legacy(conn)
+            self._ensure_hash_index(conn)
+            if not migrated and not has_rollups and self.partitions(conn):
+                # Partitions written before rollups existed
+                with conn:
+                    self._rebuild_rollups(conn)
+
+            # Bring partitions from older versions up to the current indexes
+            with conn:
+                for table in self.partitions(conn):
+                    for index in _OLD_PARTITION_INDEXES:
+                        conn.execute(f'DROP INDEX IF EXISTS {index.format(table=table)}')
+                    self._ensure_partition(conn, table)
+        finally:
+            conn.close()
+
+    def _migrate_legacy(self, conn):
+        """Move rows of the old single threat_reports table (JSON text columns) into daily partitions"""
+        if not self._has_legacy_table(conn):
+            return False
+
+        started = time.perf_counter()
+        size_before = os.path.getsize(self.db_path)
+        # IMMEDIATE: exactly one process migrates, the others wait and then find nothing to do
+        conn.execute('BEGIN IMMEDIATE')
+        if not self._has_legacy_table(conn):
+            conn.rollback()
+            return False
+
+        logger.info(f"🔄 Migrating threat_reports in {self.db_path} to daily partitions...")
+        migrated = 0
+        cursor = conn.execute('SELECT * FROM threat_reports ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            by_partition = defaultdict(list)
+            for row in rows:
+                row = dict(row)
+                features = json.loads(row['features']) if row['features'] else {}
+                timestamp = calendar.timegm(time.strptime(row['timestamp'][:19], '%Y-%m-%d %H:%M:%S'))
+                verdict = row.get('verdict')
+                by_partition[partition_name(timestamp)].append((
+                    pack_hex(row['tx_hash']),
+                    timestamp,
+                    row['confidence'],
+                    row['threat_category'],
+                    row['threat_level'],
+                    int(bool(row['is_malicious'])),
+                    features.get('gas_price_gwei'),
+                    features.get('value_eth'),
+                    None,   # the old table never recorded the sender
+                    pack_selector(features.get('function_signature')),
+                    row.get('model_version'),
+                    bytes.fromhex(row['fingerprint']) if row.get('fingerprint') else None,
+                    pack_detail({
+                        'features': features,
+                        'predictions': json.loads(row['model_predictions']) if row['model_predictions'] else []
+                    }),
+                    pack_detail(json.loads(verdict)) if verdict else None
+                ))
+            for table, partition_rows in by_partition.items():
+                self._ensure_partition(conn, table)
+                conn.executemany(INSERT_THREAT_REPORT.format(table=table), partition_rows)
+            migrated += len(rows)
+
+        conn.execute('DROP TABLE threat_reports')
+        for statement in HASH_INDEX_SCHEMA:
+            conn.execute(statement)
+        self._index_hashes(conn)
+        self._rebuild_rollups(conn)
+        conn.commit()
+        # Rebuild the file: returns the old table's pages and switches on incremental auto-vacuum
+        conn.execute('VACUUM')
+        self._drop_expired_partitions(conn)
+
+        logger.info(f"✅ Migrated {migrated} threat reports in {time.perf_counter() - started:.1f}s "
+                    f"({size_before / 2**20:.1f} MiB -> {os.path.getsize(self.db_path) / 2**20:.1f} MiB)")
+        return True
+
+    def _ensure_hash_index(self, conn):
+        """Create report_hashes; partitions written before it existed are indexed and de-duplicated"""
+        if self._has_table(conn, 'report_hashes'):
+            return
+        # IMMEDIATE: one process indexes, the others wait and then find the table
+        conn.execute('BEGIN IMMEDIATE')
+        if not self._has_table(conn, 'report_hashes'):
+            for statement in HASH_INDEX_SCHEMA:
+                conn.execute(statement)
+            if self._index_hashes(conn):
+                # Rows the rollups counted are gone
+                self._rebuild_rollups(conn)
+        conn.commit()
+
+    def _index_hashes(self, conn):
+        """
+        Fill report_hashes from the partitions (inside the caller's transaction). A hash
+        stored on several days keeps its newest report; the older rows are deleted.
+        Returns the number deleted.
+        """
+        conn.execute('DELETE FROM report_hashes')
+        tables = self.partitions(conn)
+        # Oldest first: a later day overwrites an earlier day's entry
+        for table in tables:
+            conn.execute(f'INSERT OR REPLACE INTO report_hashes (tx_hash, day) '
+                         f'SELECT tx_hash, ? FROM {table} WHERE tx_hash IS NOT NULL', (partition_day(table),))
+        superseded = 0
+        for table in tables[:-1]:
+            superseded += conn.execute(f'''
+                DELETE FROM {table} WHERE tx_hash IS NOT NULL
+                AND (SELECT h.day FROM report_hashes h WHERE h.tx_hash = {table}.tx_hash) != ?
+            ''', (partition_day(table),)).rowcount
+        if superseded:
+            logger.info(f"🔄 Removed {superseded} threat reports superseded by a later day's report of the same hash")
+        return superseded
+
+    @classmethod
+    def _has_legacy_table(cls, conn):
+        return cls._has_table(conn, 'threat_reports')
+
+    @staticmethod
+    def _has_table(conn, name):
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone() is not None
+
+    @contextmanager
+    def _get_connection(self):
+        """Get database connection with proper handling"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _read_connection(self):
+        """
+        Long-lived connection per thread for lookups. A fresh connection re-parses
+        the schema on first use, which with the partitions costs more than the query.
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.db_path)
+            local.conn.row_factory = sqlite3.Row
+            local.pid = os.getpid()
+        return local.conn
+
+    def _ensure_partition(self, conn, table):
+        if table in self._partitions:
+            return False
+        for statement in PARTITION_SCHEMA:
+            conn.execute(statement.format(table=table))
+        self._partitions.add(table)
+        return True
+
+    def partitions(self, conn, since=None):
+        """Partition tables, oldest first; only those that can hold rows newer than `since` (epoch)"""
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+            (PARTITION_PREFIX + '[0-9]*',)
+        )]
+        if since is not None:
+            first = partition_name(since)
+            names = [name for name in names if name >= first]
+        return names
+
+    def _drop_expired_partitions(self, conn):
+        """Drop whole days past retention and hand their pages back to the filesystem"""
+        if self.retention_days <= 0:
+            return 0
+        first_kept_day = int(time.time() - self.retention_days * 86400) // 86400 * 86400
+        cutoff = partition_name(first_kept_day)
+        expired = [name for name in self.partitions(conn) if name < cutoff]
+        if not expired:
+            return 0
+        with conn:
+            for name in expired:
+                conn.execute(f'DROP TABLE {name}')
+            conn.execute('DELETE FROM report_hashes WHERE day < ?', (partition_day(cutoff),))
+            conn.execute('DELETE FROM report_rollups WHERE minute < ?', (first_kept_day // 60,))
+        self._partitions.difference_update(expired)
+        conn.execute('PRAGMA incremental_vacuum')
+        logger.info(f"🧹 Dropped {len(expired)} threat report partitions older than {self.retention_days} days")
+        with self._lock:
+            self._partitions_dropped += len(expired)
+        return len(expired)
+
+    def _address_id(self, conn, address):
+        key = pack_hex(address.lower())
+        address_id = self._address_ids.get(key)
+        if address_id is None:
+            conn.execute('INSERT OR IGNORE INTO addresses (address) VALUES (?)', (key,))
+            address_id = conn.execute('SELECT id FROM addresses WHERE address = ?', (key,)).fetchone()[0]
+            if len(self._address_ids) >= _ADDRESS_ID_CACHE:
+                self._address_ids.clear()
+            self._address_ids[key] = address_id
+        return address_id
+
+    def store_threat_report(self, tx_hash, result, features, model_version=None, fingerprint=None, verdict=None,
+                            from_address=None):
+        """Store threat report in database (queued for the writer thread unless write-behind is off)"""
+        # Stamped now, not at write time, so a queued report keeps its request time
+        report = (tx_hash, int(time.time()), result, features, model_version, fingerprint, verdict, from_address)
+
+        if not self.write_behind:
+            with self._get_connection() as conn:
+                self._insert(conn, [report])
+            return True
+
+        self._ensure_writer()
+        try:
+            if self.full_policy == 'block':
+                self._queue.put(report, timeout=DB_BLOCK_MS / 1000.0)
+            else:
+                self._queue.put_nowait(report)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+                dropped = self._dropped
+            # Log the first drop and then every 1000th, not every request under overload
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"⚠️  Threat report queue full ({self.queue_size}), {dropped} reports dropped")
+            return False
+
+        with self._lock:
+            self._enqueued += 1
+            depth = self._queue.qsize()
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return True
+
+    def _encode(self, conn, report):
+        tx_hash, timestamp, result, features, model_version, fingerprint, verdict, from_address = report
+        return (
+            pack_hex(tx_hash),
+            timestamp,
+            result.final_confidence,
+            result.threat_category,
+            result.threat_level,
+            int(bool(result.is_malicious)),
+            features.get('gas_price_gwei'),
+            features.get('value_eth'),
+            self._address_id(conn, from_address) if from_address else None,
+            pack_selector(features.get('function_signature')),
+            model_version,
+            bytes.fromhex(fingerprint) if fingerprint else None,
+            pack_detail({
+                'features': features,
+                # ModelPrediction is flat, so vars() gives the same JSON as asdict() without its deep copy
+                'predictions': [vars(pred) for pred in result.individual_predictions]
+            }),
+            pack_detail(verdict) if verdict is not None else None
+        )
+
+    def _insert(self, conn, reports):
+        """Encode and insert reports in one transaction, grouped by day; returns the rows written"""
+        # Last report per hash, as INSERT OR REPLACE would keep; reports without a hash never collide
+        latest, unhashed = {}, []
+        new_partition = False
+        with conn:
+            for report in reports:
+                try:
+                    row = self._encode(conn, report)
+                except Exception as e:
+                    # One unserializable report must not sink the batch
+                    logger.error(f"❌ Threat report {report[0]} not stored: {e}")
+                    with self._lock:
+                        self._failed += 1
+                    continue
+                entry = (partition_name(report[1]), row)
+                if row[0] is None:
+                    unhashed.append(entry)
+                else:
+                    latest[row[0]] = entry
+
+            entries = list(latest.values()) + unhashed
+            by_partition = defaultdict(list)
+            for table, row in entries:
+                by_partition[table].append(row)
+            for table in by_partition:
+                new_partition |= self._ensure_partition(conn, table)
+
+            self._roll_up(conn, entries, self._supersede(conn, latest))
+            for table, rows in by_partition.items():
+                conn.executemany(INSERT_THREAT_REPORT.format(table=table), rows)
+            conn.executemany(UPSERT_HASH, [(tx_hash, partition_day(table)) for tx_hash, (table, _) in latest.items()])
+
+        written = len(entries)
+        with self._lock:
+            self._written += written
+        if new_partition:
+            # A new day started: a good moment to retire the oldest one
+            self._drop_expired_partitions(conn)
+        return written
+
+    def _supersede(self, conn, latest):
+        """
+        The stored reports the batch replaces, as (timestamp, category, confidence, malicious).
+        Those in another day's partition are deleted here; INSERT OR REPLACE takes care of
+        the ones in the partition the new report goes to.
+        """
+        replaced = []
+        hashes = list(latest)
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            by_partition = defaultdict(list)
+            for tx_hash, day in conn.execute(
+                f"SELECT tx_hash, day FROM report_hashes WHERE tx_hash IN ({', '.join('?' * len(chunk))})", chunk
+            ):
+                by_partition[f'{PARTITION_PREFIX}{day:08d}'].append(tx_hash)
+
+            for table, stored in by_partition.items():
+                replaced.extend(conn.execute(f'''
+                    SELECT timestamp, threat_category, confidence, is_malicious FROM {table}
+                    WHERE tx_hash IN ({', '.join('?' * len(stored))})
+                ''', stored))
+                moved = [tx_hash for tx_hash in stored if latest[tx_hash][0] != table]
+                if moved:
+                    conn.execute(f"DELETE FROM {table} WHERE tx_hash IN ({', '.join('?' * len(moved))})", moved)
+        return replaced
+
+    def _roll_up(self, conn, entries, replaced):
+        """Add encoded rows to the minute rollups, backing out the stored reports they replace"""
+        deltas = defaultdict(lambda: [0, 0, 0.0])
+        for _, (_, timestamp, confidence, category, _, malicious, *_) in entries:
+            delta = deltas[(timestamp // 60, category)]
+            delta[0] += 1
+            delta[1] += malicious
+            delta[2] += confidence or 0.0
+        for timestamp, category, confidence, malicious in replaced:
+            delta = deltas[(timestamp // 60, category)]
+            delta[0] -= 1
+            delta[1] -= malicious
+            delta[2] -= confidence or 0.0
+
+        conn.executemany(UPSERT_ROLLUP, [
+            (minute, category, count, malicious, confidence)
+            for (minute, category), (count, malicious, confidence) in deltas.items()
+            if category is not None
+        ])
+
+    def _rebuild_rollups(self, conn):
+        """Recompute every rollup bucket from the partitions (inside the caller's transaction)"""
+        conn.execute('DELETE FROM report_rollups')
+        for table in self.partitions(conn):
+            # WHERE true: required before ON CONFLICT in an INSERT ... SELECT
+            conn.execute(f'''
+                INSERT INTO report_rollups (minute, threat_category, count, malicious, confidence_sum)
+                SELECT timestamp / 60, threat_category, COUNT(*), SUM(is_malicious), TOTAL(confidence)
+                FROM {table}
+                WHERE threat_category IS NOT NULL
+                GROUP BY timestamp / 60, threat_category
+                ON CONFLICT (minute, threat_category) DO UPDATE SET
+                    count = count + excluded.count,
+                    malicious = malicious + excluded.malicious,
+                    confidence_sum = confidence_sum + excluded.confidence_sum
+            ''')
+        return conn.execute('SELECT COUNT(*) FROM report_rollups').fetchone()[0]
+
+    def rebuild_rollups(self):
+        """Recompute the rollups from the raw rows; returns the number of buckets"""
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.db_path, timeout=300)
+        try:
+            # IMMEDIATE: writers wait instead of adding reports that the rebuild would miss
+            conn.execute('BEGIN IMMEDIATE')
+            buckets = self._rebuild_rollups(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"✅ Rebuilt {buckets} rollup buckets in {time.perf_counter() - started:.2f}s")
+        return buckets
+
+    def _ensure_writer(self):
+        """Start the writer lazily (and again in a forked child, where threads don't survive)"""
+        pid = os.getpid()
+        if self._writer is not None and self._writer_pid == pid and self._writer.is_alive():
+            return
+
+        with self._lock:
+            if self._writer is not None and self._writer_pid == pid and self._writer.is_alive():
+                return
+            if self._writer_pid is not None and self._writer_pid != pid:
+                # The parent's queued reports are the parent's to write
+                self._queue = queue.Queue(maxsize=self.queue_size)
+            self._writer = threading.Thread(target=self._run, name='cerberus-db-writer', daemon=True)
+            self._writer_pid = pid
+            self._writer.start()
+
+    def _connect_writer(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # In WAL mode NORMAL only syncs at checkpoints: durable across process crashes,
+        # the last transactions can be lost on power failure
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _collect(self):
+        """Block for the first item, then gather until the batch is full, the window closes or a marker arrives"""
+        reports, markers = [], []
+        item = self._queue.get()
+        deadline = time.perf_counter() + self.batch_ms / 1000.0
+
+        while True:
+            if item is _STOP or isinstance(item, tuple) and item[0] is _FLUSH:
+                markers.append(item)
+                break
+            reports.append(item)
+            if len(reports) >= self.batch_size:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+        return reports, markers
+
+    def _write_batch(self, conn, reports):
+        started = time.perf_counter()
+        try:
+            written = self._insert(conn, reports)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Threat report batch of {len(reports)} failed: {e}")
+            with self._lock:
+                self._failed += len(reports)
+                self._last_error = str(e)
+            # Rolled back: partitions and address ids created in the batch may not exist
+            self._partitions.clear()
+            self._address_ids.clear()
+            conn.close()
+            return self._connect_writer()
+
+        if written:
+            with self._lock:
+                self._batches += 1
+                self._commit_seconds += time.perf_counter() - started
+        return conn
+
+    def _run(self):
+        conn = self._connect_writer()
+        while True:
+            reports, markers = self._collect()
+            if reports:
+                conn = self._write_batch(conn, reports)
+            for marker in markers:
+                if marker is _STOP:
+                    conn.close()
+                    return
+                marker[1].set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every report queued so far is committed"""
+        if not self.write_behind or self._writer is None or self._writer_pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Drain the queue and stop the writer (registered with atexit)"""
+        if self._writer is None or self._writer_pid != os.getpid() or not self._writer.is_alive():
+            return
+        self.flush(timeout)
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._writer.join(timeout)
+
+    def stats(self):
+        partitions = self.partitions(self._read_connection())
+        with self._lock:
+            return {
+                'write_behind': self.write_behind,
+                'full_policy': self.full_policy,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'queue_size': self.queue_size,
+                'enqueued': self._enqueued,
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'batches': self._batches,
+                'avg_batch_size': (self._written / self._batches) if self._batches else 0.0,
+                'avg_commit_ms': (self._commit_seconds / self._batches * 1000) if self._batches else 0.0,
+                'last_error': self._last_error,
+                'partitions': len(partitions),
+                'oldest_partition': partitions[0] if partitions else None,
+                'retention_days': self.retention_days,
+                'partitions_dropped': self._partitions_dropped,
+                'db_bytes': os.path.getsize(self.db_path)
+            }
+
+    def recent_statistics(self, window_seconds: float = 86400):
+        """
+        Per threat category count / mean confidence / malicious count over the
+        window, from the minute rollups. Windows are whole minutes: the bucket
+        the window starts in is counted in full.
+        """
+        since_minute = int(time.time() - window_seconds) // 60
+        rows = self._read_connection().execute('''
+            SELECT threat_category, SUM(count), SUM(confidence_sum), SUM(malicious)
+            FROM report_rollups
+            WHERE minute >= ?
+            GROUP BY threat_category
+            HAVING SUM(count) > 0
+            ORDER BY threat_category
+        ''', (since_minute,)).fetchall()
+        return self._statistics_rows(rows)
+
+    def _scan_statistics(self, window_seconds: float = 86400):
+        """recent_statistics() computed from the raw rows (what the rollups replace; used to check them)"""
+        since = int(time.time() - window_seconds) // 60 * 60
+        totals = defaultdict(lambda: [0, 0.0, 0])
+        conn = self._read_connection()
+        for table in self.partitions(conn, since):
+            for category, count, confidence, malicious in conn.execute(f'''
+                SELECT threat_category, COUNT(*), TOTAL(confidence), SUM(is_malicious)
+                FROM {table}
+                WHERE timestamp >= ?
+                GROUP BY threat_category
+            ''', (since,)):
+                total = totals[category]
+                total[0] += count
+                total[1] += confidence
+                total[2] += malicious
+        return self._statistics_rows(sorted(
+            (category, count, confidence, malicious)
+            for category, (count, confidence, malicious) in totals.items()
+            if category is not None
+        ))
+
+    @staticmethod
+    def _statistics_rows(rows):
+        # Same row shape the single-table GROUP BY returned
+        return [
+            {
+                'total_reports': count,
+                'avg_confidence': confidence / count,
+                'malicious_count': malicious,
+                'threat_category': category,
+                'category_count': count
+            }
+            for category, count, confidence, malicious in rows
+        ]
+
+    def get_report(self, tx_hash):
+        """The newest stored report for a hash, decoded, or None"""
+        key = pack_hex(tx_hash)
+        conn = self._read_connection()
+        for table in reversed(self.partitions(conn)):
+            row = conn.execute(f'''
+                SELECT r.*, a.address FROM {table} r LEFT JOIN addresses a ON a.id = r.from_id
+                WHERE r.tx_hash = ?
+            ''', (key,)).fetchone()
+            if row is not None:
+                return self._decode(row)
+        return None
+
+    @staticmethod
+    def _decode(row, detail=True):
+        report = {
+            'tx_hash': unpack_hex(row['tx_hash']),
+            'timestamp': row['timestamp'],
+            'confidence': row['confidence'],
+            'threat_category': row['threat_category'],
+            'threat_level': row['threat_level'],
+            'is_malicious': bool(row['is_malicious']),
+            'gas_price_gwei': row['gas_price_gwei'],
+            'value_eth': row['value_eth'],
+            'from_address': unpack_hex(row['address']),
+            'selector': f"0x{row['selector']:08x}" if row['selector'] is not None else None,
+            'model_version': row['model_version'],
+            'fingerprint': row['fingerprint'].hex() if row['fingerprint'] is not None else None
+        }
+        if detail:
+            stored = unpack_detail(row['detail']) or {}
+            report['features'] = stored.get('features')
+            report['model_predictions'] = stored.get('predictions')
+            report['verdict'] = unpack_detail(row['verdict'])
+        return report
+
+    def query_reports(self, category=None, malicious=None, threat_level=None, sender=None, since=None, until=None,
+                      limit=100, cursor=None, detail=True):
+        """
+        One page of reports, newest first, plus the cursor of the next page (None on
+        the last). Keyset pagination on (timestamp, id) inside each daily partition:
+        every page is an index seek from the cursor, so page 1 and page 100000 cost
+        the same. since is inclusive, until exclusive (epoch seconds).
+        """
+        conn = self._read_connection()
+        clauses, params = [], []
+        if category is not None:
+            clauses.append('r.threat_category = ?')
+            params.append(category)
+        if malicious is not None:
+            # A literal, not a parameter: the partial index only matches `is_malicious = 1`
+            clauses.append('r.is_malicious = 1' if malicious else 'r.is_malicious = 0')
+        if threat_level is not None:
+            clauses.append('r.threat_level = ?')
+            params.append(int(threat_level))
+        if sender is not None:
+            row = conn.execute('SELECT id FROM addresses WHERE address = ?', (pack_hex(sender.lower()),)).fetchone()
+            if row is None:
+                return [], None
+            clauses.append('r.from_id = ?')
+            params.append(row[0])
+        if since is not None:
+            clauses.append('r.timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('r.timestamp < ?')
+            params.append(until)
+
+        partitions = self.partitions(conn, since)
+        if until is not None:
+            last = partition_name(until)
+            partitions = [table for table in partitions if table <= last]
+        position = None
+        if cursor:
+            table, timestamp, row_id = parse_cursor(cursor)
+            partitions = [name for name in partitions if name <= table]
+            position = (table, timestamp, row_id)
+
+        page = []
+        for table in reversed(partitions):
+            where, values = list(clauses), list(params)
+            if position is not None and table == position[0]:
+                where.append('(r.timestamp, r.id) < (?, ?)')
+                values.extend(position[1:])
+            # One row past the page tells whether another page exists
+            values.append(limit + 1 - len(page))
+            page.extend((table, row) for row in conn.execute(f'''
+                SELECT r.*, a.address FROM {table} r LEFT JOIN addresses a ON a.id = r.from_id
+                {'WHERE ' + ' AND '.join(where) if where else ''}
+                ORDER BY r.timestamp DESC, r.id DESC
+                LIMIT ?
+            ''', values))
+            if len(page) > limit:
+                break
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            table, row = page[-1]
+            next_cursor = f"{table[len(PARTITION_PREFIX):]}.{row['timestamp']}.{row['id']}"
+        return [self._decode(row, detail) for _, row in page], next_cursor
+
+    def iter_reports(self, page_size=1000, max_rows=None, cursor=None, **filters):
+        """Every matching report, newest first, fetched page by page (for streaming exports)"""
+        produced = 0
+        while True:
+            size = page_size if max_rows is None else min(page_size, max_rows - produced)
+            if size <= 0:
+                return
+            reports, cursor = self.query_reports(limit=size, cursor=cursor, **filters)
+            yield from reports
+            produced += len(reports)
+            if cursor is None:
+                return
+
+    def get_verdict(self, tx_hash, fingerprint, model_version, max_age_seconds):
+        """Second tier of the verdict cache: a stored verdict for the same tx, content and model"""
+        since = int(time.time() - max_age_seconds)
+        conn = self._read_connection()
+        for table in reversed(self.partitions(conn, since)):
+            row = conn.execute(f'''
+                SELECT verdict FROM {table}
+                WHERE tx_hash = ? AND fingerprint = ? AND model_version = ?
+                  AND verdict IS NOT NULL AND timestamp > ?
+            ''', (pack_hex(tx_hash), bytes.fromhex(fingerprint), model_version, since)).fetchone()
+            if row is not None:
+                return unpack_detail(row['verdict'])
+        return None
+
+
+def main():
+    """Write path (synchronous vs write-behind) and layout (single JSON table vs daily columnar partitions)"""
+    import random
+    import shutil
+    import tempfile
+    import numpy as np
+    from dataclasses import dataclass, field
+
+    @dataclass
+    class Prediction:
+        model_name: str
+        confidence: float
+        threat_category: str
+        threat_level: int
+        reasoning: str
+        feature_importance: dict = field(default_factory=dict)
+
+    @dataclass
+    class Result:
+        final_confidence: float
+        threat_category: str
+        threat_level: int
+        is_malicious: bool
+        individual_predictions: list
+
+    print("=" * 80)
+    print("🐺 CERBERUS THREAT STORE BENCHMARK")
+    print("=" * 80)
+
+    rng = random.Random(9)
+    senders = [f'0x{rng.getrandbits(160):040x}' for _ in range(2000)]
+    selectors = ['', '0xa9059cbb', '0x095ea7b3', '0x23b872dd', '0x7ff36ab5', '0x38ed1739']
+
+    def report(i):
+        # Shaped like advanced_ai_sentinel /predict: its 26 features and 5 member predictions
+        gas_price = rng.randint(1, 300) * 1e9 + rng.randint(0, 10**6)
+        value_wei = rng.choice([0, 10**18, rng.randint(0, 10**19)])
+        gas_limit = rng.choice([21000, 65000, 200000, rng.randint(21000, 500000)])
+        signature = rng.choice(selectors)
+        features = {
+            'gas_price_gwei': gas_price / 1e9, 'gas_limit': gas_limit, 'value_eth': value_wei / 1e18,
+            'value_wei': value_wei, 'is_contract_creation': False, 'data_size': len(signature) * 7,
+            'has_data': bool(signature), 'nonce': rng.randint(0, 5000), 'hour_of_day': rng.randint(0, 23),
+            'is_weekend': False, 'is_night_time': rng.random() < 0.3, 'gas_price_percentile': rng.random() * 100,
+            'gas_price_deviation': rng.random() * 1e10, 'from_tx_count': rng.randint(1, 50),
+            'from_total_value': rng.random() * 20, 'value_bucket': rng.choice(['zero', 'small', 'medium', 'large']),
+            'is_round_number': value_wei == 10**18, 'address_age_hours': rng.random() * 24,
+            'function_signature': signature, 'has_suspicious_signature': signature in selectors[1:4],
+            'data_entropy': rng.random() * 4, 'has_proxy_pattern': False, 'gas_efficiency': rng.random(),
+            'is_zero_value': value_wei == 0, 'is_exact_gas_limit': gas_limit == 21000,
+            'value_to_gas_ratio': (value_wei / 1e18) / (gas_price / 1e18)
+        }
+        confidence = rng.random() * 100
+        predictions = [
+            Prediction('rule_based', rng.choice([0, 10, 20]), 'NORMAL', 0, 'Normal transaction',
+                       {'gas_price': gas_price / 1e11, 'value': min(value_wei / 1e20, 1), 'contract_creation': 0}),
+            Prediction('anomaly_detector', rng.random() * 100, 'ANOMALOUS_BEHAVIOR', 2,
+                       f'Stat anomaly: {rng.random():.1f}; ML_conf: {rng.random() * 100:.1f}',
+                       {'isolation_ml': rng.random()}),
+            Prediction('pattern_matcher', 0, 'UNKNOWN', 0, 'No malicious patterns detected', {'pattern_match': 0.0}),
+            Prediction('behavioral_analyzer', 10, 'BEHAVIORAL_ANOMALY', 0, 'Automated gas optimization',
+                       {'behavior_score': 0.1}),
+            Prediction('meta_learner', 0.0, 'META_ANALYSIS', 0, 'Meta-analysis confidence: 0.0', {'meta_complexity': 0.0})
+        ]
+        category = 'NORMAL' if confidence < 70 else rng.choice(['FRONT_RUNNING', 'PHISHING_CONTRACT', 'RUG_PULL'])
+        result = Result(confidence, category, int(confidence // 25), confidence > 70, predictions)
+        return f'0x{rng.getrandbits(256):064x}', result, features, rng.choice(senders)
+
+    def timed(fn, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            value = fn()
+        return (time.perf_counter() - started) / repeat * 1000, value
+
+    def file_bytes(path):
+        return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # --- Write path ---
+        reports = [report(i) for i in range(5000)]
+        runs = (('commit per request, rollback journal', False, 'DELETE'),
+                ('commit per request, WAL', False, 'WAL'),
+                ('write-behind, WAL', True, 'WAL'))
+        for i, (label, write_behind, journal_mode) in enumerate(runs):
+            db = DatabaseManager(os.path.join(tmp, f'run{i}.db'), write_behind=write_behind)
+            if journal_mode != 'WAL':
+                # The store before write-behind: default journal, one commit per report
+                with db._get_connection() as conn:
+                    conn.execute(f'PRAGMA journal_mode={journal_mode}')
+            latencies = []
+            started = time.perf_counter()
+            for tx_hash, result, features, sender in reports:
+                call = time.perf_counter()
+                db.store_threat_report(tx_hash, result, features, model_version='bench', from_address=sender)
+                latencies.append(time.perf_counter() - call)
+            db.flush(timeout=60)
+            elapsed = time.perf_counter() - started
+
+            with db._get_connection() as conn:
+                stored = sum(conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0] for t in db.partitions(conn))
+            ms = np.array(latencies) * 1000
+            stats = db.stats()
+            print(f"\n{label}: {stored} rows stored")
+            print(f"   request side   p50 {np.percentile(ms, 50):7.3f} ms | p99 {np.percentile(ms, 99):7.3f} ms")
+            print(f"   sustained      {len(reports) / elapsed:8.0f} inserts/s "
+                  f"(batches {stats['batches']}, avg {stats['avg_batch_size']:.0f} rows, "
+                  f"{stats['avg_commit_ms']:.1f} ms/commit, dropped {stats['dropped']})")
+            db.close()
+
+        # --- Layout: 7 days of reports in the old single table, then migrated ---
+        rows, days = 70000, 7
+        now = time.time()
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        legacy = sqlite3.connect(legacy_path)
+        legacy.executescript('''
+            CREATE TABLE threat_reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tx_hash TEXT UNIQUE,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                confidence REAL,
+                threat_category TEXT,
+                threat_level INTEGER,
+                is_malicious BOOLEAN,
+                features TEXT,
+                model_predictions TEXT,
+                model_version TEXT,
+                fingerprint TEXT,
+                verdict TEXT
+            );
+            CREATE INDEX idx_tx_hash ON threat_reports(tx_hash);
+            CREATE INDEX idx_timestamp ON threat_reports(timestamp);
+        ''')
+        hashes = []
+        for chunk in range(0, rows, 10000):
+            batch = []
+            for i in range(chunk, chunk + 10000):
+                tx_hash, result, features, _ = report(i)
+                stamp = now - (rows - i) / rows * days * 86400
+                batch.append((
+                    tx_hash, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(stamp)), result.final_confidence,
+                    result.threat_category, result.threat_level, result.is_malicious, json.dumps(features),
+                    json.dumps([vars(pred) for pred in result.individual_predictions]), 'bench',
+                    f'{rng.getrandbits(64):016x}', None
+                ))
+                hashes.append(tx_hash)
+            legacy.executemany('''
+                INSERT INTO threat_reports (tx_hash, timestamp, confidence, threat_category, threat_level,
+                is_malicious, features, model_predictions, model_version, fingerprint, verdict)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+        legacy.commit()
+        legacy.row_factory = sqlite3.Row
+
+        migrated_path = os.path.join(tmp, 'migrated.db')
+        shutil.copy(legacy_path, migrated_path)
+        started = time.perf_counter()
+        store = DatabaseManager(migrated_path, write_behind=False, retention_days=0)
+        migrate_seconds = time.perf_counter() - started
+        with store._get_connection() as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            partitions = store.partitions(conn)
+
+        legacy_bytes, new_bytes = file_bytes(legacy_path), file_bytes(migrated_path)
+        print(f"\n{rows} reports over {days} days: migrated in {migrate_seconds:.1f}s into {len(partitions)} partitions")
+        print(f"   size on disk   single table {legacy_bytes / 2**20:7.1f} MiB ({legacy_bytes / rows:6.0f} B/row) | "
+              f"partitioned {new_bytes / 2**20:6.1f} MiB ({new_bytes / rows:5.0f} B/row) | "
+              f"{legacy_bytes / new_bytes:.1f}x smaller")
+
+        # Hashes probed by the lookup timings
+        sample = rng.sample(hashes, 2000)
+
+        # Both sides open a connection per call, as the service does
+        def legacy_query(sql, params=()):
+            conn = sqlite3.connect(legacy_path)
+            conn.row_factory = sqlite3.Row
+            try:
+                return conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+
+        old_ms, old_stats = timed(lambda: legacy_query('''
+            SELECT COUNT(*) as total_reports, AVG(confidence) as avg_confidence,
+                SUM(CASE WHEN is_malicious THEN 1 ELSE 0 END) as malicious_count,
+                threat_category, COUNT(*) as category_count
+            FROM threat_reports WHERE timestamp > datetime('now', '-24 hours')
+            GROUP BY threat_category
+        '''), 20)
+        new_ms, _ = timed(lambda: store._scan_statistics(86400), 20)
+        print(f"   24h GROUP BY   single table {old_ms:8.2f} ms | partitioned {new_ms:8.2f} ms | {old_ms / new_ms:.1f}x")
+
+        probe = sample[:500]
+        old_ms, _ = timed(lambda: [
+            json.loads(legacy_query('SELECT * FROM threat_reports WHERE tx_hash = ?', (h,))[0]['features'])
+            for h in probe
+        ], 3)
+        new_ms, _ = timed(lambda: [store.get_report(h) for h in probe], 3)
+        print(f"   report lookup  single table {old_ms / len(probe) * 1000:8.1f} µs | "
+              f"partitioned {new_ms / len(probe) * 1000:8.1f} µs (probes up to {len(partitions)} partitions)")
+        hit = store.get_report(probe[-1])
+        new_ms, _ = timed(lambda: [store.get_verdict(h, hit['fingerprint'], 'bench', 3600) for h in probe], 3)
+        print(f"   verdict tier 2 (1 h TTL)    partitioned {new_ms / len(probe) * 1000:8.1f} µs (only the last hour's partitions)")
+
+        # Retention: one day out of seven
+        started = time.perf_counter()
+        with legacy:
+            legacy.execute("DELETE FROM threat_reports WHERE timestamp < datetime('now', ?)", (f'-{days - 1} days',))
+        legacy.execute('VACUUM')
+        old_ms = (time.perf_counter() - started) * 1000
+        store.retention_days = days - 1
+        started = time.perf_counter()
+        with store._get_connection() as conn:
+            dropped = store._drop_expired_partitions(conn)
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        new_ms = (time.perf_counter() - started) * 1000
+        print(f"   drop oldest day  DELETE + VACUUM {old_ms:8.1f} ms | DROP partition + incremental vacuum "
+              f"{new_ms:6.1f} ms ({dropped} partition, {file_bytes(migrated_path) / 2**20:.1f} MiB left)")
+        legacy.close()
+
+        # --- Rollups at volume: 500k reports in the last 24 h (~6/s) ---
+        dense_rows = 500000
+        dense = DatabaseManager(os.path.join(tmp, 'dense.db'), write_behind=False, retention_days=0)
+        categories = ['NORMAL'] * 6 + ['FRONT_RUNNING', 'PHISHING_CONTRACT', 'RUG_PULL', 'BEHAVIORAL_ANOMALY']
+        detail = pack_detail({})
+        stamps = sorted(int(now - rng.random() * 86400) for _ in range(dense_rows))
+        by_partition = defaultdict(list)
+        for i, stamp in enumerate(stamps):
+            confidence = rng.random() * 100
+            by_partition[partition_name(stamp)].append((
+                i.to_bytes(32, 'big'), stamp, confidence, rng.choice(categories), 0, int(confidence > 70),
+                20.0, 0.1, None, None, 'bench', None, detail, None
+            ))
+        with dense._get_connection() as conn:
+            for table, partition_rows in by_partition.items():
+                dense._ensure_partition(conn, table)
+                conn.executemany(INSERT_THREAT_REPORT.format(table=table), partition_rows)
+            conn.commit()
+        del by_partition, stamps
+
+        started = time.perf_counter()
+        buckets = dense.rebuild_rollups()
+        print(f"\n{dense_rows} reports in the last 24 h: rebuild-rollups -> {buckets} buckets "
+              f"in {time.perf_counter() - started:.2f}s")
+        print("   /analytics  window |   rows scan | rollup merge | buckets merged")
+        for window in ('5m', '1h', '24h', '7d'):
+            seconds = parse_window(window)
+            scan_ms, _ = timed(lambda: dense._scan_statistics(seconds), 5)
+            rollup_ms, _ = timed(lambda: dense.recent_statistics(seconds), 20)
+            merged = dense._read_connection().execute(
+                'SELECT COUNT(*) FROM report_rollups WHERE minute >= ?', (int(time.time() - seconds) // 60,)
+            ).fetchone()[0]
+            print(f"   {window:>18} | {scan_ms:8.2f} ms | {rollup_ms:9.2f} ms | {merged:6d}")
+
+
+def reports_benchmark(rows=10000000, path=None):
+    """/reports page latency by cursor depth on a synthetic 30-day database (`python threat_db.py bench-reports [rows]`)"""
+    import random
+    import tempfile
+
+    print("=" * 80)
+    print(f"🐺 CERBERUS /reports BENCHMARK ({rows} reports)")
+    print("=" * 80)
+
+    rng = random.Random(18)
+    days = 30
+    now = int(time.time())
+    path = path or os.path.join(tempfile.mkdtemp(), 'reports.db')
+    store = DatabaseManager(path, write_behind=False, retention_days=0)
+    senders = [f'0x{rng.getrandbits(160):040x}' for _ in range(100000)]
+    # Category mix and the share of malicious verdicts in each
+    categories = (('NORMAL', 0.80, 0.0), ('BEHAVIORAL_ANOMALY', 0.08, 0.1), ('FRONT_RUNNING', 0.05, 0.6),
+                  ('PHISHING_CONTRACT', 0.04, 0.8), ('RUG_PULL', 0.03, 0.9))
+    names = [c[0] for c in categories]
+    weights = [c[1] for c in categories]
+    malicious_share = {c[0]: c[2] for c in categories}
+    # One real-sized detail blob reused for every row: the layout matters, not the content
+    detail = pack_detail({
+        'features': {f'feature_{k}': rng.random() * 100 for k in range(26)},
+        'predictions': [{'model_name': m, 'confidence': rng.random() * 100, 'threat_category': 'NORMAL',
+                         'threat_level': 0, 'reasoning': 'Normal transaction', 'feature_importance': {'x': 0.1}}
+                        for m in ('rule_based', 'anomaly_detector', 'pattern_matcher', 'behavioral_analyzer',
+                                  'meta_learner')]
+    })
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA cache_size=-262144')
+    conn.execute('PRAGMA synchronous=OFF')
+    with conn:
+        conn.executemany('INSERT OR IGNORE INTO addresses (address) VALUES (?)', [(pack_hex(a),) for a in senders])
+    per_day = rows // days
+    for day in range(days):
+        day_start = (now // 86400 - days + 1 + day) * 86400
+        table = partition_name(day_start)
+        stamps = sorted(rng.randrange(day_start, day_start + 86400) for _ in range(per_day))
+        batch = []
+        for stamp in stamps:
+            category = rng.choices(names, weights)[0]
+            malicious = int(rng.random() < malicious_share[category])
+            level = rng.randint(2, 4) if malicious else rng.randint(0, 1)
+            # Sender ids skewed: a few hot senders carry much of the traffic
+            sender_id = min(int(rng.paretovariate(1.2)), len(senders))
+            batch.append((rng.getrandbits(256).to_bytes(32, 'big'), stamp, rng.random() * 100, category, level,
+                          malicious, 20.0, 0.1, sender_id, None, 'bench', None, detail, None))
+        with conn:
+            store._ensure_partition(conn, table)
+            conn.executemany(INSERT_THREAT_REPORT.format(table=table), batch)
+    conn.close()
+    print(f"built {per_day * days} rows in {time.perf_counter() - started:.0f}s, "
+          f"{os.path.getsize(path) / 2**30:.2f} GiB")
+
+    # Address ids start at 1; paretovariate >= 1 makes id 1 the hottest sender
+    filter_sets = (
+        ('all', {}),
+        ('category=RUG_PULL', {'category': 'RUG_PULL'}),
+        ('malicious=1', {'malicious': True}),
+        ('threat_level=4', {'threat_level': 4}),
+        ('sender (hot)', {'sender': senders[0]}),
+        ('7d + malicious', {'since': now - 7 * 86400, 'malicious': True})
+    )
+
+    def cursor_at(filters, depth):
+        """Cursor of the depth-th match the OFFSET way: count per partition, then OFFSET inside one"""
+        started = time.perf_counter()
+        conn = store._read_connection()
+        clauses, params = [], []
+        for column, value in filters.items():
+            if column == 'sender':
+                clauses.append('from_id = ?')
+                params.append(conn.execute('SELECT id FROM addresses WHERE address = ?',
+                                           (pack_hex(value),)).fetchone()[0])
+            elif column == 'malicious':
+                clauses.append('is_malicious = 1')
+            elif column == 'since':
+                clauses.append('timestamp >= ?')
+                params.append(value)
+            else:
+                clauses.append(f"{'threat_category' if column == 'category' else column} = ?")
+                params.append(value)
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        remaining = depth
+        for table in reversed(store.partitions(conn, filters.get('since'))):
+            count = conn.execute(f'SELECT COUNT(*) FROM {table} {where}', params).fetchone()[0]
+            if remaining < count:
+                row = conn.execute(
+                    f'SELECT timestamp, id FROM {table} {where} ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?',
+                    params + [remaining]
+                ).fetchone()
+                return f"{table[len(PARTITION_PREFIX):]}.{row[0]}.{row[1]}", time.perf_counter() - started
+            remaining -= count
+        return None, time.perf_counter() - started
+
+    print("\npage of 100, mean of 20 fetches; OFFSET = reaching the same depth by COUNT + OFFSET")
+    print(f"   {'filter':<20} {'depth':>9} | {'detail=0':>9} | {'detail=1':>9} | {'OFFSET':>10}")
+    for label, filters in filter_sets:
+        for depth in (0, 1000, 100000, 1000000, 5000000):
+            cursor, offset_seconds = cursor_at(filters, depth) if depth else (None, 0.0)
+            if depth and cursor is None:
+                continue
+            timings = []
+            for detail_flag in (False, True):
+                store.query_reports(limit=100, cursor=cursor, detail=detail_flag, **filters)
+                page_started = time.perf_counter()
+                for _ in range(20):
+                    reports, _ = store.query_reports(limit=100, cursor=cursor, detail=detail_flag, **filters)
+                timings.append((time.perf_counter() - page_started) / 20 * 1000)
+            offset = f"{offset_seconds * 1000:7.1f} ms" if depth else f"{'-':>10}"
+            print(f"   {label:<20} {depth:>9} | {timings[0]:6.2f} ms | {timings[1]:6.2f} ms | {offset} "
+                  f"({len(reports)} rows)")
+
+    for detail_flag in (False, True):
+        started = time.perf_counter()
+        exported = sum(len(json.dumps(report)) + 1 for report in
+                       store.iter_reports(max_rows=200000, malicious=True, detail=detail_flag))
+        elapsed = time.perf_counter() - started
+        print(f"\nNDJSON export malicious=1, detail={int(detail_flag)}: 200000 reports in {elapsed:.2f}s "
+              f"({200000 / elapsed:.0f} reports/s, {exported / elapsed / 2**20:.1f} MiB/s)")
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ['rebuild-rollups']:
+        logging.basicConfig(level=logging.INFO)
+        DatabaseManager(sys.argv[2] if len(sys.argv) > 2 else 'threat_intelligence.db', write_behind=False).rebuild_rollups()
+    elif sys.argv[1:2] == ['bench-reports']:
+        reports_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10000000)
+    else:
+        main()
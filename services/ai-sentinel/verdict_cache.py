@@ -0,0 +1,439 @@
+"""
+Cerberus Verdict Cache
+The monitor re-submits the same pending transactions every time it re-polls
+the mempool. This keeps the verdict for each tx hash in a bounded LRU with a
+TTL, so a repeat costs a dict lookup instead of a full scoring pass.
+
+Entries are tagged with the model version that produced them: a lookup under
+another version is a miss, and engines call invalidate() when they swap
+models, so a verdict never outlives its model. An optional second tier
+(e.g. advanced_ai_sentinel's threat_reports table) is consulted on a miss.
+
+ApproximateVerdictCache is the opt-in companion for bot traffic: the same
+selector with the gas price nudged by a few wei has a new hash every time,
+so it is keyed on a quantized feature signature instead.
+"""
+
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+from tx_features import WEI_PER_ETH, parse_quantity
+
+logger = logging.getLogger(__name__)
+
+# Entries kept per process (0 disables the cache) and their lifetime
+VERDICT_CACHE_SIZE = int(os.environ.get('CERBERUS_VERDICT_CACHE_SIZE', 10000))
+VERDICT_CACHE_TTL = float(os.environ.get('CERBERUS_VERDICT_CACHE_TTL', 300))
+
+# Approximate cache (off unless sized). Resolution is the relative width of the gwei / value /
+# gas / input-length buckets, i.e. how far two transactions sharing a signature may differ.
+APPROX_CACHE_SIZE = int(os.environ.get('CERBERUS_APPROX_CACHE_SIZE', 0))
+APPROX_CACHE_RESOLUTION = float(os.environ.get('CERBERUS_APPROX_CACHE_RESOLUTION', 0.02))
+# Fraction of approximate hits sent to the full model instead, to measure drift
+APPROX_CACHE_VERIFY_RATE = float(os.environ.get('CERBERUS_APPROX_CACHE_VERIFY_RATE', 0.01))
+
+# Hashes that identify nothing (placeholders used by clients and test payloads)
+UNCACHEABLE_HASHES = (None, '', 'unknown')
+
+
+def tx_fingerprint(tx_data):
+    """
+    Short digest of the whole payload. A cached verdict is only reused for the
+    same hash *and* the same content, so a client cannot pin a benign verdict
+    on a real pending hash by submitting a doctored payload first.
+    """
+    payload = json.dumps(tx_data, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+class VerdictCache:
+    """Thread-safe LRU of verdicts keyed by tx hash, with TTL and model-version tagging"""
+
+    def __init__(self, max_entries=VERDICT_CACHE_SIZE, ttl_seconds=VERDICT_CACHE_TTL, second_tier=None):
+        """
+        second_tier: optional object with
+            get_verdict(tx_hash, fingerprint, version, max_age_seconds) -> dict or None
+        consulted on a miss; hits are promoted into memory.
+        """
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.second_tier = second_tier
+
+        self._entries = OrderedDict()   # tx_hash -> (fingerprint, version, expires_at, verdict)
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._second_tier_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._stale = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, tx_hash, fingerprint, version):
+        """Cached verdict for this tx under `version`, or None"""
+        if not self.enabled or tx_hash in UNCACHEABLE_HASHES:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(tx_hash)
+            if entry is not None:
+                cached_fingerprint, cached_version, expires_at, verdict = entry
+                if expires_at <= now:
+                    del self._entries[tx_hash]
+                    self._expired += 1
+                elif cached_fingerprint != fingerprint or cached_version != version:
+                    # Other content or older model: recompute (put() replaces the entry)
+                    self._stale += 1
+                else:
+                    self._entries.move_to_end(tx_hash)
+                    self._hits += 1
+                    return verdict
+
+        if self.second_tier is not None:
+            try:
+                verdict = self.second_tier.get_verdict(tx_hash, fingerprint, version, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️  Verdict cache second tier failed: {e}")
+                verdict = None
+            if verdict is not None:
+                self.put(tx_hash, fingerprint, version, verdict)
+                with self._lock:
+                    self._second_tier_hits += 1
+                return verdict
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, tx_hash, fingerprint, version, verdict):
+        """Remember a verdict; error results are never cached"""
+        if not self.enabled or tx_hash in UNCACHEABLE_HASHES or 'error' in verdict:
+            return
+
+        with self._lock:
+            self._entries[tx_hash] = (fingerprint, version, time.monotonic() + self.ttl_seconds, verdict)
+            self._entries.move_to_end(tx_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, reason='model reload'):
+        """Drop every entry (called when the serving models change)"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._invalidations += 1
+        if dropped:
+            logger.info(f"🧹 Verdict cache cleared ({reason}): {dropped} entries dropped")
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._second_tier_hits + self._misses + self._expired + self._stale
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'second_tier': type(self.second_tier).__name__ if self.second_tier is not None else None,
+                'hits': self._hits,
+                'second_tier_hits': self._second_tier_hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'stale': self._stale,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'hit_rate': ((self._hits + self._second_tier_hits) / lookups) if lookups else 0.0
+            }
+
+
+class ApproximateVerdictCache:
+    """
+    LRU of verdicts keyed by (selector, contract creation, gwei bucket, value
+    bucket, gas bucket, input-length bucket). Buckets are logarithmic with
+    relative width `resolution`, so every numeric feature of two transactions
+    sharing a verdict differs by less than that fraction.
+    
+    With verify_rate > 0 a sample of would-be hits is reported as a miss; the
+    caller scores it with the full model and put() compares the fresh verdict
+    with the cached one (drift stats).
+    """
+
+    def __init__(self, max_entries=APPROX_CACHE_SIZE, ttl_seconds=VERDICT_CACHE_TTL,
+                 resolution=APPROX_CACHE_RESOLUTION, verify_rate=APPROX_CACHE_VERIFY_RATE, top_buckets=20):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.resolution = float(resolution)
+        self.verify_rate = float(verify_rate)
+        self.top_buckets = int(top_buckets)
+        self._log_step = math.log1p(self.resolution)
+
+        self._entries = OrderedDict()   # signature -> (version, expires_at, verdict)
+        self._buckets = OrderedDict()   # signature -> [hits, misses], same bound as _entries
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+        self._hits = 0
+        self._misses = 0
+        self._verify_samples = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+        self._verified = 0
+        self._drift_sum = 0.0
+        self._drift_max = 0.0
+        self._verdict_flips = 0
+        self._category_changes = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _bucket(self, x):
+        return None if x <= 0 else math.floor(math.log(x) / self._log_step)
+
+    def signature(self, tx_data):
+        """Quantized signature of a raw transaction dict (None if it cannot be parsed)"""
+        try:
+            # Parsed exactly as tx_features does (decimal strings are wei), so one signature means one feature range
+            value = parse_quantity(tx_data.get('value')) / WEI_PER_ETH
+            gas = parse_quantity(tx_data.get('gas') or tx_data.get('gasLimit'))
+            gas_price = parse_quantity(tx_data.get('gasPrice')) / 1e9
+        except (TypeError, ValueError, OverflowError):
+            # 'nan', 'inf', 1e400 and friends: uncacheable here, feature extraction reports the error
+            return None
+        if not (math.isfinite(value) and math.isfinite(gas_price)):
+            return None
+
+        input_data = tx_data.get('input', '0x') or tx_data.get('data', '0x') or '0x'
+        return (
+            input_data[:10].lower(),
+            0 if tx_data.get('to') else 1,
+            self._bucket(gas_price),
+            self._bucket(value),
+            self._bucket(gas),
+            self._bucket(len(input_data))
+        )
+
+    def describe(self, signature):
+        """Human-readable bucket ranges for stats"""
+        def span(bucket):
+            if bucket is None:
+                return '0'
+            return f"{(1 + self.resolution) ** bucket:.4g}-{(1 + self.resolution) ** (bucket + 1):.4g}"
+        selector, creation, gwei, value, gas, input_length = signature
+        return (f"{selector} {'create' if creation else 'call'} | gwei {span(gwei)} | value {span(value)} | "
+                f"gas {span(gas)} | input {span(input_length)}")
+
+    def _count(self, signature, hit):
+        counts = self._buckets.get(signature)
+        if counts is None:
+            counts = self._buckets[signature] = [0, 0]
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(signature)
+        counts[0 if hit else 1] += 1
+
+    def get(self, signature, version):
+        """Verdict cached for this signature under `version`, or None"""
+        if not self.enabled or signature is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is not None and (entry[1] <= now or entry[0] != version):
+                del self._entries[signature]
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                self._count(signature, hit=False)
+                return None
+
+            if self.verify_rate > 0 and self._rng.random() < self.verify_rate:
+                # Scored by the full model; put() then measures the drift against this entry
+                self._verify_samples += 1
+                return None
+
+            self._entries.move_to_end(signature)
+            self._hits += 1
+            self._count(signature, hit=True)
+            return entry[2]
+
+    def put(self, signature, version, verdict):
+        """Remember a full-model verdict for its signature (recording drift if one was cached)"""
+        if not self.enabled or signature is None or 'error' in verdict:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._record_drift(entry[2], verdict)
+
+            self._entries[signature] = (version, now + self.ttl_seconds, verdict)
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _record_drift(self, cached, fresh):
+        drift = abs(float(cached.get('danger_score', 0)) - float(fresh.get('danger_score', 0)))
+        self._verified += 1
+        self._drift_sum += drift
+        self._drift_max = max(self._drift_max, drift)
+        if bool(cached.get('is_malicious')) != bool(fresh.get('is_malicious')):
+            self._verdict_flips += 1
+        if cached.get('threat_category') != fresh.get('threat_category'):
+            self._category_changes += 1
+
+    def invalidate(self, reason='model reload'):
+        """Drop every entry (called when the serving models change)"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._invalidations += 1
+        if dropped:
+            logger.info(f"🧹 Approximate verdict cache cleared ({reason}): {dropped} entries dropped")
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            top = sorted(self._buckets.items(), key=lambda item: item[1][0], reverse=True)[:self.top_buckets]
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'resolution': self.resolution,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0,
+                'drift': {
+                    'verify_rate': self.verify_rate,
+                    'verify_samples': self._verify_samples,
+                    'verified': self._verified,
+                    'mean_abs_danger_drift': (self._drift_sum / self._verified) if self._verified else 0.0,
+                    'max_abs_danger_drift': self._drift_max,
+                    'verdict_flips': self._verdict_flips,
+                    'category_changes': self._category_changes
+                },
+                'buckets': [
+                    {
+                        'signature': self.describe(signature),
+                        'hits': hits,
+                        'misses': misses,
+                        'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+                    }
+                    for signature, (hits, misses) in top
+                ]
+            }
+
+
+def main():
+    """Re-poll and bot-traffic workloads through app.py's CerberusAI, with and without the caches"""
+    import random
+
+    from app import CerberusAI
+    # app.py configures INFO logging on import; per-request (and per-threat) log lines would dominate the timings
+    logging.getLogger().setLevel(logging.ERROR)
+
+    print("=" * 80)
+    print("🐺 CERBERUS VERDICT CACHE BENCHMARK")
+    print("=" * 80)
+
+    engine = CerberusAI()
+    print(f"\nmode: {'ensemble ' + engine.model_version if engine.models_loaded else 'rule-based'}")
+
+    rng = random.Random(11)
+    # Values in wei, as monitor.js and JSON-RPC send them
+    pending = [{
+        'hash': f'0x{i:064x}',
+        'value': int(rng.choice([0, 0.01, 0.5, 2.0, 50.0]) * WEI_PER_ETH),
+        'gas': rng.choice([21000, 150000, 600000, 1500000]),
+        'gasPrice': int(rng.uniform(1, 250) * 1e9),
+        'to': None if rng.random() < 0.1 else '0xabc',
+        'input': '0x' if rng.random() < 0.5 else '0xa9059cbb' + '0' * 128
+    } for i in range(2000)]
+
+    # Each poll sees ~80% of the previous pool plus fresh transactions, one /predict per tx
+    polls = []
+    window = pending[:500]
+    cursor = 500
+    for _ in range(10):
+        polls.append(list(window))
+        keep = rng.sample(window, 400)
+        window = keep + pending[cursor:cursor + 100]
+        cursor += 100
+
+    def run(cache_size):
+        engine.verdict_cache = VerdictCache(max_entries=cache_size)
+        started = time.perf_counter()
+        calls = 0
+        for poll in polls:
+            for tx in poll:
+                engine.predict(tx)
+                calls += 1
+        return calls, time.perf_counter() - started, engine.verdict_cache.stats()
+
+    print("\nMempool re-polls (exact cache):")
+    for label, size in (('no cache', 0), ('cache', VERDICT_CACHE_SIZE)):
+        calls, elapsed, stats = run(size)
+        print(f"   {label:<10} {calls} calls in {elapsed * 1000:8.1f} ms | "
+              f"{elapsed / calls * 1e6:7.1f} µs/call | hit rate {stats['hit_rate']:.1%}")
+
+    # Bot traffic: 40 bots, each repeating one call with the gas price nudged by a few wei
+    # and the value jittered; every tx has a fresh hash, so only the approximate cache helps
+    bots = [{
+        'to': f'0x{b:040x}',
+        'input': rng.choice(['0xa9059cbb', '0x38ed1739', '0x7ff36ab5']) + '0' * rng.choice([64, 128, 256]),
+        'gas': rng.choice([90000, 250000, 600000, 1200000]),
+        'gasPrice': int(rng.uniform(2, 200) * 1e9),
+        'value': int(rng.choice([0, 0.05, 1.5, 20.0]) * WEI_PER_ETH)
+    } for b in range(40)]
+    bot_traffic = []
+    for i in range(4000):
+        bot = rng.choice(bots)
+        bot_traffic.append(dict(
+            bot,
+            hash=f'0xb{i:063x}',
+            nonce=i,
+            gasPrice=bot['gasPrice'] + rng.randint(1, 1000),
+            value=int(bot['value'] * rng.uniform(0.999, 1.001))
+        ))
+
+    engine.verdict_cache = VerdictCache(max_entries=0)
+    print("\nBot traffic, 4000 near-duplicate tx (approximate cache, 2% buckets, 5% verified):")
+    for label, size in (('off', 0), ('on', APPROX_CACHE_SIZE or 10000)):
+        engine.approx_cache = ApproximateVerdictCache(max_entries=size, resolution=0.02, verify_rate=0.05)
+        started = time.perf_counter()
+        for tx in bot_traffic:
+            engine.predict(tx)
+        elapsed = time.perf_counter() - started
+        stats = engine.approx_cache.stats()
+        print(f"   {label:<10} {elapsed * 1000:8.1f} ms | {elapsed / len(bot_traffic) * 1e6:7.1f} µs/call | "
+              f"hit rate {stats['hit_rate']:.1%} | buckets {stats['entries']}")
+    drift = stats['drift']
+    print(f"   drift over {drift['verified']} verified hits: mean |Δdanger| {drift['mean_abs_danger_drift']:.3f}, "
+          f"max {drift['max_abs_danger_drift']:.3f}, verdict flips {drift['verdict_flips']}, "
+          f"category changes {drift['category_changes']}")
+
+
+if __name__ == "__main__":
+    main()